@@ -1,8 +1,7 @@
 import os
 import logging.config
-import pkg_resources
 import enum
-from functools import wraps
+import functools
 
 import pytoml as toml
 import click
@@ -10,6 +9,18 @@ import click
 
 __version__ = '0.1.0'
 
+def read_package_data(name):
+    """
+    Contents of one of the files in images_of/data. pkg_resources is slow to
+    import, so it's only used if the package isn't installed as plain files.
+    """
+    try:
+        with open(os.path.join(os.path.dirname(__file__), 'data', name), 'rb') as f:
+            return f.read().decode('utf-8')
+    except FileNotFoundError:
+        import pkg_resources
+        return pkg_resources.resource_string(__name__, 'data/' + name).decode('utf-8')
+
 def _setup_logging():
     try:
         with open('logging.toml') as f:
@@ -19,10 +30,16 @@ def _setup_logging():
             with open(os.path.expanduser('~/.config/ion/logging.toml')) as f:
                 raw = f.read()
         except FileNotFoundError:
-            raw = pkg_resources.resource_string(__name__, 'data/logging.toml')
+            raw = read_package_data('logging.toml')
 
     conf = toml.loads(raw)
+    use_queue = conf.pop('queue', False)
     logging.config.dictConfig(conf)
+
+    if use_queue:
+        from images_of.logqueue import queue_logging
+        queue_logging([logging.getLogger()] +
+                      [logging.getLogger(name) for name in conf.get('loggers', {})])
 _setup_logging()
 
 
@@ -62,7 +79,15 @@ class AcceptFlag(enum.Enum):
     BAD = 3
 
 from .settings import settings
-from .connect import Reddit
+
+
+def Reddit(*args, **kwargs):
+    """
+    A new `images_of.connect.Reddit` session. praw takes a while to import,
+    and `ion --help` doesn't need it, so it's only imported from here.
+    """
+    from .connect import Reddit
+    return Reddit(*args, **kwargs)
 
 
 def _update_settings(ctx, param, value):
@@ -71,11 +96,25 @@ def _update_settings(ctx, param, value):
 
 
 def command(f):
-    @wraps(f)
-    def wrapper(*args, **kwargs):
-        g = click.command()(
-        click.option('-c', '--config', help='additional configuration file', multiple=True, is_eager=True, expose_value=False, callback=_update_settings, type=click.Path(exists=True))(
-        f))
-        return g(*args, **kwargs)
+    """
+    Make `f` a click command taking the common options, including the
+    profiling ones (see images_of.profiling). The command can be called as
+    a console script, or added to a click group.
+    """
+    @functools.wraps(f)
+    def run(*args, profile=None, sample=None, sample_rate=None, **kwargs):
+        if not (profile or sample):
+            return f(*args, **kwargs)
 
-    return wrapper
+        from images_of.profiling import profiling
+        with profiling(profile, sample, sample_rate):
+            return f(*args, **kwargs)
+
+    run = click.option('--sample-rate', type=click.IntRange(1), default=100, help='Stack samples a second, with --sample')(run)
+    run = click.option('--sample', type=click.Path(dir_okay=False, writable=True),
+                       help='Sample every thread\'s stack, writing collapsed stacks to this file')(run)
+    run = click.option('--profile', type=click.Path(dir_okay=False, writable=True),
+                       help='Profile with cProfile, writing the stats to this file')(run)
+    return click.command()(
+        click.option('-c', '--config', help='additional configuration file', multiple=True, is_eager=True, expose_value=False, callback=_update_settings, type=click.Path(exists=True))(
+        run))
@@ -0,0 +1,192 @@
+"""
+The network's user blacklist, kept on the parent sub's wiki.
+
+Rather than one page holding every entry, which every reader downloads in
+full and every writer rewrites in full, entries are spread over a fixed
+number of shard pages (userblacklist/0, userblacklist/1, ...) by a hash of
+the entry. The original page becomes an index listing each shard with a
+hash of its content:
+
+    #sharded-blacklist
+    userblacklist/0 3f2a...
+    userblacklist/1 9bc1...
+
+Readers keep a cache of the shards and fetch only those whose hash in the
+index has changed. Writers only rewrite the shards that gained entries,
+then the index. A page still in the old flat format is read as it is, and
+converted to shards the first time something is added.
+
+Edit the shards by hand if need be, but then change that shard's hash in
+the index (to anything) so readers know to fetch it again. Entries added to
+the index page by hand, the way the flat page was edited, still count, and
+are moved into their shards the next time something is added.
+"""
+from hashlib import sha1
+import logging
+import re
+from time import time
+
+from images_of import settings
+from images_of.state import load_json, save_json
+
+LOG = logging.getLogger(__name__)
+
+INDEX_HEADER = '#sharded-blacklist'
+SHARD_COUNT = 16
+
+# cached shards older than this are fetched again regardless
+CACHE_MAX_AGE = 24 * 60 * 60
+
+
+def parse_entries(content):
+    return {line.strip().lower() for line in content.splitlines() if line.strip()}
+
+
+def format_entries(entries):
+    return '\n\n'.join(sorted(entries))
+
+
+def content_hash(content):
+    return sha1(content.replace('\r\n', '\n').encode('utf-8')).hexdigest()
+
+
+class ShardedBlacklist:
+    """
+    The blacklist kept at `page` on the parent sub's wiki. Entries are
+    lowercased lines, e.g. /u/someone. If `cache_path` is given, shards are
+    cached there between runs. If `budget` is given, each page read or
+    written spends a request from it.
+    """
+
+    def __init__(self, r, page='userblacklist', shards=SHARD_COUNT, cache_path=None,
+                 budget=None):
+        self.r = r
+        self.budget = budget
+        self.page = page
+        self.shards = shards
+        self.cache_path = cache_path
+        self.cache = load_json(cache_path, {}) if cache_path else {}
+        self.fetched = 0
+
+    def shard_for(self, entry):
+        n = int(sha1(entry.encode('utf-8')).hexdigest(), 16) % self.shards
+        return '{}/{}'.format(self.page, n)
+
+    def _spend(self):
+        if self.budget is not None:
+            self.budget.acquire()
+
+    def _get(self, page):
+        self.fetched += 1
+        self._spend()
+        return self.r.get_wiki_page(settings.PARENT_SUB, page).content_md
+
+    def _read_index(self):
+        """
+        ({shard page: hash}, stray entries) for a sharded blacklist, or
+        (None, entries) for one still in the flat format.
+        """
+        content = self._get(self.page)
+        lines = [line.strip() for line in content.splitlines() if line.strip()]
+        if not lines or lines[0] != INDEX_HEADER:
+            return None, parse_entries(content)
+
+        shard_re = re.compile(r'{}/\d+'.format(re.escape(self.page)))
+        index = {}
+        strays = set()
+        for line in lines[1:]:
+            shard, _, digest = line.partition(' ')
+            if shard_re.fullmatch(shard):
+                index[shard] = digest.strip()
+            else:
+                strays.add(line.lower())
+
+        if strays:
+            LOG.warning('/r/%s/wiki/%s lists %s entries outside the shards: %s',
+                        settings.PARENT_SUB, self.page, len(strays), ', '.join(sorted(strays)))
+        return index, strays
+
+    def _read_shard(self, shard, digest):
+        cached = self.cache.get(shard)
+        if cached and cached['hash'] == digest and time() - cached['fetched'] < CACHE_MAX_AGE:
+            return set(cached['entries'])
+
+        LOG.debug('Fetching blacklist shard %s', shard)
+        entries = parse_entries(self._get(shard))
+        self.cache[shard] = {'hash': digest, 'entries': sorted(entries), 'fetched': time()}
+        return entries
+
+    def _save_cache(self):
+        if self.cache_path:
+            save_json(self.cache_path, self.cache)
+
+    def read(self):
+        """Every entry on the blacklist."""
+        index, entries = self._read_index()
+        if index is None:
+            return entries
+
+        for shard, digest in sorted(index.items()):
+            entries |= self._read_shard(shard, digest)
+        self._save_cache()
+
+        LOG.info('Read %s blacklist entries from %s page(s)', len(entries), self.fetched)
+        return entries
+
+    def add(self, new_entries, reason):
+        """
+        Add `new_entries` to the blacklist, rewriting only the shards they
+        fall in. Returns the entries that weren't already there.
+        """
+        new_entries = {entry.lower() for entry in new_entries}
+        index, entries = self._read_index()
+        strays = set()
+
+        if index is None:
+            LOG.info('Converting /r/%s/wiki/%s to %s shards', settings.PARENT_SUB,
+                     self.page, self.shards)
+            shards = {'{}/{}'.format(self.page, n): set() for n in range(self.shards)}
+            for entry in entries:
+                shards[self.shard_for(entry)].add(entry)
+            index = {}
+            dirty = set(shards)
+        else:
+            strays = entries
+            touched = {self.shard_for(entry) for entry in new_entries | strays}
+            shards = {shard: self._read_shard(shard, index.get(shard))
+                      if shard in index else set() for shard in touched}
+            dirty = set()
+
+        added = set()
+        for entry in new_entries | strays:
+            shard = self.shard_for(entry)
+            if entry not in shards[shard]:
+                shards[shard].add(entry)
+                dirty.add(shard)
+                if entry in new_entries:
+                    added.add(entry)
+
+        if not dirty and not strays:
+            LOG.info('User blacklist has not changed; not modifying the wiki')
+            return added
+
+        # shards first, so the index never points readers at content that
+        # isn't there yet
+        for shard in sorted(dirty):
+            content = format_entries(shards[shard])
+            self._spend()
+            self.r.edit_wiki_page(settings.PARENT_SUB, shard, content, reason)
+            index[shard] = content_hash(content)
+            self.cache[shard] = {'hash': index[shard], 'entries': sorted(shards[shard]),
+                                 'fetched': time()}
+
+        index_content = '\n\n'.join([INDEX_HEADER] + ['{} {}'.format(shard, digest)
+                                                      for shard, digest in sorted(index.items())])
+        self._spend()
+        self.r.edit_wiki_page(settings.PARENT_SUB, self.page, index_content, reason)
+        self._save_cache()
+
+        LOG.info('Added %s blacklist entries, rewriting %s shard(s)', len(added), len(dirty))
+        if strays:
+            LOG.info('Moved %s entries from the index into their shards', len(strays))
+        return added
@@ -9,23 +9,32 @@ from praw.helpers import submission_stream
 from praw.errors import AlreadySubmitted, APIException, HTTPException
 
 from images_of import settings, AcceptFlag
+from images_of import events
+from images_of.blacklist import ShardedBlacklist
+from images_of.matcher import compile_rule
+from images_of.state import state_path
 from images_of.subreddit import Subreddit
 
 RETRY_MINUTES = 2
+BLACKLIST_CACHE_FILE = 'userblacklist-cache.json'
 LOG = logging.getLogger(__name__)
 
 class Bot:
-    def __init__(self, r, should_post=True):
+    def __init__(self, r, should_post=True, publisher=None):
         self.r = r
         self.should_post = should_post
+        self.publisher = publisher
         self.recent_posts = deque(maxlen=50)
 
         LOG.info('Loading global user blacklist from wiki')
-        self.blacklist_users = self._read_blacklist('userblacklist')
+        user_blacklist = ShardedBlacklist(self.r, 'userblacklist',
+                                          cache_path=state_path(BLACKLIST_CACHE_FILE))
+        self.blacklist_users = {entry[3:] for entry in user_blacklist.read()}
 
         LOG.info('Loading global subreddit blacklist from wiki')
         blacklist_sub_pats = self._read_blacklist('subredditblacklist')
-        self.blacklist_sub_res = [re.compile(pat) for pat in blacklist_sub_pats]
+        self.blacklist_sub_res = [compile_rule(pat, name='subreddit blacklist entry {!r}'.format(pat))
+                                  for pat in blacklist_sub_pats]
 
         self.subreddits = []
         for sub_settings in settings.CHILD_SUBS:
@@ -34,16 +43,20 @@ class Bot:
             self._load_sub(sub_settings)
 
         ext_pattern = '({})$'.format('|'.join(settings.EXTENSIONS))
-        self.ext_re = re.compile(ext_pattern, flags=re.IGNORECASE)
+        self.ext_re = compile_rule(ext_pattern, re.IGNORECASE, name='extensions')
 
         domain_pattern = '^({})$'.format('|'.join(settings.DOMAINS))
-        self.domain_re = re.compile(domain_pattern, flags=re.IGNORECASE)
+        self.domain_re = compile_rule(domain_pattern, re.IGNORECASE, name='domains')
 
     def _load_sub(self, settings):
         sub = Subreddit(**settings)
         sub.load_wiki_blacklist(self.r)
         self.subreddits.append(sub)
 
+    def _publish(self, event_type, **fields):
+        if self.publisher is not None:
+            self.publisher.publish(event_type, **fields)
+
     def _read_blacklist(self, wiki_page):
         content = self.r.get_wiki_page(settings.PARENT_SUB, wiki_page).content_md
         entries = [line.strip().lower()[3:] for line in content.splitlines() if line]
@@ -71,20 +84,23 @@ class Bot:
             LOG.warning('No author information available for submission %s.', post.url)
             return AcceptFlag.BAD
 
+        sub = post.subreddit.display_name.lower()
+
+        blacklisted = None
         if user in self.blacklist_users:
-            return AcceptFlag.BAD
+            blacklisted = 'user'
+        elif any(bl_sub.fullmatch(sub) for bl_sub in self.blacklist_sub_res):
+            blacklisted = 'subreddit'
 
-        sub = post.subreddit.display_name.lower()
-        if any(bl_sub.fullmatch(sub) for bl_sub in self.blacklist_sub_res):
+        if not (self.domain_re.search(post.domain) or self.ext_re.search(post.url)):
             return AcceptFlag.BAD
 
-        if self.domain_re.search(post.domain):
-            return ok_ret
-
-        if self.ext_re.search(post.url):
-            return ok_ret
+        if blacklisted:
+            # note why, so _do_post can report it if we'd otherwise have taken it
+            post.blacklisted = blacklisted
+            return AcceptFlag.BAD
 
-        return AcceptFlag.BAD
+        return ok_ret
 
 
     def crosspost(self, post, sub, match):
@@ -103,15 +119,15 @@ class Bot:
             # put it back at the end of the queue
             self.recent_posts.remove(log_entry)
             self.recent_posts.append(log_entry)
-            LOG.info('Already posted {} to /r/{}. Skipping.'.format(title, sub.name))
+            LOG.info('Already posted %s to /r/%s. Skipping.', title, sub.name)
             return
         else:
             self.recent_posts.append(log_entry)
-            LOG.debug('Added {} to recent posts. Now tracking {} items.'
-                          .format(log_entry, len(self.recent_posts)))
+            LOG.debug('Added %s to recent posts. Now tracking %s items.',
+                      log_entry, len(self.recent_posts))
 
         try:
-            LOG.info('X-Posting into /r/{}: {}'.format(sub.name, title))
+            LOG.info('X-Posting into /r/%s: %s', sub.name, title)
             if self.should_post:
                 xpost = self.r.submit(
                             sub.name,
@@ -125,10 +141,14 @@ class Bot:
                 if self.should_post:
                     xpost.mark_as_nsfw()
 
-            LOG.debug('Commenting: {}'.format(comment))
+            LOG.debug('Commenting: %s', comment)
             if self.should_post:
                 xpost.add_comment(comment)
 
+                self._publish(events.CROSSPOST, subreddit=sub.name, title=title,
+                              url=post.url, permalink=xpost.permalink,
+                              source=post.permalink, reason=match.reason, detail=match.detail)
+
         except AlreadySubmitted:
             LOG.info('Already submitted. Skipping.')
         except KeyError:
@@ -136,7 +156,9 @@ class Bot:
             LOG.info('Already Submitted (KeyError). Skipping.')
         except APIException as e:
             LOG.warning(e)
-        
+            self._publish(events.API_ERROR, error=type(e).__name__, message=str(e),
+                          subreddit=sub.name, url=post.url)
+
 
     def verify_age(self, post):
         if hasattr(post, 'age_verified'):
@@ -149,9 +171,21 @@ class Bot:
             return True
         return False
 
+    def _report_blacklisted(self, post):
+        if self.publisher is None:
+            return
+
+        matches = [sub.name for sub in self.subreddits if sub.check(post)]
+        if matches:
+            self._publish(events.BLACKLISTED, reason=post.blacklisted,
+                          user=post.author.name, source=post.permalink,
+                          title=post.title, subreddits=matches)
+
     def _do_post(self, post):
         flag = self.check(post)
         if flag is AcceptFlag.BAD:
+            if hasattr(post, 'blacklisted'):
+                self._report_blacklisted(post)
             return
 
         for sub in self.subreddits:
@@ -168,14 +202,14 @@ class Bot:
             try:
                 for post in stream:
                     self._do_post(post)
-            except HTTPException as e:
-                LOG.error('{}: {}'.format(type(e), e))
-            except requests.ReadTimeout as e:
-                LOG.error('{}: {}'.format(type(e), e))
-            except requests.ConnectionError as e:
-                LOG.error('{}: {}'.format(type(e), e))
+            except (HTTPException, requests.ReadTimeout, requests.ConnectionError) as e:
+                LOG.error('%s: %s', type(e), e)
+                self._publish(events.API_ERROR, error=type(e).__name__, message=str(e))
+                reason = type(e).__name__
             else:
                 LOG.error('Stream ended.')
+                reason = 'ended'
 
-            LOG.info('Sleeping for {} minutes.'.format(RETRY_MINUTES))
+            self._publish(events.STREAM_RESTART, reason=reason, retry_minutes=RETRY_MINUTES)
+            LOG.info('Sleeping for %s minutes.', RETRY_MINUTES)
             sleep(60 * RETRY_MINUTES)
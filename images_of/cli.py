@@ -0,0 +1,64 @@
+"""
+The `ion` command, bringing every tool together as a subcommand:
+
+    ion expand Topic
+    ion bot --no-post
+
+A subcommand's module, and whatever it imports, is only loaded when that
+subcommand runs, so `ion --help` stays quick. The ion_* scripts still work
+as before.
+"""
+import importlib
+
+import click
+
+# subcommand: (module with a `main` command, short help)
+COMMANDS = {
+    'audit_modlog': ('images_of.entrypoints.audit_modlog', 'Process modlogs to identify inactive mods.'),
+    'audit_mods': ('images_of.entrypoints.audit_mods', 'Find subs without mods and disenfranchised mods.'),
+    'bench': ('images_of.entrypoints.bench', 'Benchmarks guarding against slowdowns.'),
+    'blacklist_requests': ('images_of.entrypoints.blacklist_requests',
+                           'Check for blacklist requests and add users to blacklist.'),
+    'bot': ('images_of.entrypoints.bot', 'Reddit Network scraper and x-poster bot.'),
+    'bulkmail': ('images_of.entrypoints.bulkmail', 'Message the modmail of every child sub.'),
+    'discord_bot': ('images_of.entrypoints.discord_announce_bot',
+                    'Relay network activity to Discord channels.'),
+    'expand': ('images_of.entrypoints.expand', 'Prop up new subreddit and set it for the network.'),
+    'fake_reddit': ('images_of.entrypoints.fake_reddit', 'Serve a stand-in for the reddit API.'),
+    'feeds': ('images_of.entrypoints.feeds', 'Post new entries from each sub\'s feeds.'),
+    'github_replay': ('images_of.entrypoints.github_replay',
+                      'Replay recorded GitHub webhook payloads.'),
+    'hot_sister': ('images_of.entrypoints.hot_sister', 'List the network\'s hot posts in child sidebars.'),
+    'invite_mods': ('images_of.entrypoints.invite_mods', 'Invite moderators to every sub in the network.'),
+    'propagate': ('images_of.entrypoints.propagate', 'Propagate settings across the network.'),
+    'scheduler': ('images_of.entrypoints.scheduler', 'Run the periodic jobs in one process.'),
+    'setup_oauth': ('images_of.entrypoints.oauth', 'Get an OAuth refresh token for the bot.'),
+}
+
+
+class LazyGroup(click.Group):
+    """A group loading its subcommands from COMMANDS as they're needed."""
+
+    def list_commands(self, ctx):
+        return sorted(COMMANDS)
+
+    def get_command(self, ctx, name):
+        if name not in COMMANDS:
+            return None
+        module = importlib.import_module(COMMANDS[name][0])
+        return module.main
+
+    def format_commands(self, ctx, formatter):
+        # the default would import every subcommand for its help
+        rows = [(name, COMMANDS[name][1]) for name in self.list_commands(ctx)]
+        with formatter.section('Commands'):
+            formatter.write_dl(rows)
+
+
+@click.command(cls=LazyGroup)
+def main():
+    """Tools for managing the network."""
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,65 @@
+import logging
+import threading
+from time import time
+
 import praw
+from praw.objects import LoggedInRedditor
 
 from images_of import settings
+from images_of.state import state_path
+from images_of.tokens import REFRESH_MARGIN, TOKEN_FILE, TOKEN_LIFETIME, TokenCache
+
+LOG = logging.getLogger(__name__)
+
+# how soon to try again when refreshing ahead of expiry fails
+REFRESH_RETRY = 60
 
 class Reddit(praw.Reddit):
     def __init__(self, *args, **kwargs):
+        self._local = threading.local()
+        self._auth_lock = threading.RLock()
         super().__init__(*args, **kwargs)
-        self.config.api_request_delay = 1.0
+        self.config.api_request_delay = settings.REDDIT_REQUEST_DELAY
+        self._refresh_timer = None
+
+        if settings.REDDIT_URL:
+            # everything, OAuth requests included, goes to the stand-in
+            url = settings.REDDIT_URL.rstrip('/')
+            self.config.api_url = self.config.oauth_url = self.config.permalink_url = url
+            LOG.warning('Using %s in place of reddit', url)
+
+    # praw flags whether the request in progress goes over OAuth on the
+    # session itself, and clears it after every call. Keep the flag per
+    # thread, so threads sharing a session don't clear it under each other.
+    @property
+    def _use_oauth(self):
+        return getattr(self._local, 'use_oauth', False)
+
+    @_use_oauth.setter
+    def _use_oauth(self, value):
+        self._local.use_oauth = value
+
+    # Requests hold the lock while they're made, and new credentials are put
+    # in place under it, so a refresh never happens halfway through one. praw
+    # refreshes from inside a request whose token was turned down, hence the
+    # RLock.
+    def _request(self, *args, **kwargs):
+        with self._auth_lock:
+            return super()._request(*args, **kwargs)
+
+    def refresh_access_information(self, refresh_token=None, update_session=True):
+        # praw's own update clears the session's credentials, user included,
+        # before setting the new ones; other threads may be using it meanwhile
+        info = super().refresh_access_information(refresh_token, update_session=False)
+        if update_session:
+            self._set_credentials(info['scope'], info['access_token'], info['refresh_token'])
+        return info
+
+    def _set_credentials(self, scope, access_token, refresh_token):
+        with self._auth_lock:
+            self._authentication = set(scope)
+            self.access_token = access_token
+            self.refresh_token = refresh_token
 
     def oauth(self, **kwargs):
         self.set_oauth_app_info(
@@ -14,9 +68,56 @@ class Reddit(praw.Reddit):
             redirect_uri = kwargs.get('redirect_uri') or settings.REDIRECT_URI
         )
 
-        self.refresh_access_information(
-                kwargs.get('refresh_token') or settings.REFRESH_TOKEN
-        )
+        self._oauth_refresh_token = kwargs.get('refresh_token') or settings.REFRESH_TOKEN
+        self._tokens = TokenCache(state_path(TOKEN_FILE))
+
+        # keep tokens for a stand-in apart from reddit's own
+        self._token_key = self._oauth_refresh_token
+        if settings.REDDIT_URL:
+            self._token_key = '{} {}'.format(self.config.api_url, self._oauth_refresh_token)
+
+        self._use_token(self._tokens.get(self._token_key, self._new_token))
+
+    def _new_token(self):
+        start = time()
+        info = self.refresh_access_information(self._oauth_refresh_token)
+        if self.user is None and 'identity' in info['scope']:
+            self.user = self.get_me()
+        return {
+            'access_token': info['access_token'],
+            'scope': sorted(info['scope']),
+            'expires': start + TOKEN_LIFETIME,
+            'user': self.user.name if self.user else None,
+        }
+
+    def _use_token(self, token):
+        self._set_credentials(token['scope'], token['access_token'], self._oauth_refresh_token)
+        # a cached token comes with who it's for, so there's no need to ask
+        if token.get('user') and self.user is None:
+            self.user = LoggedInRedditor(self, user_name=token['user'])
+
+        self._schedule_refresh(token['expires'] - REFRESH_MARGIN - time())
+
+    def _schedule_refresh(self, delay):
+        """Refresh the access token ahead of expiry, for long running tools."""
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+
+        self._refresh_timer = threading.Timer(max(delay, 0), self._refresh_token)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+    def _refresh_token(self):
+        try:
+            # another process may already have refreshed it
+            token = self._tokens.get(self._token_key, self._new_token,
+                                     margin=REFRESH_MARGIN + REFRESH_RETRY)
+        except Exception as e:
+            LOG.warning('Could not refresh access token: %s', e)
+            self._schedule_refresh(REFRESH_RETRY)
+            return
+
+        self._use_token(token)
 
     def login(self, username=None, password=None):
         # this is depricated, just ignore the warning.
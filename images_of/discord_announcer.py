@@ -6,8 +6,9 @@ import asyncio
 from collections import deque
 from random import randint
 import datetime
+from functools import partial
 import logging
-from time import sleep
+from time import monotonic, sleep, time
 
 import discord
 import github3
@@ -16,9 +17,13 @@ import requests
 
 from images_of import settings
 from images_of.discord_formatters import is_relayable_message, format_inbox_message
-from images_of.discord_formatters import format_github_issue_comment, format_github_issue_event
-from images_of.discord_formatters import format_github_pull_request, format_github_push_event
-from images_of.discord_formatters import format_mod_action
+from images_of.discord_formatters import format_bot_event, format_github_event, format_mod_action
+from images_of.discord_outbox import DiscordOutbox
+from images_of.events import EventReader
+from images_of.github_webhook import WebhookServer
+from images_of.inbox import ReadMarker
+from images_of.ratelimit import RateBudget
+from images_of.state import state_path
 
 RUN_INTERVAL = 2  # minutes
 STATS_INTERVAL = 15  # minutes
@@ -36,11 +41,52 @@ TYPES = {
 }
 
 MODLOG_ACTIONS = ['invitemoderator', 'acceptmoderatorinvite', 'removemoderator']
+MODLOG_PAGE_SIZE = 100
+# reddit expires modlog entries after 90 days, and a 'before' cursor pointing at
+# an expired entry matches nothing, so cursors older than this are re-anchored.
+MODLOG_CURSOR_MAX_AGE = 60 * 60 * 24 * 60  # seconds
 EVENT_FILTER = ['IssuesEvent', 'PullRequestEvent', 'PushEvent', 'IssueCommentEvent']
 ISSUE_ACTION_FILTER = ["opened", "closed", "reopened", "unlabeled",
                        "unassigned", "assigned", "labeled"]
 PULL_REQUEST_ACTION_FILTER = ["opened", "edited", "closed", "reopened", "synchronize"]
 
+# the local event log is cheap to read, so it's polled on its own, tighter, schedule
+EVENTS_INTERVAL = 10  # seconds
+EVENTS_MIN_INTERVAL = 5
+EVENTS_MAX_INTERVAL = 60
+EVENTS_BATCH = 100
+
+# how a source's polling interval reacts to finding new items, or none
+POLL_SPEEDUP = 2.0
+POLL_BACKOFF = 1.5
+
+
+class PollSource:
+    """
+    A source of announcements polled on its own interval. The interval shrinks
+    towards `floor` while the source is turning up new items, and grows
+    towards `ceiling` while it's idle. `cost` is the number of reddit requests
+    a poll spends.
+    """
+
+    def __init__(self, name, poll, cost, interval, floor, ceiling):
+        self.name = name
+        self.poll = poll
+        self.cost = cost
+        self.floor = floor
+        self.ceiling = ceiling
+        self.interval = min(max(interval, floor), ceiling)
+        self.next_run = 0
+
+    def record(self, count, now):
+        """Adapt the interval to a poll that turned up `count` new items."""
+        if count:
+            self.interval = max(self.floor, self.interval / POLL_SPEEDUP)
+        else:
+            self.interval = min(self.ceiling, self.interval * POLL_BACKOFF)
+
+        self.next_run = now + self.interval
+
 
 class DiscordBot:
     """Discord Announcer Bot to relay important and relevant network information to
@@ -50,32 +96,45 @@ class DiscordBot:
         self.reddit = reddit
         self.run_init = True
 
+        self.outbox = DiscordOutbox()
         self._setup_client()
 
         self.last_oc_id = dict()
         self.oc_stream_placeholder = dict()
-        self.last_modlog_action = dict()
+        self.modlog_cursor = dict()
+        self.sources = dict()
 
         self.count_messages = 0
         self.count_oc = 0
         self.count_gh_events = 0
         self.count_modlog = 0
+        self.count_modlog_announced = 0
+        self.count_bot_events = 0
+
+        self.event_reader = None
 
         self.ghub = github3.login(token=settings.GITHUB_OAUTH_TOKEN)
-        repo = self.ghub.repository(settings.GITHUB_REPO_USER, settings.GITHUB_REPO_NAME)
-        self.last_github_event = repo.iter_events(number=1).next().id
+        self.gh_repo = self.ghub.repository(settings.GITHUB_REPO_USER, settings.GITHUB_REPO_NAME)
+        self.gh_etag = None
+        self.gh_next_poll = 0
+        self.webhook = None
+
+        events = self._poll_github_events(number=1)
+        self.last_github_event = events[0].id if events else None
 
     def _setup_client(self):
         #loop = asyncio.get_event_loop()
         #loop.slow_callback_duration = 10
+        self.outbox.detach()
         self.client = discord.Client()
         self.client.event(self.on_ready)
 
     # ======================================================
 
-    async def _relay_inbox_message(self, message):
+    async def _relay_inbox_message(self, message, read_marker):
+        """Relay an inbox message if it's one we announce. Returns True if it was."""
         # Determine if it's a message that we do NOT want to relay...
-        if is_relayable_message(message):
+        if is_relayable_message(message, read_marker):
             self.count_messages += 1
 
             if 'false positive' in message.body.lower() and self.settings.DO_FALSEPOS:
@@ -83,14 +142,18 @@ class DiscordBot:
                 notification = "New __false-positive__ report from `/u/{}`:\r\n{}\r\n ".format(
                     message.author.name, message.permalink[:-7])
 
-                await self.client.send_message(self.falsepos_chan, notification)
-                message.mark_as_read()
+                self.outbox.put(settings.DISCORD_FALSEPOS_CHAN_ID, notification)
+                read_marker.add(message)
+                return True
 
             elif self.settings.DO_INBOX:
                 LOG.info('[Inbox] Announcing inbox message.')
                 notification = format_inbox_message(message)
-                await self.client.send_message(self.inbox_chan, notification)
-                message.mark_as_read()
+                self.outbox.put(settings.DISCORD_INBOX_CHAN_ID, notification)
+                read_marker.add(message)
+                return True
+
+        return False
 
     # ======================================================
 
@@ -101,7 +164,7 @@ class DiscordBot:
         if self.oc_stream_placeholder.get(multi, None) is None:
             limit = 25
         else:
-            limit = round(40 * RUN_INTERVAL)
+            limit = round(40 * self._poll_minutes('oc:' + multi))
 
         oc_stream = list(oc_multi.get_new(limit=limit,
                                           place_holder=self.oc_stream_placeholder.get(multi, None)))
@@ -124,112 +187,175 @@ class DiscordBot:
                 LOG.info('[OC] OC Post from /u/%s found: %s',
                          submission.author.name, submission.permalink)
 
-                await self.client.send_message(self.oc_chan,
-                                               '---\nNew __OC__ by ``/u/{}``:\r\n{}'.format(
-                                                   submission.author.name, submission.permalink))
+                self.outbox.put(settings.DISCORD_OC_CHAN_ID,
+                                '---\nNew __OC__ by ``/u/{}``:\r\n{}'.format(
+                                    submission.author.name, submission.permalink))
 
             x += 1
 
-        self.oc_stream_placeholder[multi] = oc_stream[0].id
+        if oc_stream:
+            self.oc_stream_placeholder[multi] = oc_stream[0].id
 
         self.count_oc += x
         LOG.info('[OC] Proccessed %s %s items', x, multi)
+        return x
     # ======================================================
 
-    async def _process_github_events(self):
+    def _poll_github_events(self, number):
+        """
+        Fetch up to `number` of the newest repository events, newest first.
 
-        repo = self.ghub.repository(settings.GITHUB_REPO_USER, settings.GITHUB_REPO_NAME)
+        Requests are conditional on the ETag of the previous poll, and GitHub
+        doesn't count a 304 against our rate limit, so an idle repository is
+        free to poll. Returns None if nothing changed, or if GitHub's
+        X-Poll-Interval hasn't passed since the last poll.
+        """
+        now = monotonic()
+        if now < self.gh_next_poll:
+            LOG.debug('[GitHub] Poll interval not yet elapsed; skipping.')
+            return None
 
-        max_length = round(20 * RUN_INTERVAL)
+        e_i = self.gh_repo.iter_events(number=number, etag=self.gh_etag)
+        events = list(e_i)
 
-        event_queue = deque(maxlen=max_length)
+        # the iterator won't replace an ETag it was given, so take the new one
+        # from the response itself.
+        response = e_i.last_response
+        if response is not None:
+            self.gh_etag = response.headers.get('ETag', self.gh_etag)
+            self.gh_next_poll = now + int(response.headers.get('X-Poll-Interval', 0))
 
-        e_i = repo.iter_events(number=max_length)
+        if e_i.last_status == 304:
+            LOG.debug('[GitHub] Events not modified since last poll.')
+            return None
 
-        cont_loop = True
-        date_max = (datetime.datetime.today() + datetime.timedelta(days=-1)).utctimetuple()
+        return events
+
+    async def _process_github_events(self):
+        max_length = round(20 * self._poll_minutes('github'))
 
         LOG.debug('[GitHub] Loading events from GitHub...')
-        while cont_loop:
-            event = e_i.next()
+        events = self._poll_github_events(max_length)
+        if not events:
+            return 0
+
+        event_queue = deque(maxlen=max_length)
+        date_max = (datetime.datetime.today() + datetime.timedelta(days=-1)).utctimetuple()
 
+        new = 0
+        for event in events:
             if event.id == self.last_github_event:
-                cont_loop = False
-                continue
+                break
 
+            new += 1
             self.count_gh_events += 1
 
-            if len(event_queue) == max_length:
-                cont_loop = False
-                continue
-
-            if event.created_at.utctimetuple() >= date_max:
-                if event.type in EVENT_FILTER:
-                    event_queue.append(event)
+            if event.created_at.utctimetuple() < date_max:
+                break
 
-            else:
-                cont_loop = False
+            if event.type in EVENT_FILTER:
+                event_queue.append(event)
 
         LOG.info('[GitHub] New GitHub Events: %s', len(event_queue))
 
         # All events queued... now send events to channel
         while len(event_queue) > 0:
-            event = event_queue.pop()
-            if event.type == 'PushEvent':
-                LOG.info('[GitHub] Sending new PushEvent...')
-                await self.client.send_message(self.github_chan, format_github_push_event(event))
-
-            elif event.type == 'IssuesEvent':
-                LOG.info('[GitHub] Sending new IssuesEvent...')
-                await self.client.send_message(self.github_chan, format_github_issue_event(event))
-
-            elif event.type == 'IssueCommentEvent':
-                LOG.info('[GitHub] Sending new IssueCommentEvent...')
-                await self.client.send_message(self.github_chan, format_github_issue_comment(event))
-
-            elif event.type == 'PullRequestEvent':
-                await self.client.send_message(self.github_chan, format_github_pull_request(event))
+            self._announce_github_event(event_queue.pop())
 
-        self.last_github_event = repo.iter_events(number=1).next().id
+        # events come newest first, so the cursor is already in hand.
+        self.last_github_event = events[0].id
+        return new
 
-    # ======================================================
+    # ------------------------------------
 
-    async def _process_network_modlog(self, multi):
-        action_queue = deque(maxlen=25)
-        url = 'https://www.reddit.com/user/{}/m/{}/about/log'.format(
-            settings.MULTIREDDIT_USER, multi)
+    def _announce_github_event(self, event):
+        LOG.info('[GitHub] Sending new %s...', event.type)
+        self.outbox.put(settings.DISCORD_GITHUB_CHAN_ID, format_github_event(event))
 
-        if self.last_modlog_action.get(multi, None) is None:
-            limit = 50
-        else:
-            limit = round(50 * RUN_INTERVAL)
+    def _start_webhook(self, loop):
+        """Receive GitHub events by webhook, announcing them from `loop`."""
+        def on_event(event):
+            self.count_gh_events += 1
+            loop.call_soon_threadsafe(self._announce_github_event, event)
 
-        LOG.debug('[ModLog] Getting %s modlog: limit=%s place_holder=%s',
-                  multi, limit, self.last_modlog_action.get(multi, None))
+        addr = (settings.GITHUB_WEBHOOK_HOST, self.settings.WEBHOOK_PORT or settings.GITHUB_WEBHOOK_PORT)
+        try:
+            self.webhook = WebhookServer(addr, settings.GITHUB_WEBHOOK_SECRET, on_event)
+        except (ValueError, OSError) as ex:
+            LOG.error('[Webhook] Not receiving GitHub webhooks: %s', ex)
+            return False
 
-        content = self.reddit.get_content(url, limit=limit,
-                                          place_holder=self.last_modlog_action.get(multi, None))
+        self.webhook.start()
+        return True
 
-        modlog = list(content)
+    # ======================================================
 
-        LOG.info('[ModLog] Processing %s %s modlog actions...', len(modlog), multi)
-        self.count_modlog += len(modlog)
+    async def _process_bot_events(self):
+        events = self.event_reader.read(EVENTS_BATCH)
+        for event in events:
+            self.outbox.put(settings.DISCORD_EVENTS_CHAN_ID, format_bot_event(event))
 
-        for entry in [e for e in modlog if e.action in MODLOG_ACTIONS]:
+        if events:
+            LOG.info('[Events] Relaying %s bot event(s)', len(events))
+        self.count_bot_events += len(events)
+        return len(events)
 
-            if entry.id == self.last_modlog_action.get(multi, None):
-                LOG.debug('[ModLog] Found previous %s modlog placeholder entry.', multi)
-                break
+    # ======================================================
 
-            else:
-                action_queue.append(entry)
+    def _fetch_modlog(self, url, multi, action):
+        """
+        Fetch the `action` entries of a modlog that are newer than the last one
+        seen, newest first. The first fetch for a log only finds where it
+        currently ends, and returns nothing. Returns the new entries and how
+        many entries were fetched in all, anchoring fetches included.
+
+        The cursor is the (id, created_utc) of the newest entry seen. A log
+        with no entries yet gets (None, the time it was anchored), and is read
+        from the top and filtered on time until its first entry turns up.
+        """
+        cursor = self.modlog_cursor.get((multi, action))
+        params = {'type': action, 'limit': MODLOG_PAGE_SIZE}
+
+        if cursor is None:
+            params['limit'] = 1
+        elif cursor[0] is not None and time() - cursor[1] < MODLOG_CURSOR_MAX_AGE:
+            params['before'] = cursor[0]
+
+        LOG.debug('[ModLog] Getting %s %s modlog: params=%s', multi, action, params)
+
+        # limit=0 makes exactly one request, with our own 'limit' param.
+        entries = list(self.reddit.get_content(url, limit=0, params=params))
+        if entries:
+            self.modlog_cursor[(multi, action)] = (entries[0].id, entries[0].created_utc)
+        elif cursor is None:
+            self.modlog_cursor[(multi, action)] = (None, time())
+
+        if cursor is None:
+            return [], len(entries)
+        elif 'before' not in params:
+            return [e for e in entries if e.created_utc > cursor[1]], len(entries)
+        return entries, len(entries)
 
-        while len(action_queue) > 0:
-            entry = action_queue.pop()
+    async def _process_network_modlog(self, multi):
+        url = '{}/user/{}/m/{}/about/log'.format(
+            self.reddit.config.api_url, settings.MULTIREDDIT_USER, multi)
+
+        fetched = 0
+        new_entries = []
+        for action in MODLOG_ACTIONS:
+            entries, count = self._fetch_modlog(url, multi, action)
+            fetched += count
+            new_entries.extend(entries)
+
+        # announce everything in the order it happened
+        new_entries.sort(key=lambda e: e.created_utc)
+        for entry in new_entries:
             await self._announce_mod_action(entry)
 
-        self.last_modlog_action[multi] = modlog[0].id
-        LOG.debug('[ModLog] Finished processing %s modlog.', multi)
+        self.count_modlog += fetched
+        self.count_modlog_announced += len(new_entries)
+        LOG.info('[ModLog] %s: fetched %s entries, announced %s', multi, fetched, len(new_entries))
+        return len(new_entries)
 
     # ------------------------------------
 
@@ -237,7 +363,7 @@ class DiscordBot:
         message = format_mod_action(entry)
 
         LOG.info('[ModLog] Announcing modlog moderator %s action', entry.action)
-        await self.client.send_message(self.mod_chan, message)
+        self.outbox.put(settings.DISCORD_MOD_CHAN_ID, message)
 
     # ------------------------------------
 
@@ -249,14 +375,22 @@ class DiscordBot:
                 msg = 'Messages: **{}**\n'.format(self.count_messages) \
                     + 'Multireddit posts: **{}**\n'.format(self.count_oc) \
                     + 'GitHub Events: **{}**\n'.format(self.count_gh_events) \
-                    + 'Network Modlog Actions: **{}**\r\n'.format(self.count_modlog)
+                    + 'Bot Events: **{}**\n'.format(self.count_bot_events) \
+                    + 'Network Modlog Actions: **{}** fetched, **{}** announced\n'.format(
+                        self.count_modlog, self.count_modlog_announced) \
+                    + 'Discord Messages Sent: **{}** (**{}** announcements, **{}** queued)\r\n'.format(
+                        self.outbox.count_sent, self.outbox.count_items, len(self.outbox))
 
                 self.count_gh_events = 0
+                self.count_bot_events = 0
                 self.count_messages = 0
                 self.count_modlog = 0
+                self.count_modlog_announced = 0
                 self.count_oc = 0
+                self.outbox.count_sent = 0
+                self.outbox.count_items = 0
 
-                await self.client.send_message(self.stats_chan, msg)
+                self.outbox.put(settings.DISCORD_KEEPALIVE_CHAN_ID, msg)
 
             except Exception as ex:
                 LOG.error('%s: %s', type(ex), ex)
@@ -267,52 +401,97 @@ class DiscordBot:
         LOG.debug('[Inbox] Checking for new messages...')
         inbox = list(self.reddit.get_unread(limit=None))
         LOG.info('[Inbox] Unread messages: %s', len(inbox))
-        for message in inbox:
-            await self._relay_inbox_message(message)
+
+        relayed = 0
+        with ReadMarker(self.reddit) as read_marker:
+            for message in inbox:
+                if await self._relay_inbox_message(message, read_marker):
+                    relayed += 1
+
+        return relayed
 
     # ------------------------------------
 
-    async def _run_loop(self):
-        while True:
-            try:
-                await self._run_once()
-            except HTTPException as ex:
-                LOG.error('%s: %s', type(ex), ex)
-            except Exception as ex:
-                LOG.error('%s: %s', type(ex), ex)
+    def _poll_minutes(self, name):
+        """Minutes since the source `name` was last due, to size its fetch by."""
+        source = self.sources.get(name)
+        return source.interval / 60 if source is not None else RUN_INTERVAL
 
-            LOG.info('Sleeping for %s minute(s)...', RUN_INTERVAL)
-            print()
-            await asyncio.sleep(60 * RUN_INTERVAL)
+    def _poll_sources(self):
+        """Build the set of sources to poll from the bot settings."""
+        botsettings = self.settings
+        interval = 60 * botsettings.RUN_INTERVAL
+        floor = 60 * botsettings.MIN_INTERVAL
+        ceiling = 60 * botsettings.MAX_INTERVAL
 
+        def source(name, poll, cost):
+            return PollSource(name, poll, cost, interval, floor, ceiling)
 
-    async def _run_once(self):
-        try:
-            if self.settings.DO_INBOX or self.settings.DO_FALSEPOS:
-                await self._process_messages()
-                asyncio.sleep(5)
+        sources = []
+        if botsettings.DO_INBOX or botsettings.DO_FALSEPOS:
+            sources.append(source('inbox', self._process_messages, 1))
 
-            if self.settings.DO_GITHUB:
-                await self._process_github_events()
+        if botsettings.DO_GITHUB and self.webhook is None:
+            # GitHub has its own rate limit, and its own poll interval
+            sources.append(source('github', self._process_github_events, 0))
 
+        if botsettings.DO_OC:
             for multi in settings.MULTIREDDITS:
-                if self.settings.DO_OC:
-                    asyncio.sleep(5)
-                    await self._process_oc_stream(multi)
+                sources.append(source('oc:' + multi,
+                                      partial(self._process_oc_stream, multi), 1))
 
+        if botsettings.DO_MODLOG:
             for multi in settings.MULTIREDDITS + [settings.PARENT_SUB]:
-                if self.settings.DO_MODLOG:
-                    asyncio.sleep(5)
-                    await self._process_network_modlog(multi)
+                sources.append(source('modlog:' + multi,
+                                      partial(self._process_network_modlog, multi),
+                                      len(MODLOG_ACTIONS)))
 
+        if botsettings.DO_EVENTS and settings.EVENT_LOG:
+            if self.event_reader is None:
+                self.event_reader = EventReader(state_path(settings.EVENT_LOG))
+            sources.append(PollSource('events', self._process_bot_events, 0,
+                                      EVENTS_INTERVAL, EVENTS_MIN_INTERVAL, EVENTS_MAX_INTERVAL))
+
+        return sources
+
+    async def _run_loop(self):
+        sources = self._poll_sources()
+        self.sources = {source.name: source for source in sources}
+        if not sources:
+            LOG.warning('Nothing to poll.')
+            return
+
+        while True:
+            for source in sorted(sources, key=lambda s: s.next_run):
+                if source.next_run > monotonic():
+                    break
+
+                await self._run_source(source)
+
+            wait = max(min(s.next_run for s in sources) - monotonic(), 1)
+            LOG.debug('Sleeping for %.0f second(s)...', wait)
+            await asyncio.sleep(wait)
+
+    async def _run_source(self, source):
+        if not self.budget.try_acquire(source.cost):
+            source.next_run = monotonic() + self.budget.delay(source.cost)
+            LOG.debug('[%s] Request budget spent; deferring poll.', source.name)
+            return
+
+        count = 0
+        try:
+            count = await source.poll()
         except HTTPException as ex:
             LOG.error('%s: %s', type(ex), ex)
         except requests.ReadTimeout as ex:
             LOG.error('%s: %s', type(ex), ex)
         except requests.ConnectionError as ex:
             LOG.error('%s: %s', type(ex), ex)
-        else:
-            LOG.debug('All tasks processed.')
+        except Exception as ex:
+            LOG.error('%s: %s', type(ex), ex)
+
+        source.record(count, monotonic())
+        LOG.debug('[%s] Next poll in %.0f second(s)', source.name, source.interval)
 
     # ======================================================
 
@@ -322,14 +501,12 @@ class DiscordBot:
 
         LOG.info('[Discord] Logged in as %s', self.client.user.name)
 
-        self.inbox_chan = self.client.get_channel(settings.DISCORD_INBOX_CHAN_ID)
-        self.falsepos_chan = self.client.get_channel(settings.DISCORD_FALSEPOS_CHAN_ID)
-        self.github_chan = self.client.get_channel(settings.DISCORD_GITHUB_CHAN_ID)
-        self.oc_chan = self.client.get_channel(settings.DISCORD_OC_CHAN_ID)
-        self.mod_chan = self.client.get_channel(settings.DISCORD_MOD_CHAN_ID)
-        self.stats_chan = self.client.get_channel(settings.DISCORD_KEEPALIVE_CHAN_ID)
+        # Anything left over from a previous client goes out through this one.
+        self.outbox.attach(self.client)
+        self.outbox.start(self.client.loop)
+        LOG.info('[Discord] Outbox has %s undelivered item(s)', len(self.outbox))
 
-        await self.client.send_message(self.stats_chan, 'Ready: {}'.format(datetime.datetime.now()))
+        self.outbox.put(settings.DISCORD_KEEPALIVE_CHAN_ID, 'Ready: {}'.format(datetime.datetime.now()))
 
         if self.run_init:
             self.run_init = False
@@ -347,16 +524,20 @@ class DiscordBot:
             botsettings = DiscordBotSettings()
 
         self.settings = botsettings
+        self.budget = RateBudget(botsettings.REQUEST_BUDGET)
 
         global RUN_INTERVAL
         RUN_INTERVAL = botsettings.RUN_INTERVAL
         global STATS_INTERVAL
         STATS_INTERVAL = botsettings.STATS_INTERVAL
 
+        loop = asyncio.get_event_loop()
+        if botsettings.DO_GITHUB and botsettings.DO_WEBHOOK:
+            self._start_webhook(loop)
+
         while True:
             try:
                 LOG.info('[Discord] Starting Discord client...')
-                loop = asyncio.get_event_loop()
                 loop.run_until_complete(self.client.start(settings.DISCORD_TOKEN))
             except RuntimeError as ex:
                 LOG.error('%s: %s', type(ex), ex, exc_info=ex)
@@ -376,5 +557,11 @@ class DiscordBotSettings:
         self.DO_OC = True
         self.DO_INBOX = True
         self.DO_FALSEPOS = True
+        self.DO_WEBHOOK = False
+        self.DO_EVENTS = True
+        self.WEBHOOK_PORT = None
         self.RUN_INTERVAL = 2
+        self.MIN_INTERVAL = 0.5
+        self.MAX_INTERVAL = 10
+        self.REQUEST_BUDGET = 30  # reddit requests per minute
         self.STATS_INTERVAL = 15
@@ -32,22 +32,30 @@ MD_LINK_PATTERN = r'(\[)([^\]()#\n]+)\]\(([^\]()#\n]+)\)'
 MD_LINK_RE = re.compile(MD_LINK_PATTERN, flags=re.IGNORECASE)
 
 
-def is_relayable_message(message):
+def _mark_as_read(message, read_marker):
+    if read_marker is None:
+        message.mark_as_read()
+    else:
+        read_marker.add(message)
+
+def is_relayable_message(message, read_marker=None):
     """
     Determines if an inbox message is a type of message that should or should not be relayed
     to Discord. Does not relay mod removal or remove replies, blacklist requests, or messages
     from AutoModerator/reddit itself.
+
+    Messages that won't be relayed are marked as read, through `read_marker` if given.
     """
     #only matching remove exactly
     if (message.body == 'remove') or ('mod removal' in message.body):
         # Don't announce 'remove' or 'mod removal' replies
-        message.mark_as_read()
+        _mark_as_read(message, read_marker)
         LOG.info('[Inbox] Not announcing message type: "remove"/"mod removal"')
         return False
 
     elif message.subject.lower() == 'please blacklist me':
         # Don't announce blacklist requests
-        message.mark_as_read()
+        _mark_as_read(message, read_marker)
         LOG.info('[Inbox] Not announcing message type: "blacklist request"')
         return False
 
@@ -56,7 +64,7 @@ def is_relayable_message(message):
 
     elif message.author.name == 'AutoModerator':
         # Don't announce AutoModerator or reddit messages
-        message.mark_as_read()
+        _mark_as_read(message, read_marker)
         LOG.info('[Inbox] Not announcing message type: "AutoMod Response"')
         return False
 
@@ -224,6 +232,24 @@ def format_github_pull_request(event):
             return desc + url
 
 
+##------------------------------------
+
+def format_github_event(event):
+    """
+    Formats any of the GitHub events we relay, dispatching on the event type.
+    Returns None for events that shouldn't be announced.
+    """
+    formatter = {
+        'PushEvent': format_github_push_event,
+        'IssuesEvent': format_github_issue_event,
+        'IssueCommentEvent': format_github_issue_comment,
+        'PullRequestEvent': format_github_pull_request,
+    }.get(event.type)
+
+    if formatter is not None:
+        return formatter(event)
+
+
 #--------------------
 
 def format_mod_action(entry):
@@ -253,6 +279,30 @@ def format_mod_action(entry):
 
     return message
 
+#--------------------
+
+def format_bot_event(event):
+    """
+    Formats an event published by ion_bot to the local event log for Discord
+    """
+    event_type = event.get('type')
+
+    if event_type == 'crosspost':
+        return 'Crossposted to **/r/{}** (__{}__ `{}`): `{}`\r\n{}'.format(
+            event['subreddit'], event['reason'], event['detail'], event['title'], event['permalink'])
+
+    elif event_type == 'blacklisted':
+        return 'Not crossposting to {} (__{}__ blacklisted) by `/u/{}`: `{}`\r\n{}'.format(
+            ', '.join('**/r/{}**'.format(sub) for sub in event['subreddits']),
+            event['reason'], event['user'], event['title'], event['source'])
+
+    elif event_type == 'api_error':
+        return 'Bot API error `{}`: {}'.format(event['error'], event['message'])
+
+    elif event_type == 'stream_restart':
+        return 'Bot /r/all stream stopped (`{}`); restarting in {} minute(s)'.format(
+            event['reason'], event['retry_minutes'])
+
 #------------------------------
 
 
@@ -0,0 +1,189 @@
+"""
+Per-channel outbox for the Discord announcer.
+
+Announcements are queued by channel ID and merged into as few Discord messages
+as fit under the message length limit, then sent no faster than the channel's
+rate limit allows. The outbox outlives any single `discord.Client`, so whatever
+hasn't been delivered when the client is torn down is sent once a new client
+is attached.
+"""
+import asyncio
+from collections import deque
+import logging
+import time
+
+import discord
+
+LOG = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 2000
+SEPARATOR = '\n'
+
+# Discord allows 5 messages per 5 seconds in any one channel.
+CHANNEL_RATE = 5
+CHANNEL_PERIOD = 5  # seconds
+
+# How long to hold off a channel after a failed send.
+RETRY_DELAY = 30  # seconds
+
+
+def split_message(content, max_length=MAX_MESSAGE_LENGTH):
+    """
+    Split a single announcement that's too long for one Discord message,
+    preferring to break on line endings.
+    """
+    chunks = []
+    while len(content) > max_length:
+        cut = content.rfind('\n', 0, max_length)
+        if cut <= 0:
+            cut = max_length
+        chunks.append(content[:cut])
+        content = content[cut:].lstrip('\n')
+
+    if content:
+        chunks.append(content)
+
+    return chunks
+
+
+def coalesce(items, max_length=MAX_MESSAGE_LENGTH):
+    """
+    Merge queued announcements, front first, into one message no longer than
+    `max_length`. Returns the message and the number of items it covers.
+    """
+    message = items[0]
+    count = 1
+    for item in list(items)[1:]:
+        if len(message) + len(SEPARATOR) + len(item) > max_length:
+            break
+        message += SEPARATOR + item
+        count += 1
+
+    return message, count
+
+
+class DiscordOutbox:
+    """Queues, merges and paces announcements bound for Discord channels."""
+
+    def __init__(self, max_length=MAX_MESSAGE_LENGTH, rate=CHANNEL_RATE, period=CHANNEL_PERIOD):
+        self.max_length = max_length
+        self.rate = rate
+        self.period = period
+
+        self.client = None
+        self.pending = dict()
+        self._sent = dict()
+        self._hold = dict()
+
+        self._task = None
+        self._wakeup = None
+
+        self.count_items = 0
+        self.count_sent = 0
+
+    # ------------------------------------
+
+    def attach(self, client):
+        """Start delivering through `client`."""
+        self.client = client
+        self._wake()
+
+    def detach(self):
+        """Stop delivering; queued items are kept for the next client."""
+        self.client = None
+
+    def start(self, loop):
+        """Schedule the delivery task on `loop`, unless it's already running."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run(), loop=loop)
+
+    def put(self, channel_id, content):
+        """Queue an announcement for the channel with the given ID."""
+        if not content:
+            return
+
+        if channel_id is None:
+            LOG.warning('[Outbox] No channel configured; dropping announcement.')
+            return
+
+        queue = self.pending.setdefault(channel_id, deque())
+        queue.extend(split_message(content, self.max_length))
+        self.count_items += 1
+        self._wake()
+
+    def __len__(self):
+        return sum(len(q) for q in self.pending.values())
+
+    # ------------------------------------
+
+    def _wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _delay(self, channel_id, now):
+        """Seconds until another message may be sent to the channel."""
+        delay = self._hold.get(channel_id, 0) - now
+
+        sent = self._sent.get(channel_id)
+        if sent is not None and len(sent) == self.rate:
+            delay = max(delay, sent[0] + self.period - now)
+
+        return max(delay, 0)
+
+    async def _send(self, channel_id):
+        queue = self.pending[channel_id]
+        message, count = coalesce(queue, self.max_length)
+
+        try:
+            await self.client.send_message(discord.Object(id=channel_id), message)
+
+        except (discord.Forbidden, discord.NotFound) as ex:
+            # retrying won't help, so don't let these block the channel.
+            LOG.error('[Outbox] Dropping %s item(s) for channel %s: %s', count, channel_id, ex)
+
+        except Exception as ex:
+            LOG.error('[Outbox] Send to channel %s failed, retrying in %ss: %s: %s',
+                      channel_id, RETRY_DELAY, type(ex), ex)
+            self._hold[channel_id] = time.monotonic() + RETRY_DELAY
+            return
+
+        else:
+            self.count_sent += 1
+            self._sent.setdefault(channel_id, deque(maxlen=self.rate)).append(time.monotonic())
+
+        for _ in range(count):
+            queue.popleft()
+
+    async def flush(self):
+        """
+        Send everything the rate limits currently allow. Returns how long to
+        wait before more can be sent, or None if there's nothing left to send.
+        """
+        wait = None
+        for channel_id in list(self.pending):
+            queue = self.pending[channel_id]
+            while queue and self.client is not None:
+                delay = self._delay(channel_id, time.monotonic())
+                if delay > 0:
+                    wait = delay if wait is None else min(wait, delay)
+                    break
+
+                await self._send(channel_id)
+
+        return wait
+
+    async def run(self):
+        """Deliver queued announcements until cancelled."""
+        self._wakeup = asyncio.Event()
+
+        while True:
+            self._wakeup.clear()
+
+            wait = None
+            if self.client is not None:
+                wait = await self.flush()
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
@@ -1,81 +1,90 @@
 import click
 import time
-import datetime
-from time import gmtime
-from datetime import date
+from datetime import date, datetime
 from images_of import command, settings, Reddit
+from images_of.modlog import PAGE_SIZE, ModlogArchive
+from images_of.roster import ROSTER_FILE, ModRoster
+from images_of.state import state_path
+
+ARCHIVE_FILE = 'modlog.sqlite3'
 
 @command
-@click.option('--history-days', help='How many days back into the modlog run. Default is 30 days', default=60)
-def main(history_days):
+@click.option('--history-days', help='How many days back into the modlog run. Default is 60 days', default=60)
+@click.option('--no-sync', is_flag=True, help='Report from the local archive without fetching new entries')
+@click.option('--actions', is_flag=True, help='Break each mod\'s actions down by type')
+def main(history_days, no_sync, actions):
     """Process modlogs to identify inactive mods"""
-    
+
     mods = settings.DEFAULT_MODS
 
-    r = Reddit('{} ModLog Auditor v0.1 - /u/{}'.format(settings.NETWORK_NAME, settings.USERNAME))
+    r = Reddit('{} ModLog Auditor v0.2 - /u/{}'.format(settings.NETWORK_NAME, settings.USERNAME))
     r.oauth()
 
     subs = sorted([sub['name'] for sub in settings.CHILD_SUBS])
-    
-    end_utc = gmtime(time.time() - 60 * 60 * 24 * history_days)
-    end_date = date(end_utc[0], end_utc[1], end_utc[2])
-    
+
+    since = time.time() - 60 * 60 * 24 * history_days
+    never = date(1901, 1, 1)
+
+    # find who actually moderates each sub
+    roster = ModRoster(state_path(ROSTER_FILE))
+    roster.refresh(r, subs)
+    roster.save()
+
+    sub_mods = {}
     for sub in subs:
-        print('Processing {} modlog...'.format(sub))
-        done = False
-        last = None
-        last_time = -1
-        count = 0
-        first_id = None
-        
-        s = r.get_subreddit(sub)
-        all_mods = [u.name for u in s.get_moderators()]
+        all_mods = roster.mods(sub)
         real_mods = [m for m in all_mods if m not in mods]
 
-        if not real_mods:   ## If no real moderators, don't process this subreddit modlog
-            continue
+        if real_mods:   ## If no real moderators, don't process this subreddit modlog
+            sub_mods[sub] = real_mods
+
+    with ModlogArchive(state_path(ARCHIVE_FILE)) as archive:
+        if no_sync:
+            new = {}
         else:
-            mod_action_count = dict()
-            mod_last_action = dict()
-
-            while not done:
-                log = list(s.get_mod_log(limit=50, params={"after": last}))
-
-                if len(log) == 0:
-                    done = True
-                    break
-                else:
-                    last = log[-1].id
-                
-                for log_entry in [l for l in log if l.mod in real_mods]:
-                    
-                    created_utc = log_entry.created_utc
-                    time_utc = gmtime(created_utc)
-                    date_utc = date(time_utc[0], time_utc[1], time_utc[2])
-
-                    if date_utc >= end_date:
-                        mod_action_count[log_entry.mod] = mod_action_count.get(log_entry.mod, 0) + 1
-                        
-                        if date_utc > mod_last_action.get(log_entry.mod, date(1901, 1, 1)):
-                            mod_last_action[log_entry.mod] = date_utc
-                            
-                    # Reached end date
-                    else:
-                        done = True
-                        break
-                    
-
-                if count >= 5000:
-                    done = True
-                    break
-                    
-                count += 100
-
-
-        print('Subredit Moderation Log Stats for {}:\t\t({} entries parsed)'.format(sub, count))
-        for m in real_mods:
-            print('    {}:\n\tActions: {}  \tLast Active: {}'.format(m, mod_action_count.get(m, 0), mod_last_action.get(m, date(1901, 1, 1)))) 
-        print()
+            print('Fetching modlogs for {} subs...'.format(len(sub_mods)))
+            new = archive.sync_many(r, list(sub_mods), since)
+            update_roster(archive, roster)
+
+        for sub, real_mods in sorted(sub_mods.items()):
+            activity = archive.mod_activity(sub, since, real_mods)
+
+            print('Subredit Moderation Log Stats for {}:\t\t({} new entries archived)'.format(
+                sub, new.get(sub.lower(), 0)))
+            for m in real_mods:
+                count, last = activity.get(m, (0, None))
+                last_date = datetime.utcfromtimestamp(last).date() if last else never
+                print('    {}:\n\tActions: {}  \tLast Active: {}'.format(m, count, last_date))
+                if actions and count:
+                    for action, n in sorted(archive.action_counts(sub, since, m).items()):
+                        print('\t    {}: {}'.format(action, n))
+            print()
+
+        if not no_sync:
+            # what reading each sub's modlog on its own would have taken
+            per_sub = sum(n // PAGE_SIZE + 1 for n in new.values())
+            print('{} modlog requests made, against {} reading each sub separately'.format(
+                archive.requests, per_sub))
+
+
+def update_roster(archive, roster):
+    """Bring the mod roster up to date with moderator changes in the modlog."""
+    if roster.apply_modlog(archive.moderator_changes(roster.oldest_fetch())):
+        roster.save()
+
+
+def sync(r, history_days=60, budget=None):
+    """
+    Top up the modlog archive for every child sub, and the mod roster with
+    it, spending a request from `budget` for each page of modlog read.
+    """
+    subs = sorted([sub['name'] for sub in settings.CHILD_SUBS])
+    since = time.time() - 60 * 60 * 24 * history_days
+
+    with ModlogArchive(state_path(ARCHIVE_FILE)) as archive:
+        new = archive.sync_many(r, subs, since, budget=budget)
+        update_roster(archive, ModRoster(state_path(ROSTER_FILE)))
+        return new
 
 
 if __name__ == '__main__':
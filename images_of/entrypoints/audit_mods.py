@@ -1,10 +1,14 @@
 import click
 
 from images_of import command, settings, Reddit
+from images_of.roster import ROSTER_FILE, ModRoster
+from images_of.state import state_path
 
 @command
 @click.option('--print-mods', is_flag=True, help='List the non-default moderators for all subreddits')
-def main(print_mods):
+@click.option('--refresh', is_flag=True, help='Refetch every moderator list, however recent')
+@click.option('--changes', is_flag=True, help='List moderator changes since the last snapshot')
+def main(print_mods, refresh, changes):
     """Find subs without mods and disenfranchised mods"""
     
     mods = settings.DEFAULT_MODS
@@ -16,12 +20,15 @@ def main(print_mods):
     empty_subs = list()
     
     orphan_mods = dict()
-    s = r.get_subreddit(settings.PARENT_SUB)
-    main_sub_mods = [u.name for u in s.get_moderators()]
+
+    roster = ModRoster(state_path(ROSTER_FILE))
+    roster.refresh(r, [settings.PARENT_SUB] + subs, force=refresh)
+    roster.save()
+
+    main_sub_mods = roster.mods(settings.PARENT_SUB)
     
     for sub in subs:
-        s = r.get_subreddit(sub)
-        cur_mods = [u.name for u in s.get_moderators()]
+        cur_mods = roster.mods(sub)
         real_mods = [m for m in cur_mods if m not in mods]
 
         if not real_mods:
@@ -48,5 +55,14 @@ def main(print_mods):
     for m, s in orphan_mods.items():
         print('{} : {}'.format(m, s))
 
+    if changes:
+        diff = roster.diff()
+        print()
+        print('Moderator Changes: {}'.format(len(diff)))
+        print('-----------------------')
+
+        for sub, (added, removed) in sorted(diff.items()):
+            print('{} : +{} -{}'.format(sub, added, removed))
+
 if __name__ == '__main__':
     main()
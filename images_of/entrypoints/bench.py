@@ -0,0 +1,168 @@
+import json
+import re
+import subprocess
+import sys
+from time import monotonic, sleep
+
+import click
+
+# seconds `ion <command> --help` may take before we call it a regression
+STARTUP_BUDGET = 1.0
+
+
+@click.group()
+def main():
+    """Benchmarks guarding against slowdowns."""
+
+
+@main.command()
+@click.option('-n', '--repeat', default=5, help='Runs of each command; the fastest counts')
+@click.option('--budget', default=STARTUP_BUDGET, help='Seconds each command may take to start')
+@click.argument('commands', nargs=-1)
+def startup(repeat, budget, commands):
+    """
+    Time how long `ion --help` and `ion <command> --help` take, for the given
+    commands or all of them. Fails if any is over budget.
+    """
+    from images_of.cli import COMMANDS
+
+    names = commands or [''] + sorted(COMMANDS)
+    over = []
+    for name in names:
+        argv = [sys.executable, '-m', 'images_of.cli'] + ([name] if name else []) + ['--help']
+
+        times = []
+        for _ in range(repeat):
+            start = monotonic()
+            proc = subprocess.run(argv, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            times.append(monotonic() - start)
+
+            if proc.returncode != 0:
+                raise click.ClickException('`ion {} --help` failed:\n{}'.format(
+                    name, proc.stderr.decode('utf-8', 'replace')))
+
+        best = min(times)
+        if best > budget:
+            over.append(name)
+        print('{:<24} {:6.3f}s{}'.format(('ion ' + name).strip(), best,
+                                        '  over budget' if best > budget else ''))
+
+    if over:
+        raise click.ClickException('{} command(s) took more than {}s to start'.format(
+            len(over), budget))
+
+
+
+def load_titles(path):
+    """Titles from a corpus file: a JSON post with a 'title' per line, or just the title."""
+    titles = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('{'):
+                titles.append(json.loads(line)['title'])
+            elif line:
+                titles.append(line)
+    return titles
+
+
+@main.command()
+@click.option('-b', '--backend', 'backends', multiple=True, type=click.Choice(['re', 're2']),
+              help='Backend to time. May be repeated; defaults to all installed')
+@click.option('-n', '--repeat', default=3, help='Passes over the corpus; the fastest counts')
+@click.argument('corpus', type=click.Path(exists=True))
+def regex(backends, repeat, corpus):
+    """
+    Time every sub's title rules over a corpus of titles, once per regex
+    backend, and check the backends agree on which sub each title matches.
+    """
+    from images_of import settings
+    from images_of.matcher import available_backends, compile_terms
+
+    titles = load_titles(corpus)
+    subs = settings.CHILD_SUBS + settings.COUSIN_SUBS
+
+    results = {}
+    for backend in backends or available_backends():
+        rules = [(sub['name'],
+                  compile_terms(sub.get('ignore_case'), backend=backend,
+                                name='/r/{} ignore-case'.format(sub['name'])),
+                  compile_terms(sub.get('ignore'), re.IGNORECASE, backend=backend,
+                                name='/r/{} ignore'.format(sub['name'])),
+                  compile_terms(sub['search'], re.IGNORECASE, backend=backend,
+                                name='/r/{} search'.format(sub['name'])))
+                 for sub in subs]
+
+        times = []
+        for _ in range(repeat):
+            start = monotonic()
+            matched = []
+            for title in titles:
+                matched.append([name for name, ignore_case, ignore, search in rules
+                                if not (ignore_case and ignore_case.search(title))
+                                and not (ignore and ignore.search(title))
+                                and search.search(title)])
+            times.append(monotonic() - start)
+
+        results[backend] = matched
+        best = min(times)
+        print('{:<4} {:8.3f}s {:10.0f} titles/s {:8} matches'.format(
+            backend, best, len(titles) / best if best else 0, sum(map(len, matched))))
+
+    backends = sorted(results)
+    for other in backends[1:]:
+        differ = sum(a != b for a, b in zip(results[backends[0]], results[other]))
+        if differ:
+            print('{} and {} disagree on {} of {} titles'.format(backends[0], other, differ, len(titles)))
+
+
+
+class SlowStream:
+    """A stream taking `delay` seconds over each write, like a slow terminal."""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def write(self, text):
+        if self.delay:
+            sleep(self.delay)
+
+    def flush(self):
+        pass
+
+
+@main.command('logging')
+@click.option('-n', '--records', default=10000, help='Records to log, and as many filtered out')
+@click.option('--slow', default=0.0001, help='Seconds each write to the output takes')
+def logging_(records, slow):
+    """
+    Time logging calls with the handlers called directly and through the
+    queue, writing to output taking --slow seconds per record.
+    """
+    import logging
+    from images_of.logqueue import queue_logging
+
+    for queued in (False, True):
+        logger = logging.getLogger('images_of.bench.{}'.format('queued' if queued else 'direct'))
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        handler = logging.StreamHandler(SlowStream(slow))
+        handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(name)s: %(message)s'))
+        logger.addHandler(handler)
+        listener = queue_logging([logger]) if queued else None
+
+        start = monotonic()
+        for n in range(records):
+            logger.info('X-Posting into /r/%s: %s', 'imagesofnetwork', n)
+            logger.debug('Added %s to recent posts. Now tracking %s items.', n, n)
+        logged = monotonic() - start
+        if listener is not None:
+            listener.stop()
+        written = monotonic() - start
+
+        print('{:<7} {:8.1f}us per call {:8.3f}s until written'.format(
+            'queued' if queued else 'direct', 1e6 * logged / (2 * records), written))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,34 @@
 import logging
 
 from images_of import command, settings, Reddit
+from images_of.blacklist import ShardedBlacklist
+from images_of.inbox import ReadMarker
+from images_of.mailqueue import QUEUE_FILE, MailQueue
+from images_of.ratelimit import RateBudget, paced
+from images_of.state import load_json, save_json, state_path
 
 LOG = logging.getLogger(__name__)
 
+# replies are keyed by the request they answer, so each is sent once
+REPLY_KEY = 'blacklist-reply:'
+
+# where we got to in modmail and the inbox
+STATE_FILE = 'blacklist-requests.json'
+
+# messages looked at on a first run, before there's a high-water mark
+FIRST_RUN_LIMIT = 100
+
+ALREADY_ADDED_MESSAGE = ('It appears that you are already on the {} Network blacklist.\r\n\n'
+                         .format(settings.NETWORK_NAME))
+ALREADY_ADDED_MESSAGE += 'If your images are still being crossposted, please let us know so we can investigate.\n'
+ALREADY_ADDED_MESSAGE += '\n**Please note**: If you were recently added to the blacklist, it may take 24 hours '
+ALREADY_ADDED_MESSAGE += 'before the blacklist is updated on the bot and takes effect.'
+
+SUCCESS_MESSAGE = 'You have been added to the user blacklist and your images will no longer be'
+SUCCESS_MESSAGE += (' crossposted on the {} Network.'.format(settings.NETWORK_NAME))
+SUCCESS_MESSAGE += '\n\n**Please note**: it may take 24+ hours before the blacklist on the bot is updated '
+SUCCESS_MESSAGE += 'and this change takes effect.'
+
 
 @command
 def main():
@@ -11,137 +36,117 @@ def main():
     Check for blacklist requests and add users to blacklist.
     """
 
-    r = Reddit('{} Update User-Requested Blacklist v0.3 /u/{}'
+    r = Reddit('{} Update User-Requested Blacklist v0.4 /u/{}'
                .format(settings.NETWORK_NAME, settings.USERNAME))
     r.oauth()
 
-    process_modmail(r)
-    process_inbox(r)
-
-
-def process_modmail(r):
-    add_users = set()
-    orig_blacklist = set()
-    requests = list()
-
-    sub = settings.PARENT_SUB
-
-    modmail_inbox = r.get_mod_mail(sub)
-
-
-    already_added_message = ('It appears that you are already on the {} Network blacklist.\r\n\n'
-                             .format(settings.NETWORK_NAME))
-    already_added_message += 'If your images are still being crossposted, please let us know so we can investigate.\n'
-    already_added_message += '\n**Please note**: If you were recently added to the blacklist, it may take 24 hours '
-    already_added_message += 'before the blacklist is updated on the bot and takes effect.'
+    run(r)
 
-    success_message = 'You have been added to the user blacklist and your images will no longer be'
-    success_message += (' crossposted on the {} Network.'.format(settings.NETWORK_NAME))
-    success_message += "\n\n**Please note**: it may take 24+ hours before the blacklist on the bot is updated "
-    success_message += 'and this change takes effect.' 
 
-    for m in [i for i in modmail_inbox if not i.replies]:
+def run(r, budget=None):
+    """
+    Handle blacklist requests that have come in since the last run, spending
+    `budget` for every request made.
+    """
+    budget = budget or RateBudget()
+    state_file = state_path(STATE_FILE)
+    state = load_json(state_file, {})
 
-        if any('blacklist me' in i.lower() for i in (m.subject, m.body)):
+    modmail_listing = r.get_mod_mail(settings.PARENT_SUB, **listing_limit(state, 'modmail'))
+    modmail, modmail_mark = new_messages(paced(modmail_listing, budget), state.get('modmail', 0))
 
-            if not len(orig_blacklist):
-                orig_blacklist = get_user_blacklist(r)
+    inbox_listing = r.get_messages(**listing_limit(state, 'inbox'))
+    inbox, inbox_mark = new_messages(paced(inbox_listing, budget), state.get('inbox', 0))
 
-            author = m.author.name.lower()
-            if '/u/{}'.format(author) not in orig_blacklist:
-                add_users.add(author)
-                requests.append(m)
+    requests = [m for m in modmail if is_modmail_request(m)]
+    inbox_requests = [m for m in inbox if is_inbox_request(m)]
+    LOG.info('%s new modmail and %s new inbox blacklist request(s) among %s new message(s)',
+             len(requests), len(inbox_requests), len(modmail) + len(inbox))
+    requests += inbox_requests
 
-            else:
-                m.reply(already_added_message)
-                LOG.info('User {} is already in blacklist; skipping'.format(m.author.name))
+    with MailQueue(state_path(QUEUE_FILE)) as queue, \
+            ReadMarker(r, budget=budget) as read_marker:
+        if requests:
+            process_requests(r, queue, requests, budget)
+        else:
+            LOG.info('No new blacklist requests to process')
 
-    if add_users:
+        for m in inbox_requests:
+            read_marker.add(m)
 
-        if update_user_blacklist(r, add_users, orig_blacklist):
-            for m in requests:
-                m.reply(success_message)
+        # the requests are handled and their replies safely queued
+        state.update(modmail=modmail_mark, inbox=inbox_mark)
+        save_json(state_file, state)
 
-    else:
-        LOG.info('No new modmail blacklist requests to process')
+        queue.drain(r, budget, prefix=REPLY_KEY)
 
-def process_inbox(r):
-    add_users = set()
-    orig_blacklist = set()
-    requests = list()
 
-    inbox = r.get_messages()
+def listing_limit(state, source):
+    """Page back to the high-water mark, or just the latest page on a first run."""
+    return {'limit': None if source in state else FIRST_RUN_LIMIT}
 
-    already_added_message = ('It appears that you are already on the {} Network blacklist.\r\n\n'
-                             .format(settings.NETWORK_NAME))
-    already_added_message += 'If your images are still being crossposted, please let us know so we can investigate.\n'
-    already_added_message += '\n**Please note**: If you were recently added to the blacklist, it may take 24 hours '
-    already_added_message += 'before the blacklist is updated on the bot and takes effect.'
 
-    success_message = 'You have been added to the user blacklist and your images will no longer be'
-    success_message += (' crossposted on the {} Network.'.format(settings.NETWORK_NAME))
-    success_message += '\n\n**Please note**: it may take 24+ hours before blacklist on the bot is updated '
-    success_message += 'and this change takes effect.' 
+def last_activity(m):
+    """When a message thread last saw a message."""
+    return max([m.created_utc] + [reply.created_utc for reply in m.replies])
 
-    for m in [i for i in inbox if not i.replies]:
 
-        if m.subject.lower() == 'please blacklist me':
-
-            if not len(orig_blacklist):
-                orig_blacklist = get_user_blacklist(r)
-
-            author = m.author.name.lower()
-            if '/u/{}'.format(author) not in orig_blacklist:
-                add_users.add(author)
-                requests.append(m)
+def new_messages(listing, mark):
+    """
+    The message threads in `listing` active since `mark`, and the new mark.
+    Listings run from most to least recently active, so we stop at the first
+    thread that hasn't been.
+    """
+    found = []
+    newest = mark
+    for m in listing:
+        active = last_activity(m)
+        if active <= mark:
+            break
+        newest = max(newest, active)
+        found.append(m)
+    return found, newest
 
-            else:
-                m.reply(already_added_message)
-                m.mark_as_read()
-                LOG.info('User %s is already in blacklist; skipping', m.author.name)
 
-    if add_users:
+def is_modmail_request(m):
+    return not m.replies and any('blacklist me' in i.lower() for i in (m.subject, m.body))
 
-        if update_user_blacklist(r, add_users, orig_blacklist):
-            for m in requests:
-                m.reply(success_message)
-                m.mark_as_read()
 
-    else:
-        LOG.info('No new inbox blacklist requests to process')
+def is_inbox_request(m):
+    return not m.replies and m.subject.lower() == 'please blacklist me'
 
 
+def queue_reply(queue, m, message):
+    queue.enqueue_reply(REPLY_KEY + m.fullname, m.fullname, message)
 
-def get_user_blacklist(r):
 
+def process_requests(r, queue, requests, budget=None):
+    """
+    Add the authors of `requests` to the blacklist in one wiki edit, and
+    queue a reply to each.
+    """
     LOG.debug('Getting network blacklist...')
-    dom = settings.PARENT_SUB
-    page = 'userblacklist'
-    dom_content = r.get_wiki_page(dom, page).content_md
-    orig_blacklist = dom_content.split()
-
-    return set(map(str.lower, orig_blacklist))
-
-
-def update_user_blacklist(r, add_users, orig_blacklist):
-    dom = settings.PARENT_SUB
-    page = 'userblacklist'
-    blacklist = set(orig_blacklist)
-
-    LOG.debug('Original blacklist: %s', orig_blacklist)
-    LOG.info('Adding users: %s', add_users)
-
-    blacklist.update(['/u/'+u for u in add_users])
-
-    if orig_blacklist == add_users:
-        LOG.info('User blacklist has not changed; not modifying the wiki')
-        return
+    blacklist = ShardedBlacklist(r, 'userblacklist', budget=budget)
+    orig_blacklist = blacklist.read()
+    add_users = set()
+    added = list()
 
-    new_content = '\n\n'.join(sorted(blacklist))
+    for m in requests:
+        author = m.author.name.lower()
+        if '/u/{}'.format(author) not in orig_blacklist:
+            add_users.add(author)
+            added.append(m)
 
-    r.edit_wiki_page(dom, page, new_content, 'Blacklist requests for: {}'.format(add_users))
+        else:
+            queue_reply(queue, m, ALREADY_ADDED_MESSAGE)
+            LOG.info('User %s is already in blacklist; skipping', m.author.name)
 
-    return True
+    if add_users:
+        LOG.info('Adding users: %s', add_users)
+        blacklist.add(['/u/' + u for u in add_users],
+                      'Blacklist requests for: {}'.format(add_users))
+        for m in added:
+            queue_reply(queue, m, SUCCESS_MESSAGE)
 
 if __name__ == '__main__':
     main()
@@ -2,17 +2,24 @@ import click
 
 from images_of import command, settings, Reddit
 from images_of.bot import Bot
+from images_of.events import EventPublisher
+from images_of.state import state_path
 
 
 @command
 @click.option('--no-post', is_flag=True, help='Do not post to reddit.')
-def main(no_post):
+@click.option('--no-events', is_flag=True, help='Do not publish events to the local event log.')
+def main(no_post, no_events):
     """Reddit Network scraper and x-poster bot."""
 
     r = Reddit('{} v6.0 /u/{}'.format(settings.NETWORK_NAME, settings.USERNAME))
     r.oauth()
 
-    b = Bot(r, should_post=not no_post)
+    publisher = None
+    if settings.EVENT_LOG and not no_events:
+        publisher = EventPublisher(state_path(settings.EVENT_LOG))
+
+    b = Bot(r, should_post=not no_post, publisher=publisher)
     b.run()
 
 
@@ -1,11 +1,18 @@
+from hashlib import sha1
+
 import click
 
 from images_of import command, settings, Reddit
+from images_of.mailqueue import QUEUE_FILE, MailQueue
+from images_of.state import state_path
 
 @command
 @click.option('-s', '--subject', required=True, help='Message subject')
 @click.option('-m', '--message', required=True, help='Message body')
-def main(subject, message):
+@click.option('--requeue-unconfirmed', is_flag=True,
+              help='Resend mail interrupted mid-send by an earlier run. It may arrive twice.')
+@click.option('--requeue-failed', is_flag=True, help='Try again to send mail that failed before.')
+def main(subject, message, requeue_unconfirmed, requeue_failed):
     ok = True
     if not subject:
         print('Subject may not be empty')
@@ -16,13 +23,35 @@ def main(subject, message):
     if not ok:
         return
 
-    r = Reddit('{} Network Mailer v0.1 /u/{}'.format(settings.NETWORK_NAME, settings.USERNAME))
+    r = Reddit('{} Network Mailer v0.2 /u/{}'.format(settings.NETWORK_NAME, settings.USERNAME))
     r.oauth()
 
-    subs = ["/r/{}".format(sub['name']) for sub in settings.CHILD_SUBS]
-    for sub in subs:
-        print('Mailing {}'.format(sub))
-        r.send_message(sub, subject, message)
+    # the same mailing queued again, e.g. by a rerun, is the same mailing
+    mailing = 'bulkmail:{}:'.format(sha1((subject + '\0' + message).encode('utf-8')).hexdigest()[:12])
+
+    with MailQueue(state_path(QUEUE_FILE)) as queue:
+        if requeue_unconfirmed:
+            print('Requeued {} unconfirmed message(s)'.format(queue.requeue_unconfirmed()))
+        if requeue_failed:
+            print('Requeued {} failed message(s)'.format(queue.requeue_failed()))
+
+        subs = ["/r/{}".format(sub['name']) for sub in settings.CHILD_SUBS]
+        for sub in subs:
+            if queue.enqueue_message(mailing + sub, sub, subject, message):
+                print('Queued mail to {}'.format(sub))
+
+        unconfirmed = [key for key in queue.unconfirmed() if key.startswith(mailing)]
+        if unconfirmed:
+            print('Not resending {} message(s) interrupted mid-send; check them and use '
+                  '--requeue-unconfirmed: {}'.format(len(unconfirmed), ', '.join(unconfirmed)))
+
+        sent = queue.drain(r, prefix=mailing)
+        print('Mailed {} sub(s). Queue: {}'.format(sent, queue.counts()))
+
+        failed = [key for key, _ in queue.failed() if key.startswith(mailing)]
+        if failed:
+            print('Could not send {} message(s); use --requeue-failed to try them again: {}'
+                  .format(len(failed), ', '.join(failed)))
 
 if __name__ == '__main__':
     main()
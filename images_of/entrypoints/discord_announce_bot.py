@@ -1,6 +1,5 @@
 import click
 from images_of import command, settings, Reddit
-from images_of.discord_announcer import DiscordBot, DiscordBotSettings
 
 
 @command
@@ -9,10 +8,23 @@ from images_of.discord_announcer import DiscordBot, DiscordBotSettings
 @click.option('-O', '--no-oc', is_flag=True, help='Do not process network for OC submissions')
 @click.option('-I', '--no-inbox', is_flag=True, help='Do not process inbox for messages/replies')
 @click.option('-F', '--no-falsepositives', is_flag=True, help='Do not announce false-positive reports')
-@click.option('-r', '--run-interval', help='Number of minutes to process items', default=1)
+@click.option('-E', '--no-events', is_flag=True, help='Do not relay events from ion_bot\'s event log')
+@click.option('-W', '--webhook', is_flag=True,
+              help='Receive github events by webhook instead of polling for them')
+@click.option('--webhook-port', type=int, help='Port to receive github webhooks on')
+@click.option('-r', '--run-interval', help='Initial number of minutes between polls of each source', default=1)
+@click.option('--min-interval', default=0.5,
+              help='Fewest minutes between polls of a source, however busy it is')
+@click.option('--max-interval', default=10.0,
+              help='Most minutes between polls of a source, however quiet it is')
+@click.option('--request-budget', default=30,
+              help='Reddit requests per minute shared by all sources')
 @click.option('-s', '--stats-interval', help='Number of minutes to send stats info', default=15)
-def main(no_github, no_modlog, no_oc, no_inbox, no_falsepositives, run_interval, stats_interval):
+def main(no_github, no_modlog, no_oc, no_inbox, no_falsepositives, no_events, webhook, webhook_port,
+         run_interval, min_interval, max_interval, request_budget, stats_interval):
     """Discord Announcer Bot to relay specified information to designated Discord channels."""
+    # discord and github3 are slow to import; only pay for them when running
+    from images_of.discord_announcer import DiscordBot, DiscordBotSettings
 
     reddit = Reddit('{} Discord Announcer v1.1 - /u/{}'
                     .format(settings.NETWORK_NAME, settings.USERNAME))
@@ -27,8 +39,14 @@ def main(no_github, no_modlog, no_oc, no_inbox, no_falsepositives, run_interval,
     botsettings.DO_OC = not no_oc
     botsettings.DO_INBOX = not no_inbox
     botsettings.DO_FALSEPOS = not no_falsepositives
+    botsettings.DO_EVENTS = not no_events
+    botsettings.DO_WEBHOOK = webhook
+    botsettings.WEBHOOK_PORT = webhook_port
 
     botsettings.RUN_INTERVAL = run_interval
+    botsettings.MIN_INTERVAL = min_interval
+    botsettings.MAX_INTERVAL = max_interval
+    botsettings.REQUEST_BUDGET = request_budget
     botsettings.STATS_INTERVAL = stats_interval
 
     discobot.run(botsettings)
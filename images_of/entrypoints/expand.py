@@ -1,39 +1,70 @@
+from collections import deque
 import logging
 import re
 from textwrap import dedent
+from time import sleep, time
 
 import click
+import pytoml as toml
 from praw.errors import SubredditExists, RateLimitExceeded
 
 from images_of import command, settings, Reddit
+from images_of.roster import ROSTER_FILE, ModRoster
+from images_of.state import load_json, save_json, state_path
 
 DRY_RUN = False
 LOG = logging.getLogger(__name__)
 
 
+class ParentTemplate:
+    """
+    The parent sub's settings and wiki pages, which every new sub is set up
+    from. Each is fetched once, however many subs are being set up.
+    """
+
+    def __init__(self, r):
+        self.r = r
+        self._settings = None
+        self._wiki_pages = {}
+
+    def settings(self):
+        if self._settings is None:
+            LOG.info('Fetching settings from %s', settings.PARENT_SUB)
+            if not DRY_RUN:
+                self._settings = self.r.get_settings(settings.PARENT_SUB)
+            else:
+                self._settings = {'title': settings.NETWORK_NAME}
+
+        # callers customize their copy
+        return dict(self._settings)
+
+    def wiki_page(self, page):
+        if page not in self._wiki_pages:
+            LOG.info('Fetching wiki page "%s" from %s', page, settings.PARENT_SUB)
+            self._wiki_pages[page] = self.r.get_wiki_page(settings.PARENT_SUB, page).content_md
+        return self._wiki_pages[page]
+
+
 def create_sub(r, sub):
     try:
-        LOG.info('Attempting to create /r/{}'.format(sub))
+        LOG.info('Attempting to create /r/%s', sub)
         if not DRY_RUN:
             r.create_subreddit(sub, sub)
-        LOG.info('Created /r/{}'.format(sub))
+        LOG.info('Created /r/%s', sub)
     except SubredditExists:
-        LOG.warning('/r/{} exists'.format(sub))
+        LOG.warning('/r/%s exists', sub)
 
 
-def copy_settings(r, sub, topic):
-    LOG.info('Copying settings from {}'.format(settings.PARENT_SUB))
-    if not DRY_RUN:
-        sub_settings = r.get_settings(settings.PARENT_SUB)
-    else:
-        sub_settings = {'title': settings.NETWORK_NAME}
+def copy_settings(r, sub, topic, template):
+    LOG.info('Copying settings from %s', settings.PARENT_SUB)
+    sub_settings = template.settings()
 
-    LOG.debug('{}'.format(sub_settings))
+    LOG.debug('%s', sub_settings)
 
     sub_settings['title'] = "{} {}".format(sub_settings['title'], topic)
     sub_settings['public_description'] = 'Pictures and images of {}'.format(topic)
 
-    LOG.info('Copying settings to /r/{}'.format(sub))
+    LOG.info('Copying settings to /r/%s', sub)
 
     if DRY_RUN:
         return
@@ -51,35 +82,39 @@ def copy_settings(r, sub, topic):
         pass
 
 
-def invite_mods(r, sub):
+def invite_mods(r, sub, roster):
     mods = settings.DEFAULT_MODS
 
     if not DRY_RUN:
-        cur_mods = [u.name for u in r.get_moderators(sub)]
+        # a sub we just created has nothing worth trusting in the roster
+        roster.refresh(r, [sub], force=True)
+        cur_mods = roster.mods(sub)
     else:
         cur_mods = []
-    LOG.debug('current mods for /r/{}: {}'.format(sub, cur_mods))
+    LOG.debug('current mods for /r/%s: %s', sub, cur_mods)
 
-    need_mods = [mod for mod in mods if mod not in cur_mods]
+    need_mods = [mod for mod in mods if mod not in cur_mods and mod not in roster.pending(sub)]
     if not need_mods:
         LOG.info('All mods already invited.')
         return
     else:
-        LOG.info('Inviting moderators: {}'.format(need_mods))
+        LOG.info('Inviting moderators: %s', need_mods)
 
     if not DRY_RUN:
         s = r.get_subreddit(sub)
         for mod in need_mods:
             s.add_moderator(mod)
+            roster.record_invite(sub, mod)
+        roster.save()
 
     LOG.info('Mods invited.')
 
 
-def copy_wiki_pages(r, sub):
+def copy_wiki_pages(r, sub, template):
     for page in settings.WIKI_PAGES:
-        LOG.info('Copying wiki page "{}"'.format(page))
+        LOG.info('Copying wiki page "%s"', page)
         if not DRY_RUN:
-            content = r.get_wiki_page(settings.PARENT_SUB, page).content_md
+            content = template.wiki_page(page)
             r.edit_wiki_page(sub, page, content=content, reason='Subreddit stand-up')
 
 
@@ -97,11 +132,10 @@ def setup_flair(r, sub):
 
 def add_to_multi(r, sub, multi):
     if not multi:
-        LOG.warning("No multireddit to add /r/{} to.".format(sub))
+        LOG.warning("No multireddit to add /r/%s to.", sub)
         return
 
-    LOG.info('Adding /r/{} to /user/{}/m/{}'
-                 .format(sub, settings.MULTIREDDIT_USER, multi))
+    LOG.info('Adding /r/%s to /user/%s/m/%s', sub, settings.MULTIREDDIT_USER, multi)
 
     if DRY_RUN:
         return
@@ -110,7 +144,10 @@ def add_to_multi(r, sub, multi):
 
     # NOTE: for some reason, at least for this version of PRAW,
     # adding a sub to a multireddit requires us to be logged in.
-    r.login()
+    # Once is enough for however many subs we're adding.
+    if not getattr(r, 'ion_logged_in', False):
+        r.login()
+        r.ion_logged_in = True
     m.add_subreddit(sub)
 
 
@@ -123,8 +160,7 @@ def setup_notifications(r, sub):
         "filter-subreddits": []
         }""")
 
-    LOG.info('Requesting notifications about /r/{} from /u/Sub_Mentions'
-                 .format(sub))
+    LOG.info('Requesting notifications about /r/%s from /u/Sub_Mentions', sub)
 
     if not DRY_RUN:
         r.send_message('Sub_Mentions', 'Action: Subscribe',
@@ -133,6 +169,112 @@ def setup_notifications(r, sub):
 
 _start_points = ['creation', 'settings', 'mods', 'wiki', 'flair', 'multireddit', 'notifications']
 
+
+def sub_name(topic):
+    nice_topic = ''.join(re.findall('[A-Za-z0-9]', topic))
+    return settings.NETWORK_NAME + nice_topic
+
+
+def expansion_steps(r, sub, topic, multi, template, roster):
+    """The steps standing up a sub, in order, named by their start points."""
+    return [
+        ('creation', lambda: create_sub(r, sub)),
+        ('settings', lambda: copy_settings(r, sub, topic, template)),
+        ('mods', lambda: invite_mods(r, sub, roster)),
+        ('wiki', lambda: copy_wiki_pages(r, sub, template)),
+        ('flair', lambda: setup_flair(r, sub)),
+        ('multireddit', lambda: add_to_multi(r, sub, multi)),
+        ('notifications', lambda: setup_notifications(r, sub)),
+    ]
+
+
+def load_manifest(path, default_multi):
+    """
+    Read a batch manifest: a TOML file with a [[topic]] table per sub, e.g.
+
+        multi = 'ImagesOfPlaces'    # optional default for every topic
+
+        [[topic]]
+        name = 'Kyrgyzstan'
+
+        [[topic]]
+        name = 'The 1890s'
+        multi = 'ImagesOfTheDecades'
+
+    Returns a list of (topic, multi) pairs.
+    """
+    with open(path) as f:
+        manifest = toml.loads(f.read())
+
+    default_multi = manifest.get('multi', default_multi)
+    return [(t['name'], t.get('multi', default_multi)) for t in manifest.get('topic', [])]
+
+
+def expand_batch(r, topics, journal_path, should_do):
+    """
+    Stand up a sub for each (topic, multi) pair, recording each finished step
+    in the journal at `journal_path` so a rerun picks up where this one left
+    off.
+
+    reddit only lets us create a sub every so often. Rather than wait on that,
+    subs are worked round-robin: a sub whose creation is rate limited goes to
+    the back of the queue while the others carry on, and we only sleep when
+    every remaining sub is waiting.
+    """
+    template = ParentTemplate(r)
+    roster = ModRoster(state_path(ROSTER_FILE))
+    journal = load_json(journal_path, {})
+
+    queue = deque((topic, sub_name(topic), multi) for topic, multi in topics)
+    subs = {sub for _, sub, _ in queue}
+    while queue:
+        topic, sub, multi = queue.popleft()
+        entry = journal.setdefault(sub, {'topic': topic, 'multi': multi, 'done': []})
+
+        wait = entry.get('retry_at', 0) - time()
+        if wait > 0:
+            queue.append((topic, sub, multi))
+            soonest = min(journal[s].get('retry_at', 0) for _, s, _ in queue) - time()
+            if soonest > 0:
+                LOG.info('Waiting %.0fs for reddit to allow another sub', soonest)
+                sleep(soonest)
+            continue
+
+        LOG.info('Expanding into /r/%s', sub)
+        for point, step in expansion_steps(r, sub, topic, multi, template, roster):
+            if point in entry['done'] or not should_do(point):
+                continue
+
+            try:
+                step()
+            except RateLimitExceeded as e:
+                LOG.info('Rate limited at %s for /r/%s; retrying in %ss',
+                         point, sub, e.sleep_time)
+                entry['retry_at'] = time() + e.sleep_time
+                queue.append((topic, sub, multi))
+                break
+            except Exception as e:
+                LOG.error('/r/%s failed at %s: %s: %s', sub, point, type(e).__name__, e)
+                entry['failed'] = point
+                entry['error'] = str(e)
+                break
+            finally:
+                if not DRY_RUN:
+                    save_json(journal_path, journal)
+
+            entry['done'].append(point)
+            entry.pop('retry_at', None)
+            entry.pop('failed', None)
+            entry.pop('error', None)
+            if not DRY_RUN:
+                save_json(journal_path, journal)
+
+    # the journal may be shared with earlier manifests; only report this one
+    failed = sorted(sub for sub, entry in journal.items() if sub in subs and 'failed' in entry)
+    if failed:
+        LOG.warning('Unfinished subs, rerun to resume: %s', ', '.join(failed))
+
+
 @command
 @click.option('-m', '--multi', type=click.Choice(settings.MULTIREDDITS),
               default=settings.MULTIREDDITS[0], help="Which multireddit to add the new sub to.")
@@ -140,13 +282,19 @@ _start_points = ['creation', 'settings', 'mods', 'wiki', 'flair', 'multireddit',
               help='Where to start the process from.')
 @click.option('--only', type=click.Choice(_start_points),
               help='Only run one section of expansion script.')
+@click.option('--manifest', type=click.Path(exists=True),
+              help='TOML manifest of topics to expand into, resuming from the journal.')
+@click.option('--journal', type=click.Path(), help='Progress journal for --manifest runs.')
 @click.option('--dry-run', is_flag=True, help='Don\'t hit reddit')
-@click.argument('topic', required=True, nargs=-1)
-def main(multi, topic, start_at, only, dry_run):
+@click.argument('topic', nargs=-1)
+def main(multi, topic, start_at, only, manifest, journal, dry_run):
     """Prop up new subreddit and set it for the network."""
     global DRY_RUN
     DRY_RUN = dry_run
 
+    if bool(topic) == bool(manifest):
+        raise click.UsageError('Give either a topic or a --manifest.')
+
     if not DRY_RUN:
         r = Reddit('Expand {} Network v0.2 /u/{}'
                    .format(settings.NETWORK_NAME, settings.USERNAME))
@@ -154,10 +302,6 @@ def main(multi, topic, start_at, only, dry_run):
     else:
         r = None
 
-    topic = ' '.join(topic)
-    nice_topic = ''.join(re.findall('[A-Za-z0-9]', topic))
-    sub = settings.NETWORK_NAME + ''.join(nice_topic)
-
     # little helper script to check if we're at or after
     # where we want to start.
     def should_do(point):
@@ -170,26 +314,19 @@ def main(multi, topic, start_at, only, dry_run):
             return start_idx <= point_idx
         return True
 
-    if should_do('creation'):
-        create_sub(r, sub)
-
-    if should_do('settings'):
-        copy_settings(r, sub, topic)
-
-    if should_do('mods'):
-        invite_mods(r, sub)
-
-    if should_do('wiki'):
-        copy_wiki_pages(r, sub)
-
-    if should_do('flair'):
-        setup_flair(r, sub)
+    if manifest:
+        topics = load_manifest(manifest, multi)
+        expand_batch(r, topics, journal or state_path('expand-journal.json'), should_do)
+        return
 
-    if should_do('multireddit'):
-        add_to_multi(r, sub, multi)
+    topic = ' '.join(topic)
+    sub = sub_name(topic)
+    template = ParentTemplate(r)
+    roster = ModRoster(state_path(ROSTER_FILE))
 
-    if should_do('notifications'):
-        setup_notifications(r, sub)
+    for point, step in expansion_steps(r, sub, topic, multi, template, roster):
+        if should_do(point):
+            step()
 
 if __name__ == '__main__':
     main()
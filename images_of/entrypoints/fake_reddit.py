@@ -0,0 +1,66 @@
+import logging
+from time import sleep
+
+import click
+
+from images_of import command, settings
+from images_of.fakereddit import RATE_LIMIT, FakeData, FakeRedditServer, literals
+
+LOG = logging.getLogger(__name__)
+
+
+@command
+@click.option('--host', default='127.0.0.1', help='Address to listen on')
+@click.option('-p', '--port', default=65012, help='Port to listen on')
+@click.option('--data', 'data_path', type=click.Path(exists=True),
+              help='Recorded data to serve, rather than made up data for the network')
+@click.option('--days', default=60, help='Days of made up modlog')
+@click.option('--posts', default=50, help='Made up posts per sub')
+@click.option('--seed', type=int, help='Seed for the made up data, to make it repeatable')
+@click.option('--latency', default=0.0, help='Seconds added to every request')
+@click.option('--jitter', default=0.0, help='Up to this many more seconds, at random')
+@click.option('--error-rate', default=0.0, help='Fraction of requests answered with a 5xx')
+@click.option('--timeout-rate', default=0.0, help='Fraction of requests never answered')
+@click.option('--hang', default=30.0, help='Seconds an unanswered request hangs before being dropped')
+@click.option('--ratelimit-rate', default=0.0,
+              help='Fraction of submissions, comments and messages refused with RATELIMIT')
+@click.option('--rate-limit', default=RATE_LIMIT, help='Requests allowed per ten minutes')
+def main(host, port, data_path, days, posts, seed, latency, jitter, error_rate, timeout_rate,
+         hang, ratelimit_rate, rate_limit):
+    """
+    Serve a stand-in for the reddit API, for load and resilience testing
+    without touching reddit. Set `url` in the [reddit] settings to its
+    address to point the other tools at it.
+    """
+
+    if data_path:
+        data = FakeData(settings.USERNAME)
+        data.load(data_path)
+    else:
+        subs = [settings.PARENT_SUB] + [sub['name'] for sub in settings.CHILD_SUBS + settings.COUSIN_SUBS]
+        # plain words and hostnames from the rules, for /r/all posts the bot will take
+        searches = [sub.get('search', []) for sub in settings.CHILD_SUBS + settings.COUSIN_SUBS]
+        terms = literals([term for search in searches
+                          for term in ([search] if isinstance(search, str) else search)])
+        data = FakeData.synthetic(subs, settings.USERNAME, days=days, posts=posts, seed=seed,
+                                  terms=terms, domains=literals(settings.DOMAINS))
+
+    server = FakeRedditServer((host, port), data, latency=latency, jitter=jitter,
+                              error_rate=error_rate, timeout_rate=timeout_rate, hang=hang,
+                              ratelimit_rate=ratelimit_rate, rate_limit=rate_limit)
+    server.start()
+    print('Serving {} subs on {}'.format(len(data.settings), server.url))
+
+    try:
+        while True:
+            sleep(60)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        for line in server.report():
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
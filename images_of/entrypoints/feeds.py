@@ -1,10 +1,13 @@
+from collections import Counter
 import logging
 import random
 
-import feedparser
 from praw.errors import AlreadySubmitted, APIException, HTTPException
 
 from images_of import command, settings, Reddit
+from images_of.feedfetch import CACHE_FILE, SEEN_FILE, FeedFetcher, SeenEntries
+from images_of.ratelimit import RateBudget
+from images_of.state import state_path
 from images_of.subreddit import Subreddit
 
 
@@ -18,47 +21,102 @@ def main():
         settings.USERNAME))
     r.oauth()
 
-    for child_settings in settings.CHILD_SUBS:
-        sub = Subreddit(**child_settings)
-        posted = 0
-
-        feeds = sub.feeds[:]
-        random.shuffle(feeds)
-        for feed in feeds:
-            thisfeed = feedparser.parse(feed)
-            comment = 'This content brought to you from "{}"\n{}'.format(
-                    thisfeed.feed.title,
-                    settings.COMMENT_FOOTER.format(
-                        reason='off site feed',
-                        detail=thisfeed.feed.title
-                    ))
-            for item in thisfeed.entries:
+    run(r)
+
+
+# reddit requests per entry posted: the submission and its comment
+CALLS_PER_POST = 2
+
+
+def run(r, budget=None):
+    """
+    Post new entries from each child sub's feeds, spending `budget` for each
+    post. The feeds come from their own sites rather than reddit, so
+    fetching them doesn't.
+    """
+    budget = budget or RateBudget()
+    subs = [Subreddit(**child_settings) for child_settings in settings.CHILD_SUBS]
+
+    fetcher = FeedFetcher(state_path(CACHE_FILE))
+    fetched = fetcher.fetch_all(feed for sub in subs for feed in sub.feeds)
+    seen = SeenEntries(state_path(SEEN_FILE))
+
+    # feeds with entries we didn't get to, which we'll want in full next time
+    unfinished = set()
+
+    # subs yet to get through each feed; a run cut short by an error keeps
+    # what it posted, but reads the feeds it didn't finish in full next time
+    remaining = Counter(feed for sub in subs for feed in sub.feeds)
+
+    try:
+        for sub in subs:
+            posted = 0
+
+            feeds = sub.feeds[:]
+            random.shuffle(feeds)
+            for feed in feeds:
+                if not fetched[feed].ok:
+                    # unchanged since we last read it, or unavailable
+                    continue
+
                 if sub.feed_limit and posted >= sub.feed_limit:
-                    break
-
-                LOG.info('Posting OC into /r/{}: {}'.format(
-                    sub.name,
-                    item.title))
-                try:
-                    xpost = r.submit(
-                        sub.name,
-                        title=item.title,
-                        url=item.link,
-                        captcha=None,
-                        send_replies=True,
-                        resubmit=False)
-                    xpost.add_comment(comment)
-                except AlreadySubmitted:
-                    LOG.info('Already submitted. Skipping.')
-                except KeyError:
-                    # XXX AlreadySubmitted isn't being raised for some reason
-                    LOG.info('Already Submitted (KeyError). Skipping.')
-                except APIException as e:
-                    LOG.warning(e)
-                else:
-                    posted += 1
-
-        LOG.info('Posted %s feed items into /r/%s', posted, sub.name)
+                    unfinished.add(feed)
+                    continue
+
+                thisfeed = fetched[feed].parse()
+                comment = 'This content brought to you from "{}"\n{}'.format(
+                        thisfeed.feed.title,
+                        settings.COMMENT_FOOTER.format(
+                            reason='off site feed',
+                            detail=thisfeed.feed.title
+                        ))
+                for item in thisfeed.entries:
+                    if sub.feed_limit and posted >= sub.feed_limit:
+                        unfinished.add(feed)
+                        break
+
+                    if seen.seen(sub.name, item):
+                        LOG.debug('Already posted into /r/%s: %s', sub.name, item.title)
+                        continue
+
+                    LOG.info('Posting OC into /r/%s: %s', sub.name, item.title)
+                    budget.acquire(CALLS_PER_POST)
+                    try:
+                        xpost = r.submit(
+                            sub.name,
+                            title=item.title,
+                            url=item.link,
+                            captcha=None,
+                            send_replies=True,
+                            resubmit=False)
+                        xpost.add_comment(comment)
+                    except AlreadySubmitted:
+                        LOG.info('Already submitted. Skipping.')
+                        seen.add(sub.name, item)
+                    except KeyError:
+                        # XXX AlreadySubmitted isn't being raised for some reason
+                        LOG.info('Already Submitted (KeyError). Skipping.')
+                        seen.add(sub.name, item)
+                    except (APIException, HTTPException) as e:
+                        LOG.warning(e)
+                        # read it in full again next time, to retry this entry
+                        unfinished.add(feed)
+                    else:
+                        posted += 1
+                        seen.add(sub.name, item)
+
+                remaining[feed] -= 1
+
+            LOG.info('Posted %s feed items into /r/%s', posted, sub.name)
+    finally:
+        for feed in fetched.values():
+            if feed.url not in unfinished and not remaining[feed.url]:
+                fetcher.done_with(feed)
+        fetcher.save()
+        seen.save()
+
+    LOG.info(fetcher.report())
+    LOG.info('Skipped %s already posted feed item(s) without asking reddit', seen.skipped)
 
 if __name__ == '__main__':
     main()
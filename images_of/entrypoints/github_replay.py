@@ -0,0 +1,47 @@
+import json
+import os.path
+from urllib.error import HTTPError, URLError
+
+import click
+
+from images_of import command, settings
+from images_of.github_webhook import EVENT_TYPES, replay
+
+
+@command
+@click.option('-u', '--url', help='Webhook receiver to deliver to')
+@click.option('-e', '--event', type=click.Choice(sorted(EVENT_TYPES) + ['ping']),
+              help='GitHub event name. Defaults to the payload file\'s name, e.g. push.json')
+@click.argument('payloads', nargs=-1, required=True, type=click.Path(exists=True))
+def main(url, event, payloads):
+    """
+    Replay recorded GitHub webhook payloads against the announcer's
+    webhook receiver, signed with the configured webhook secret.
+    """
+
+    if url is None:
+        url = 'http://{}:{}/'.format(settings.GITHUB_WEBHOOK_HOST, settings.GITHUB_WEBHOOK_PORT)
+
+    for n, path in enumerate(payloads):
+        event_name = event or os.path.splitext(os.path.basename(path))[0]
+
+        with open(path, 'rb') as f:
+            body = f.read()
+
+        # catch bad recordings here rather than as a 400 from the receiver
+        json.loads(body.decode('utf-8'))
+
+        try:
+            status = replay(url, event_name, body, settings.GITHUB_WEBHOOK_SECRET,
+                            delivery_id='replay-{}-{}'.format(os.getpid(), n))
+        except HTTPError as e:
+            status = e.code
+        except URLError as e:
+            print('Could not reach {}: {}'.format(url, e.reason))
+            return
+
+        print('{} ({}): {}'.format(path, event_name, status))
+
+
+if __name__ == '__main__':
+    main()
@@ -7,12 +7,19 @@
 # [](/hot-sister-end)
 # Other text that will be below the list
 
-import re
+from hashlib import sha1
 import html.parser
+import logging
+import re
 import time
-#import praw
+
+import click
+
 from images_of import command, settings, Reddit
-#import os
+from images_of.ratelimit import RateBudget, concurrent_map
+from images_of.state import load_json, save_json, state_path
+
+LOG = logging.getLogger(__name__)
 
 # defines the main and sister subreddits, and how many posts to list in the sidebar
 PLACES_MULTI_NAME = 'imagesofplaces'
@@ -21,11 +28,68 @@ POSTS_TO_LIST = 5
 START_DELIM = '[](/hot-sister-start)'
 END_DELIM = '[](/hot-sister-end)'
 
+REPLACE_PATTERN = re.compile('{}.*?{}'.format(
+        re.escape(START_DELIM),
+        re.escape(END_DELIM)
+    ),
+    re.IGNORECASE|re.DOTALL|re.UNICODE)
+
+# what we last wrote to each sub, so we know when there's nothing to do
+STATE_FILE = 'hot-sister.json'
+
+# children updated at once
+UPDATE_WORKERS = 4
+
+# reading and writing a sidebar
+CALLS_PER_CHILD = 2
+
+
+def digest(text):
+    return sha1(text.encode('utf-8')).hexdigest()
+
+
+def update_sidebar(r, child, block, written):
+    """
+    Splice `block` into `child`'s sidebar. Returns the number of calls made
+    and the digest of the sidebar now in place, or None for the digest if the
+    sidebar has nowhere to put the block.
+    """
+    sub_settings = r.get_settings(child)
+    current_sidebar = html.unescape(sub_settings['description'])
+
+    if not REPLACE_PATTERN.search(current_sidebar):
+        LOG.warning('/r/%s sidebar has no %s ... %s section to list posts in',
+                    child, START_DELIM, END_DELIM)
+        return 1, None
+
+    if written and digest(current_sidebar) != written:
+        LOG.info('/r/%s sidebar was edited since we last wrote it', child)
+
+    new_sidebar = REPLACE_PATTERN.sub(
+        '{}\\n\\n{}\\n{}'.format(START_DELIM, block, END_DELIM),
+        current_sidebar)
+
+    if new_sidebar == current_sidebar:
+        return 1, digest(current_sidebar)
+
+    # set what we just read rather than update_settings, which reads them again
+    sub_settings['description'] = new_sidebar
+    sub_settings.pop('subreddit_id', None)
+    r.set_settings(child, **sub_settings)
+    return 2, digest(new_sidebar)
+
+
 @command
-def main():
+@click.option('-f', '--force', is_flag=True, help='Update sidebars even if the list is unchanged')
+def main(force):
     r = Reddit('{} hot_sister v3 - /u/{}'.format(settings.NETWORK_NAME, settings.USERNAME))
     r.oauth()
 
+    run(r, force)
+
+
+def run(r, force=False, budget=None):
+    """List the network's hot posts in each child's sidebar."""
     # places multireddit
     places_multi = r.get_multireddit(settings.USERNAME, PLACES_MULTI_NAME)
     places_list_text = str()
@@ -40,33 +104,46 @@ def main():
 
     # bring it together
     combined_text= "* Places:\n{}\n\n* Times:\n{}".format(places_list_text, decades_list_text)
+    block_digest = digest(combined_text)
+
+    state_file = state_path(STATE_FILE)
+    state = load_json(state_file, {})
 
     # set up all the children
     children = sorted([sub['name'] for sub in settings.CHILD_SUBS])
-    for child in children:
+    stale = [child for child in children
+             if force or state.get(child, {}).get('block') != block_digest]
+    for child in sorted(set(children) - set(stale)):
+        LOG.debug('/r/%s already lists these posts', child)
+
+    budget = budget or RateBudget()
+    def update(child):
         print("running on {}".format(child))
-        sub = r.get_subreddit(child)
-
-        current_sidebar = sub.get_settings()['description']
-        current_sidebar = html.unescape(current_sidebar)
-
-        # ew
-        replace_pattern = re.compile('{}.*?{}'.format(
-                re.escape(START_DELIM),
-                re.escape(END_DELIM)
-            ),
-            re.IGNORECASE|re.DOTALL|re.UNICODE)
-
-        # ew
-        new_sidebar = re.sub(replace_pattern,
-                            '{}\\n\\n{}\\n{}'.format(
-                                START_DELIM,
-                                combined_text,
-                                END_DELIM
-                            ),
-                            current_sidebar)
-
-        sub.update_settings(description=new_sidebar)
+        return update_sidebar(r, child, combined_text, state.get(child, {}).get('sidebar'))
+
+    calls = 0
+    for child, result, error in concurrent_map(update, stale, workers=UPDATE_WORKERS,
+                                               budget=budget, cost=CALLS_PER_CHILD):
+        if error is not None:
+            LOG.error('Could not update /r/%s: %s', child, error)
+            # we don't know if the write went through; try again next time
+            calls += CALLS_PER_CHILD
+            state.pop(child, None)
+            continue
+
+        made, sidebar = result
+        calls += made
+        if sidebar is None:
+            # nothing written; look again next time, in case it's been added
+            state.pop(child, None)
+            continue
+        state[child] = {'block': block_digest, 'sidebar': sidebar, 'time': time.time()}
+
+    save_json(state_file, state)
+
+    baseline = CALLS_PER_CHILD * len(children)
+    print('Updated {} of {} sidebars in {} calls, saving {} of {}'.format(
+        len(stale), len(children), calls, baseline - calls, baseline))
 
 
 if __name__ == '__main__':
@@ -1,6 +1,8 @@
 import click
 
 from images_of import command, settings, Reddit
+from images_of.roster import ROSTER_FILE, ModRoster
+from images_of.state import state_path
 
 @command
 @click.option('--defaults', is_flag=True, help='Invite default moderators')
@@ -26,17 +28,24 @@ def main(mods, defaults, cousins):
         cuzs.update(subs)
         subs = sorted(cuzs)
 
-    for sub in subs:
-        s = r.get_subreddit(sub)
-        cur_mods = [u.name for u in s.get_moderators()]
-        need_mods = [m for m in mods if m not in cur_mods]
+    roster = ModRoster(state_path(ROSTER_FILE))
+    roster.refresh(r, subs)
 
-        if not need_mods:
-            print('No mods needed for /r/{}.'.format(sub))
+    try:
+        for sub in subs:
+            cur_mods = roster.mods(sub)
+            pending = roster.pending(sub)
+            need_mods = [m for m in mods if m not in cur_mods and m not in pending]
 
-        for mod in need_mods:
-            print('Inviting {} to moderate /r/{}.'.format(mod, sub))
-            s.add_moderator(mod)
+            if not need_mods:
+                print('No mods needed for /r/{}.'.format(sub))
+
+            for mod in need_mods:
+                print('Inviting {} to moderate /r/{}.'.format(mod, sub))
+                r.get_subreddit(sub).add_moderator(mod)
+                roster.record_invite(sub, mod)
+    finally:
+        roster.save()
 
 if __name__ == '__main__':
     main()
@@ -1,8 +1,11 @@
+from difflib import unified_diff
+from hashlib import sha1
 import logging
 
 import click
 
 from images_of import command, settings, Reddit
+from images_of.ratelimit import RateBudget, concurrent_map
 from images_of.subreddit import Subreddit
 
 LOG = logging.getLogger(__name__)
@@ -18,11 +21,11 @@ def split_content(content, start_delim, end_delim, tags_required=True, case_inse
     if tags_required:
         ok = True
         if start_delim not in content_match:
-            LOG.warning('Missing {}'.format(start_delim))
+            LOG.warning('Missing %s', start_delim)
             ok = False
 
         if end_delim not in content_match:
-            LOG.warning('Missing {}'.format(start_delim))
+            LOG.warning('Missing %s', start_delim)
             ok = False
 
         if not ok:
@@ -43,19 +46,97 @@ def split_content(content, start_delim, end_delim, tags_required=True, case_inse
 
     return (head, content, tail)
 
-def copy_wiki_page(r, page, dom, subs, force):
+# child pages fetched at once. praw still paces the requests themselves.
+FETCH_WORKERS = 4
+
+
+def normalize(content):
+    # reddit hands back wiki pages with \r\n line endings
+    return content.replace('\r\n', '\n')
+
+
+def content_hash(content):
+    return sha1(normalize(content).encode('utf-8')).hexdigest()
+
+
+class PropagationPlan:
+    """
+    What propagation will do to each child page, and what it did. Pages
+    written, and pages read with `get`, spend a request from `budget`.
+    """
+
+    def __init__(self, dry_run=False, budget=None):
+        self.dry_run = dry_run
+        self.budget = budget or RateBudget()
+        self.skipped = []
+        self.written = []
+        self.failed = []
+
+    def get(self, r, sub, page):
+        self.budget.acquire()
+        return r.get_wiki_page(sub, page).content_md
+
+    def skip(self, sub, page, reason):
+        LOG.info('Skipping /r/%s/wiki/%s: %s', sub, page, reason)
+        self.skipped.append((sub, page))
+
+    def write(self, r, sub, page, old, new):
+        # diffing whole wiki pages isn't cheap; only do it if it'll be seen
+        if self.dry_run or LOG.isEnabledFor(logging.DEBUG):
+            diff = '\n'.join(unified_diff(
+                normalize(old).splitlines(), normalize(new).splitlines(),
+                '/r/{}/wiki/{}'.format(sub, page), 'new', lineterm=''))
+            LOG.debug('Changes to /r/%s/wiki/%s:\n%s', sub, page, diff)
+
+        if self.dry_run:
+            print(diff)
+        else:
+            LOG.info('Updating /r/%s/wiki/%s', sub, page)
+            self.budget.acquire()
+            r.edit_wiki_page(sub, page, new)
+        self.written.append((sub, page))
+
+    def fail(self, sub, page, e):
+        LOG.error('Could not update /r/%s/wiki/%s: %s', sub, page, e)
+        self.failed.append((sub, page))
+
+    def summary(self):
+        verb = 'would be written' if self.dry_run else 'written'
+        lines = ['{} page(s) {}, {} skipped as unchanged, {} failed'.format(
+            len(self.written), verb, len(self.skipped), len(self.failed))]
+        lines += ['  failed: /r/{}/wiki/{}'.format(sub, page) for sub, page in self.failed]
+        return '\n'.join(lines)
+
+
+def fetch_pages(r, page, subs, budget=None):
+    """Fetch `page` from each of `subs`, a few at a time."""
+    return concurrent_map(lambda sub: r.get_wiki_page(sub, page).content_md,
+                          subs, workers=FETCH_WORKERS, budget=budget)
+
+
+def copy_wiki_page(r, page, dom, subs, force, plan):
     start_delim = "#Start-{}-Network".format(settings.NETWORK_NAME)
     end_delim = "#End-{}-Network".format(settings.NETWORK_NAME)
 
-    content = r.get_wiki_page(dom, page).content_md
+    content = plan.get(r, dom, page)
     # Throw away the head and tail sections, don't care about them, we won't
     # be copying them or editing this page.
     content = split_content(content, start_delim, end_delim, False, True)[1]
+    network_hash = content_hash(content)
+
+    for sub, sub_content, error in fetch_pages(r, page, subs, plan.budget):
+        if error is not None:
+            plan.fail(sub, page, error)
+            continue
 
-    for sub in subs:
-        LOG.info('Updating /r/{}/wiki/{}'.format(sub, page))
-        sub_content = r.get_wiki_page(sub, page).content_md
         parts = split_content(sub_content, start_delim, end_delim, not force)
+        if parts is None:
+            plan.fail(sub, page, 'network section tags not found')
+            continue
+
+        if content_hash(parts[1]) == network_hash and start_delim in sub_content:
+            plan.skip(sub, page, 'network section up to date')
+            continue
 
         new_content = ''.join([
                 parts[0],
@@ -64,10 +145,28 @@ def copy_wiki_page(r, page, dom, subs, force):
                 end_delim,
                 parts[2]])
 
-        LOG.debug('New content for /r/{}/wiki/{}: {}'.format(
-                            sub, page, new_content))
+        try:
+            plan.write(r, sub, page, sub_content, new_content)
+        except Exception as e:
+            plan.fail(sub, page, e)
+
+
+def copy_toolbox(r, dom, subs, plan):
+    page = 'toolbox'
+    content = plan.get(r, dom, page)
+    toolbox_hash = content_hash(content)
+
+    for sub, sub_content, error in fetch_pages(r, page, subs, plan.budget):
+        # a sub without toolbox set up yet has no page; we'll create it.
+        if error is None and content_hash(sub_content) == toolbox_hash:
+            plan.skip(sub, page, 'toolbox settings up to date')
+            continue
+
+        try:
+            plan.write(r, sub, page, sub_content or '', content)
+        except Exception as e:
+            plan.fail(sub, page, e)
 
-        r.edit_wiki_page(sub, page, new_content)
 
 @command
 @click.option('--automod', is_flag=True,
@@ -75,12 +174,10 @@ def copy_wiki_page(r, page, dom, subs, force):
 @click.option('--toolbox', is_flag=True, help='Copy toolbox settings')
 @click.option('--wiki', multiple=True, help='Wiki page to copy')
 @click.option('-f', '--force', is_flag=True, help='Overwrite even if section tags not found')
-def main(automod, toolbox, wiki, force):
+@click.option('--dry-run', is_flag=True, help='Show what would change without writing anything')
+def main(automod, toolbox, wiki, force, dry_run):
     """Propigate settings across the network"""
 
-    dom = settings.PARENT_SUB
-    subs = [sub['name'] for sub in settings.CHILD_SUBS]
-
     r = Reddit('Copy Network Settings v0.1 /u/{}'.format(settings.USERNAME))
     r.oauth()
 
@@ -89,14 +186,28 @@ def main(automod, toolbox, wiki, force):
         wiki.update(['config/automoderator'])
         wiki = list(wiki)
 
+    plan = run(r, wiki, toolbox, force, dry_run)
+    print(plan.summary())
+
+
+def run(r, wiki, toolbox=False, force=False, dry_run=False, budget=None):
+    """
+    Copy the network sections of the `wiki` pages, and the toolbox settings
+    if `toolbox`, from the parent to every child, spending `budget` for each
+    page read or written. Returns the plan carried out.
+    """
+    dom = settings.PARENT_SUB
+    subs = [sub['name'] for sub in settings.CHILD_SUBS]
+
+    plan = PropagationPlan(dry_run, budget)
+
     for page in wiki:
-        copy_wiki_page(r, page, dom, subs, force)
+        copy_wiki_page(r, page, dom, subs, force, plan)
 
     if toolbox:
-        page = 'toolbox'
-        content = r.get_wiki_page(dom, page).content_md
-        for sub in subs:
-            r.edit_wiki_page(sub, page, content)
+        copy_toolbox(r, dom, subs, plan)
+
+    return plan
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,77 @@
+import logging
+
+import click
+
+from images_of import command, settings, Reddit
+from images_of.ratelimit import REDDIT_REQUESTS_PER_MINUTE, RateBudget
+from images_of.roster import ROSTER_FILE, ModRoster
+from images_of.scheduler import Scheduler
+from images_of.state import state_path
+from images_of.entrypoints import (audit_modlog, blacklist_requests, feeds, hot_sister,
+                                   propagate)
+
+LOG = logging.getLogger(__name__)
+
+METRICS_FILE = 'scheduler-metrics.json'
+
+
+def refresh_roster(r, budget):
+    subs = [settings.PARENT_SUB] + [sub['name'] for sub in settings.CHILD_SUBS + settings.COUSIN_SUBS]
+    roster = ModRoster(state_path(ROSTER_FILE))
+    roster.refresh(r, subs, budget=budget)
+    roster.save()
+
+    for sub, (added, removed) in sorted(roster.diff().items()):
+        LOG.info('Moderators of /r/%s changed: +%s -%s', sub, added, removed)
+
+
+# job name: function taking the reddit session and request budget
+JOBS = {
+    'feeds': lambda r, budget: feeds.run(r, budget=budget),
+    'hot_sister': lambda r, budget: hot_sister.run(r, budget=budget),
+    'blacklist_requests': lambda r, budget: blacklist_requests.run(r, budget=budget),
+    'propagate': lambda r, budget: propagate.run(r, ['config/automoderator'], toolbox=True,
+                                                 budget=budget),
+    'modlog_sync': lambda r, budget: audit_modlog.sync(r, budget=budget),
+    'mod_roster': refresh_roster,
+}
+
+
+@command
+@click.option('-j', '--job', 'only', multiple=True, type=click.Choice(sorted(JOBS)),
+              help='Run only this job, whatever its schedule. May be repeated.')
+@click.option('--once', is_flag=True, help='Run each job once and exit')
+@click.option('--request-budget', default=REDDIT_REQUESTS_PER_MINUTE,
+              help='Reddit requests per minute shared by all jobs')
+def main(only, once, request_budget):
+    """
+    Run the periodic jobs in one process, on the intervals in the
+    [schedule] settings, sharing one reddit session.
+    """
+
+    r = Reddit('{} Scheduler v0.1 - /u/{}'.format(settings.NETWORK_NAME, settings.USERNAME))
+    r.oauth()
+
+    scheduler = Scheduler(r, RateBudget(request_budget), state_path(METRICS_FILE))
+    for name, func in sorted(JOBS.items()):
+        minutes = settings.SCHEDULE.get(name, 0)
+        if only and name not in only:
+            continue
+        if not minutes and not only:
+            LOG.info('%s is not scheduled', name)
+            continue
+
+        scheduler.add(name, func, 60 * (minutes or 60))
+        LOG.info('Running %s every %s minutes', name, minutes or 60)
+
+    if not scheduler.jobs:
+        raise click.UsageError('No jobs to run.')
+
+    if once:
+        scheduler.run_once()
+    else:
+        scheduler.run_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""
+Local event bus between tools running on the same host.
+
+Producers append events, one JSON object per line, to a log file; consumers
+tail it. Publishing never blocks the producer: events are handed to a bounded
+queue drained by a background writer, and dropped, with a count kept, if the
+queue is full. The log is rotated once it passes a size limit.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+from time import time
+
+LOG = logging.getLogger(__name__)
+
+QUEUE_SIZE = 1000
+MAX_LOG_BYTES = 10 * 1024 * 1024
+
+# event types
+CROSSPOST = 'crosspost'
+BLACKLISTED = 'blacklisted'
+API_ERROR = 'api_error'
+STREAM_RESTART = 'stream_restart'
+
+
+class EventPublisher:
+    """Appends events to the log at `path` from a background thread."""
+
+    def __init__(self, path, queue_size=QUEUE_SIZE, max_bytes=MAX_LOG_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.queue = queue.Queue(queue_size)
+        self.dropped = 0
+        self.failed = False
+
+        self._thread = threading.Thread(target=self._write_events, name='event-publisher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def publish(self, event_type, **fields):
+        """Queue an event for the log. Never blocks."""
+        fields.update(type=event_type, time=time(), pid=os.getpid())
+        try:
+            if self.failed:
+                raise queue.Full
+            self.queue.put_nowait(fields)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 100 == 1:
+                LOG.warning('Event queue full; %s event(s) dropped so far', self.dropped)
+
+    def close(self):
+        """Write out whatever is queued and stop the writer."""
+        if not self.failed:
+            self.queue.put(None)
+        self._thread.join()
+
+    def _write_events(self):
+        f = None
+        try:
+            f = open(self.path, 'a')
+            while True:
+                event = self.queue.get()
+                # write out everything that's waiting before flushing
+                while event is not None:
+                    f.write(json.dumps(event) + '\n')
+                    try:
+                        event = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                f.flush()
+
+                if event is None:
+                    return
+
+                if f.tell() > self.max_bytes:
+                    f.close()
+                    os.replace(self.path, self.path + '.1')
+                    f = open(self.path, 'a')
+
+        except OSError as e:
+            LOG.error('Event log %s unusable; events will be dropped: %s', self.path, e)
+            self.failed = True
+        finally:
+            if f is not None:
+                f.close()
+
+
+class EventReader:
+    """
+    Tails the event log at `path`, following it across rotations. Only events
+    written after the reader was created are returned.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._inode = None
+        self._offset = 0
+
+        try:
+            st = os.stat(path)
+            self._inode, self._offset = st.st_ino, st.st_size
+        except FileNotFoundError:
+            pass
+
+    def _read_from(self, path, limit):
+        events = []
+        with open(path, 'rb') as f:
+            f.seek(self._offset)
+            while len(events) < limit:
+                line = f.readline()
+                if not line.endswith(b'\n'):
+                    # nothing more yet, or a line still being written
+                    break
+                self._offset += len(line)
+                try:
+                    events.append(json.loads(line.decode('utf-8')))
+                except ValueError:
+                    LOG.warning('Skipping malformed event in %s', path)
+        return events
+
+    def read(self, limit=100):
+        """Return up to `limit` new events, oldest first."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return []
+
+        events = []
+        if self._inode is not None and st.st_ino != self._inode:
+            # rotated. Finish what's left of the old log, if it's still around.
+            rotated = self.path + '.1'
+            try:
+                if os.stat(rotated).st_ino == self._inode:
+                    events = self._read_from(rotated, limit)
+                    if len(events) == limit:
+                        return events
+            except FileNotFoundError:
+                pass
+            self._offset = 0
+        elif st.st_size < self._offset:
+            # truncated
+            self._offset = 0
+
+        self._inode = st.st_ino
+        events += self._read_from(self.path, limit - len(events))
+        return events
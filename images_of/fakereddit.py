@@ -0,0 +1,755 @@
+"""
+A stand-in for the reddit API, for load and resilience testing offline.
+
+It answers the requests our tools make -- listings, wiki pages, modlogs,
+moderators, subreddit settings, submitting and commenting, messages and
+OAuth tokens -- from synthetic or recorded data kept in memory, so edits and
+submissions show up in later reads. Every response carries reddit's rate
+limit headers, and going over the limit gets a 429 as it would from reddit.
+
+Synthetic data includes a stream of /r/all posts from outside the network,
+some with titles and links the bot's rules take, so the bot has something
+to crosspost.
+
+Latency, server errors, requests that hang and never answer, and submit
+rate limits can be injected to see how the tools cope. Point the tools at
+it with the `url` setting in the [reddit] section.
+"""
+from collections import Counter
+from itertools import count
+import json
+import logging
+import random
+import re
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from time import sleep, time
+from urllib.parse import parse_qs, urlsplit
+from zlib import crc32
+
+from images_of import OAUTH_SCOPE
+
+LOG = logging.getLogger(__name__)
+
+# reddit's OAuth rate limit: requests allowed per window, and the window
+RATE_LIMIT = 600
+RATE_WINDOW = 600
+
+LISTING_DEFAULT = 25
+LISTING_MAX = 100
+
+# seconds an injected submit rate limit asks us to wait
+SUBMIT_RATELIMIT = 5
+
+TOKEN_LIFETIME = 3600
+
+# what synthetic modlogs are made of
+SYNTHETIC_ACTIONS = ['approvelink', 'removelink', 'removecomment', 'editflair',
+                     'distinguish', 'wikirevise', 'editsettings']
+SYNTHETIC_PAGES = ['config/automoderator', 'toolbox']
+
+# where synthetic /r/all posts come from, and what they link to when they
+# aren't images
+SYNTHETIC_SOURCES = ['pics', 'earthporn', 'itookapicture', 'travel', 'photography']
+SYNTHETIC_OTHER_DOMAINS = ['news.example.com', 'blog.example.org']
+SYNTHETIC_IMAGE_DOMAIN = 'i.imgur.com'
+
+# fraction of synthetic /r/all posts that are images with a title one of the
+# subs searches for
+SYNTHETIC_HIT_RATE = 0.5
+
+# listings that show posts from every sub
+EVERYWHERE = ['all', 'popular']
+
+
+def base36(n):
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    out = ''
+    while True:
+        n, rem = divmod(n, 36)
+        out = digits[rem] + out
+        if not n:
+            return out
+
+
+def sub_id(sub):
+    return base36(crc32(sub.lower().encode('utf-8')))
+
+
+def literals(patterns):
+    """
+    The plain text of those `patterns` that are just words, or hostnames
+    with their dots escaped, leaving out anything needing a real regex.
+    """
+    found = []
+    for pattern in patterns or []:
+        text = pattern.replace('\\.', '.')
+        if re.fullmatch(r'[\w .-]+', text) and '.' not in pattern.replace('\\.', ''):
+            found.append(text)
+    return found
+
+
+def weighted_choice(rand, items, weights):
+    x = rand.uniform(0, sum(weights))
+    for item, weight in zip(items, weights):
+        x -= weight
+        if x <= 0:
+            return item
+    return items[-1]
+
+
+def listing(kind, items, params, key='name'):
+    """
+    One page of `items` (newest first) as a reddit Listing, honouring the
+    `limit`, `after` and `before` params.
+    """
+    try:
+        limit = int(params.get('limit', LISTING_DEFAULT))
+    except ValueError:
+        limit = LISTING_DEFAULT
+    limit = min(max(limit, 1), LISTING_MAX)
+
+    keys = [item[key] for item in items]
+    if params.get('after') in keys:
+        start = keys.index(params['after']) + 1
+        page = items[start:start + limit]
+    elif params.get('before') in keys:
+        end = keys.index(params['before'])
+        start = max(end - limit, 0)
+        page = items[start:end]
+    else:
+        start = 0
+        page = items[:limit]
+
+    more = start + len(page) < len(items)
+    return {
+        'kind': 'Listing',
+        'data': {
+            'children': [{'kind': kind, 'data': item} for item in page],
+            'after': page[-1][key] if page and more else None,
+            'before': page[0][key] if page and start else None,
+            'modhash': '',
+        },
+    }
+
+
+class FakeData:
+    """
+    What the stand-in serves, keyed by lowercased sub name. Lists are kept
+    newest first, as reddit lists them.
+
+    Recorded data is loaded from a JSON file shaped like
+
+        {"wiki": {"sub/page": "content"},
+         "moderators": {"sub": ["name"]},
+         "modlog": {"sub": [{"mod": "name", "action": "removelink", "created_utc": 0}]},
+         "posts": {"sub": [{"title": "...", "url": "...", "author": "name"}]},
+         "settings": {"sub": {"description": "..."}},
+         "messages": [{"author": "name", "subject": "...", "body": "..."}]}
+
+    where anything left out of an item is filled in.
+    """
+
+    def __init__(self, username='ion_bot'):
+        self.username = username
+        self.wiki = {}
+        self.moderators = {}
+        self.modlog = {}
+        self.posts = {}
+        self.settings = {}
+        self.invited = {}
+        self.messages = []
+        self.sent = []
+        self.lock = threading.Lock()
+        self._ids = count(1)
+
+    def new_id(self):
+        return base36(next(self._ids))
+
+    def subreddit(self, sub):
+        name = sub.lower()
+        return {
+            'id': sub_id(name),
+            'name': 't5_' + sub_id(name),
+            'display_name': sub,
+            'title': sub,
+            'url': '/r/{}/'.format(sub),
+            'subscribers': 1000,
+            'over18': False,
+            'subreddit_type': 'public',
+            'description': self.settings.get(name, {}).get('description', ''),
+        }
+
+    def add_sub(self, sub):
+        name = sub.lower()
+        self.moderators.setdefault(name, [self.username])
+        self.modlog.setdefault(name, [])
+        self.posts.setdefault(name, [])
+        self.settings.setdefault(name, {
+            'title': sub,
+            'description': '',
+            'public_description': '',
+            'subreddit_type': 'public',
+            'link_type': 'any',
+            'over_18': False,
+            'wikimode': 'modonly',
+            'subreddit_id': 't5_' + sub_id(name),
+        })
+        return name
+
+    def sub_for_id(self, fullname):
+        for name in self.settings:
+            if 't5_' + sub_id(name) == fullname:
+                return name
+        return None
+
+    def make_link(self, sub, **fields):
+        link_id = fields.get('id') or self.new_id()
+        title = fields.get('title', 'Post {}'.format(link_id))
+        slug = re.sub(r'\W+', '_', title.lower()).strip('_')[:50]
+        link = {
+            'id': link_id,
+            'name': 't3_' + link_id,
+            'title': title,
+            'url': '',
+            'author': self.username,
+            'subreddit': sub,
+            'subreddit_id': 't5_' + sub_id(sub),
+            'created_utc': time(),
+            'score': 1,
+            'num_comments': 0,
+            'over_18': False,
+            'is_self': not fields.get('url'),
+            'selftext': '',
+            'domain': 'self.' + sub,
+            'link_flair_text': None,
+            'permalink': '/r/{}/comments/{}/{}/'.format(sub, link_id, slug),
+        }
+        link.update(fields)
+        if not link['url']:
+            link['url'] = link['permalink']
+        elif 'domain' not in fields:
+            link['domain'] = urlsplit(link['url']).netloc
+        link['created'] = link['created_utc']
+        return link
+
+    def make_modaction(self, sub, **fields):
+        entry = {
+            'id': 'ModAction_' + str(uuid.uuid4()),
+            'mod': self.username,
+            'action': 'removelink',
+            'created_utc': time(),
+            'subreddit': sub,
+            'sr_id36': sub_id(sub),
+            'target_fullname': None,
+            'target_author': None,
+            'details': None,
+            'description': None,
+        }
+        entry.update(fields)
+        return entry
+
+    def make_message(self, **fields):
+        message_id = fields.get('id') or self.new_id()
+        message = {
+            'id': message_id,
+            'name': 't4_' + message_id,
+            'author': 'someone',
+            'dest': self.username,
+            'subject': 'Message {}'.format(message_id),
+            'body': '',
+            'created_utc': time(),
+            'new': True,
+            'was_comment': False,
+            'subreddit': None,
+            'first_message_name': None,
+            'replies': '',
+        }
+        message.update(fields)
+        message['created'] = message['created_utc']
+        return message
+
+    def load(self, path):
+        with open(path, 'r') as f:
+            recorded = json.load(f)
+
+        for key, content in recorded.get('wiki', {}).items():
+            sub, page = key.split('/', 1)
+            self.wiki[(self.add_sub(sub), page)] = content
+        for sub, names in recorded.get('moderators', {}).items():
+            self.moderators[self.add_sub(sub)] = list(names)
+        for sub, entries in recorded.get('modlog', {}).items():
+            entries = [self.make_modaction(sub, **e) for e in entries]
+            self.modlog[self.add_sub(sub)] = sorted(entries, key=lambda e: -e['created_utc'])
+        for sub, links in recorded.get('posts', {}).items():
+            links = [self.make_link(sub, **link) for link in links]
+            self.posts[self.add_sub(sub)] = sorted(links, key=lambda p: -p['created_utc'])
+        for sub, values in recorded.get('settings', {}).items():
+            self.settings[self.add_sub(sub)].update(values)
+
+        messages = [self.make_message(**m) for m in recorded.get('messages', [])]
+        self.messages = sorted(self.messages + messages, key=lambda m: -m['created_utc'])
+
+    @classmethod
+    def synthetic(cls, subs, username='ion_bot', days=60, posts=50, seed=None,
+                  terms=None, domains=None):
+        """
+        Made up data for `subs`: a few moderators each, `days` of modlog,
+        `posts` links and the wiki pages we propagate. Also `posts` links
+        per sub from SYNTHETIC_SOURCES, for /r/all, some of which are images
+        on one of `domains` titled with one of `terms`.
+        """
+        rand = random.Random(seed)
+        data = cls(username)
+        now = time()
+
+        for sub in subs:
+            name = data.add_sub(sub)
+            mods = [username] + ['{}_mod{}'.format(name[:12], n) for n in range(rand.randint(1, 4))]
+            data.moderators[name] = mods
+
+            # some mods busy, some barely there
+            weights = [rand.random() ** 2 for _ in mods]
+            entries = [data.make_modaction(sub, mod=weighted_choice(rand, mods, weights),
+                                           action=rand.choice(SYNTHETIC_ACTIONS),
+                                           created_utc=now - rand.uniform(0, days * 86400))
+                       for _ in range(rand.randint(0, 10 * days))]
+            data.modlog[name] = sorted(entries, key=lambda e: -e['created_utc'])
+
+            links = [data.make_link(sub, title='Image of {} #{}'.format(sub, n),
+                                    url='https://i.example.com/{}/{}.jpg'.format(name, n),
+                                    score=rand.randint(1, 5000),
+                                    created_utc=now - rand.uniform(0, 7 * 86400))
+                     for n in range(posts)]
+            data.posts[name] = sorted(links, key=lambda p: -p['created_utc'])
+
+            for page in SYNTHETIC_PAGES:
+                data.wiki[(name, page)] = '# {} for /r/{}\n'.format(page, sub)
+
+        terms = terms or ['landscape']
+        domains = domains or [SYNTHETIC_IMAGE_DOMAIN]
+        for n in range(posts * len(subs)):
+            source = rand.choice(SYNTHETIC_SOURCES)
+            if rand.random() < SYNTHETIC_HIT_RATE:
+                title = 'The {} this morning [OC] [4032x3024]'.format(rand.choice(terms))
+                url = 'https://{}/{}.jpg'.format(rand.choice(domains), data.new_id())
+            else:
+                title = 'Something else entirely, #{}'.format(n)
+                url = 'https://{}/story/{}'.format(rand.choice(SYNTHETIC_OTHER_DOMAINS), n)
+            data.posts.setdefault(source, []).append(data.make_link(
+                source, title=title, url=url, author='user{}'.format(rand.randint(1, 500)),
+                score=rand.randint(1, 20000), created_utc=now - rand.uniform(0, 86400)))
+
+        for source in SYNTHETIC_SOURCES:
+            data.posts.get(source, []).sort(key=lambda p: -p['created_utc'])
+
+        return data
+
+
+class FakeRedditHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.handle_api('GET')
+
+    def do_POST(self):
+        self.handle_api('POST')
+
+    def handle_api(self, method):
+        server = self.server
+        url = urlsplit(self.path)
+        path = re.sub(r'/*(\.json)?/*$', '', url.path) or '/'
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        length = int(self.headers.get('Content-Length', 0))
+        if length:
+            body = self.rfile.read(length).decode('utf-8')
+            params.update({k: v[-1] for k, v in parse_qs(body).items()})
+
+        delay = server.latency + random.uniform(0, server.jitter)
+        if delay:
+            sleep(delay)
+
+        if random.random() < server.timeout_rate:
+            server.count(method, path, 'timeout')
+            sleep(server.hang)
+            # hang up without answering
+            self.close_connection = True
+            return
+
+        rate = server.count_request()
+        if rate[1] < 0:
+            server.count(method, path, 429)
+            self.respond(429, {'message': 'Too Many Requests', 'error': 429}, rate)
+            return
+
+        if random.random() < server.error_rate:
+            status = random.choice([500, 502, 503, 504])
+            server.count(method, path, status)
+            self.respond(status, {'message': 'Server Error', 'error': status}, rate)
+            return
+
+        route, match = server.route(method, path)
+        if route is None:
+            LOG.warning('[FakeReddit] No route for %s %s', method, path)
+            server.count(method, path, 404)
+            self.respond(404, {'message': 'Not Found', 'error': 404}, rate)
+            return
+
+        try:
+            status, payload = route(self, params, **match.groupdict())
+        except Exception:
+            LOG.exception('[FakeReddit] %s %s failed', method, path)
+            status, payload = 500, {'message': 'Internal Server Error', 'error': 500}
+
+        server.count(method, route.__name__, status)
+        self.respond(status, payload, rate)
+
+    def respond(self, status, payload, rate):
+        body = json.dumps(payload).encode('utf-8')
+        used, remaining, reset = rate
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-Ratelimit-Used', str(used))
+        self.send_header('X-Ratelimit-Remaining', '{:.1f}'.format(max(remaining, 0)))
+        self.send_header('X-Ratelimit-Reset', str(reset))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def base_url(self):
+        return 'http://{}'.format(self.headers.get('Host', '{}:{}'.format(*self.server.server_address[:2])))
+
+    def log_message(self, fmt, *args):
+        LOG.debug('[FakeReddit] %s - %s', self.client_address[0], fmt % args)
+
+    # routes; each returns (status, payload)
+
+    def access_token(self, params):
+        return 200, {
+            'access_token': uuid.uuid4().hex,
+            'token_type': 'bearer',
+            'expires_in': TOKEN_LIFETIME,
+            'scope': ' '.join(OAUTH_SCOPE),
+        }
+
+    def me(self, params):
+        name = self.server.data.username
+        return 200, {'name': name, 'id': sub_id(name), 'is_mod': True, 'created_utc': 0}
+
+    def about(self, params, sub):
+        data = self.server.data
+        if sub.lower() not in data.settings:
+            return 404, {'message': 'Not Found', 'error': 404}
+        return 200, {'kind': 't5', 'data': data.subreddit(sub)}
+
+    def subreddit_settings(self, params, sub):
+        data = self.server.data
+        if sub.lower() not in data.settings:
+            return 404, {'message': 'Not Found', 'error': 404}
+        return 200, {'kind': 'subreddit_settings', 'data': data.settings[sub.lower()]}
+
+    def site_admin(self, params):
+        data = self.server.data
+        name = data.sub_for_id(params.get('sr', ''))
+        if name is None:
+            return 200, {'json': {'errors': [['SUBREDDIT_NOEXIST', 'that subreddit doesn\'t exist', 'sr']]}}
+
+        with data.lock:
+            values = {k: v for k, v in params.items() if k not in ('sr', 'api_type', 'uh')}
+            data.settings[name].update(values)
+        return 200, {'json': {'errors': []}}
+
+    def user_about(self, params, name):
+        # old enough for the bot's account age check
+        return 200, {'kind': 't2', 'data': {'name': name, 'id': sub_id(name),
+                                            'created_utc': time() - 365 * 86400,
+                                            'link_karma': 1, 'comment_karma': 1}}
+
+    def moderators(self, params, sub):
+        names = self.server.data.moderators.get(sub.lower(), [])
+        children = [{'name': n, 'id': 't2_' + sub_id(n), 'date': 0, 'mod_permissions': ['all']}
+                    for n in names]
+        return 200, {'kind': 'UserList', 'data': {'children': children}}
+
+    def friend(self, params, sub=None):
+        data = self.server.data
+        sub = sub or params.get('r', '')
+        name = params.get('name', '')
+        if params.get('type') == 'moderator_invite':
+            LOG.info('[FakeReddit] Invited %s to moderate /r/%s', name, sub)
+            with data.lock:
+                data.invited.setdefault(sub.lower(), []).append(name)
+        elif params.get('type') == 'moderator':
+            with data.lock:
+                data.moderators.setdefault(sub.lower(), []).append(name)
+        return 200, {'json': {'errors': []}}
+
+    def accept_moderator_invite(self, params, sub=None):
+        data = self.server.data
+        sub = sub or params.get('r', '')
+        with data.lock:
+            name = data.add_sub(sub)
+            mods = data.moderators.setdefault(name, [])
+            if data.username not in mods:
+                mods.append(data.username)
+            if data.username in data.invited.get(name, []):
+                data.invited[name].remove(data.username)
+        return 200, {'json': {'errors': []}}
+
+    def moderators_invited(self, params, sub):
+        names = self.server.data.invited.get(sub.lower(), [])
+        return 200, {'moderators': [{'name': n, 'id': 't2_' + sub_id(n), 'date': 0,
+                                     'mod_permissions': ['all']} for n in names]}
+
+    def modlog(self, params, subs=None):
+        data = self.server.data
+        if subs is None:
+            names = list(data.modlog)
+        else:
+            names = [s.lower() for s in subs.split('+')]
+
+        entries = [e for name in names for e in data.modlog.get(name, [])]
+        if subs is None or len(names) > 1:
+            entries.sort(key=lambda e: -e['created_utc'])
+        if params.get('type'):
+            entries = [e for e in entries if e['action'] == params['type']]
+        if params.get('mod'):
+            wanted = set(params['mod'].split(','))
+            entries = [e for e in entries if e['mod'] in wanted]
+
+        return 200, listing('modaction', entries, params, key='id')
+
+    def wiki_page(self, params, sub, page):
+        data = self.server.data
+        content = data.wiki.get((sub.lower(), page))
+        if content is None:
+            return 404, {'reason': 'PAGE_NOT_CREATED', 'message': 'Not Found', 'error': 404}
+
+        return 200, {'kind': 'wikipage', 'data': {
+            'content_md': content,
+            'content_html': '',
+            'may_revise': True,
+            'revision_date': time(),
+            'revision_by': {'kind': 't2', 'data': {'name': data.username}},
+        }}
+
+    def wiki_edit(self, params, sub=None):
+        data = self.server.data
+        sub = sub or params.get('r', '')
+        with data.lock:
+            data.wiki[(data.add_sub(sub), params.get('page', ''))] = params.get('content', '')
+            data.modlog[sub.lower()].insert(0, data.make_modaction(
+                sub, action='wikirevise', details='Page {} edited'.format(params.get('page'))))
+        return 200, {}
+
+    def posts(self, params, subs=None, sort=None):
+        data = self.server.data
+        if subs is None or subs.lower() in EVERYWHERE:
+            names = list(data.posts)
+        else:
+            names = [s.lower() for s in subs.split('+')]
+
+        links = [p for name in names for p in data.posts.get(name, [])]
+        if sort in ('hot', 'top'):
+            links.sort(key=lambda p: -p['score'])
+        else:
+            links.sort(key=lambda p: -p['created_utc'])
+        return 200, listing('t3', links, params)
+
+    def submission(self, params, link_id, sub=None):
+        data = self.server.data
+        for name in ([sub.lower()] if sub else list(data.posts)):
+            for link in data.posts.get(name, []):
+                if link['id'] == link_id:
+                    return 200, [listing('t3', [link], {}), listing('t1', [], {})]
+        return 404, {'message': 'Not Found', 'error': 404}
+
+    def submit(self, params):
+        data = self.server.data
+        if random.random() < self.server.ratelimit_rate:
+            return 200, self.ratelimited()
+
+        sub = params.get('sr', '')
+        if sub.lower() not in data.settings:
+            return 200, {'json': {'errors': [['SUBREDDIT_NOEXIST', 'that subreddit doesn\'t exist', 'sr']]}}
+
+        with data.lock:
+            link = data.make_link(sub, title=params.get('title', ''), url=params.get('url', ''),
+                                  selftext=params.get('text', ''))
+            data.posts[sub.lower()].insert(0, link)
+
+        return 200, {'json': {'errors': [], 'data': {
+            'url': self.base_url() + link['permalink'],
+            'id': link['id'],
+            'name': link['name'],
+        }}}
+
+    def comment(self, params):
+        data = self.server.data
+        if random.random() < self.server.ratelimit_rate:
+            return 200, self.ratelimited()
+
+        comment_id = data.new_id()
+        parent = params.get('thing_id', '')
+        comment = {
+            'id': comment_id,
+            'name': 't1_' + comment_id,
+            'body': params.get('text', ''),
+            'author': data.username,
+            'parent_id': parent,
+            'link_id': parent if parent.startswith('t3_') else None,
+            'created_utc': time(),
+            'replies': '',
+        }
+        return 200, {'json': {'errors': [], 'data': {'things': [{'kind': 't1', 'data': comment}]}}}
+
+    def compose(self, params):
+        data = self.server.data
+        if random.random() < self.server.ratelimit_rate:
+            return 200, self.ratelimited()
+
+        with data.lock:
+            data.sent.append({'to': params.get('to'), 'subject': params.get('subject'),
+                              'body': params.get('text')})
+        return 200, {'json': {'errors': []}}
+
+    def inbox(self, params, box):
+        messages = self.server.data.messages
+        if box == 'unread':
+            messages = [m for m in messages if m['new']]
+        elif box == 'messages':
+            messages = [m for m in messages if not m['was_comment']]
+        return 200, listing('t4', messages, params)
+
+    def modmail(self, params, sub):
+        names = {s.lower() for s in sub.split('+')}
+        messages = [m for m in self.server.data.messages
+                    if m['subreddit'] and m['subreddit'].lower() in names]
+        return 200, listing('t4', messages, params)
+
+    def read_message(self, params):
+        data = self.server.data
+        read = set(params.get('id', '').split(','))
+        with data.lock:
+            for message in data.messages:
+                if message['name'] in read:
+                    message['new'] = False
+        return 200, {}
+
+    @staticmethod
+    def ratelimited():
+        return {'json': {
+            'errors': [['RATELIMIT', 'you are doing that too much. try again in {} seconds.'.format(
+                SUBMIT_RATELIMIT), 'ratelimit']],
+            'ratelimit': SUBMIT_RATELIMIT,
+        }}
+
+
+# (method, path pattern, handler); the first match wins
+ROUTES = [
+    ('POST', r'/api/v1/access_token', FakeRedditHandler.access_token),
+    ('GET', r'/api/v1/me', FakeRedditHandler.me),
+    ('GET', r'/api/v1/(?P<sub>[^/]+)/moderators_invited', FakeRedditHandler.moderators_invited),
+    ('POST', r'/api/site_admin', FakeRedditHandler.site_admin),
+    ('POST', r'/api/submit', FakeRedditHandler.submit),
+    ('POST', r'/api/comment', FakeRedditHandler.comment),
+    ('POST', r'/api/compose', FakeRedditHandler.compose),
+    ('POST', r'/api/read_message', FakeRedditHandler.read_message),
+    ('POST', r'/api/friend', FakeRedditHandler.friend),
+    ('POST', r'/api/accept_moderator_invite', FakeRedditHandler.accept_moderator_invite),
+    ('POST', r'/api/wiki/edit', FakeRedditHandler.wiki_edit),
+    ('GET', r'/message/(?P<box>inbox|unread|messages)', FakeRedditHandler.inbox),
+    ('GET', r'/user/(?P<name>[^/]+)/about', FakeRedditHandler.user_about),
+    ('GET', r'/user/[^/]+/m/[^/]+/about/log', FakeRedditHandler.modlog),
+    ('GET', r'/user/[^/]+/m/[^/]+(/(?P<sort>hot|new|top|rising))?', FakeRedditHandler.posts),
+    ('GET', r'/comments/(?P<link_id>\w+)(/.*)?', FakeRedditHandler.submission),
+    ('GET', r'/r/(?P<sub>[^/]+)/comments/(?P<link_id>\w+)(/.*)?', FakeRedditHandler.submission),
+    ('GET', r'/r/(?P<subs>[^/]+)/about/log', FakeRedditHandler.modlog),
+    ('GET', r'/r/(?P<sub>[^/]+)/about/moderators', FakeRedditHandler.moderators),
+    ('GET', r'/r/(?P<sub>[^/]+)/about/edit', FakeRedditHandler.subreddit_settings),
+    ('GET', r'/r/(?P<sub>[^/]+)/about', FakeRedditHandler.about),
+    ('GET', r'/r/(?P<sub>[^/]+)/message/moderator(/.*)?', FakeRedditHandler.modmail),
+    ('GET', r'/r/(?P<sub>[^/]+)/wiki/(?P<page>.+)', FakeRedditHandler.wiki_page),
+    ('POST', r'/r/(?P<sub>[^/]+)/api/wiki/edit', FakeRedditHandler.wiki_edit),
+    ('POST', r'/r/(?P<sub>[^/]+)/api/friend', FakeRedditHandler.friend),
+    ('POST', r'/r/(?P<sub>[^/]+)/api/accept_moderator_invite', FakeRedditHandler.accept_moderator_invite),
+    ('GET', r'/r/(?P<subs>[^/]+)(/(?P<sort>hot|new|top|rising))?', FakeRedditHandler.posts),
+]
+
+
+class FakeRedditServer(ThreadingMixIn, HTTPServer):
+    """
+    Serves `data` (a FakeData) like reddit would.
+
+    `latency` seconds, plus up to `jitter` more, are added to every request.
+    `error_rate` of requests get a 5xx, and `timeout_rate` hang for `hang`
+    seconds and are then dropped unanswered. `ratelimit_rate` of submissions,
+    comments and messages are refused with reddit's RATELIMIT error.
+    """
+    daemon_threads = True
+
+    def __init__(self, addr, data, latency=0, jitter=0, error_rate=0, timeout_rate=0, hang=30,
+                 ratelimit_rate=0, rate_limit=RATE_LIMIT, rate_window=RATE_WINDOW):
+        super().__init__(addr, FakeRedditHandler)
+        self.data = data
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.hang = hang
+        self.ratelimit_rate = ratelimit_rate
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+
+        self.routes = [(method, re.compile(pattern + '$'), func) for method, pattern, func in ROUTES]
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._window_start = 0
+        self._used = 0
+
+    def route(self, method, path):
+        for route_method, pattern, func in self.routes:
+            if route_method != method:
+                continue
+            match = pattern.match(path)
+            if match:
+                return func, match
+        return None, None
+
+    def count_request(self):
+        """Count a request against the window, like reddit's rate limiter."""
+        with self._lock:
+            now = time()
+            start = now - now % self.rate_window
+            if start != self._window_start:
+                self._window_start = start
+                self._used = 0
+            self._used += 1
+            return self._used, self.rate_limit - self._used, int(start + self.rate_window - now)
+
+    def count(self, method, name, status):
+        with self._lock:
+            self.stats[(method, name, status)] += 1
+
+    def report(self):
+        """Lines summarising the requests served, by route and status."""
+        with self._lock:
+            stats = sorted(self.stats.items(), key=lambda kv: (kv[0][1], kv[0][0], str(kv[0][2])))
+        return ['{:<4} {:<28} {:<7} {}'.format(method, name, status, n)
+                for (method, name, status), n in stats]
+
+    @property
+    def url(self):
+        return 'http://{}:{}'.format(*self.server_address[:2])
+
+    def start(self):
+        """Serve from a background thread."""
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        LOG.info('[FakeReddit] Listening on %s', self.url)
+        return thread
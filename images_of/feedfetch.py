@@ -0,0 +1,200 @@
+"""
+Fetching RSS/Atom feeds for the network, cheaply.
+
+All the feeds are fetched up front, a few at a time, with conditional GETs:
+each feed's ETag and Last-Modified are remembered between runs, so a feed
+that hasn't changed costs a 304 and no parsing. Feeds are parsed only when
+their entries are wanted.
+
+A feed's validators are only remembered once all of its entries have been
+dealt with. Otherwise a feed we stopped reading part way, because its sub
+had posted enough, would answer 304 next time and its remaining entries
+would never be looked at.
+"""
+import logging
+from time import monotonic, time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import feedparser
+import requests
+
+from images_of.ratelimit import concurrent_map
+from images_of.state import load_json, save_json
+
+LOG = logging.getLogger(__name__)
+
+CACHE_FILE = 'feed-cache.json'
+FETCH_WORKERS = 8
+FETCH_TIMEOUT = 30
+
+SEEN_FILE = 'feed-seen.json'
+# how long we remember posting an entry; longer than feeds keep them
+SEEN_TTL = 90 * 24 * 60 * 60
+
+# query parameters that only track where a click came from
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid')
+
+
+def canonical_link(url):
+    """
+    `url` with the differences that don't change what it points to taken
+    out: case of the scheme and host, fragments, tracking parameters and
+    trailing slashes.
+    """
+    parts = urlsplit(url.strip())
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if not k.lower().startswith(TRACKING_PARAMS)]
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(),
+                       parts.path.rstrip('/') or '/', urlencode(sorted(query)), ''))
+
+
+class FetchedFeed:
+    """The result of fetching one feed."""
+
+    def __init__(self, url, response=None, elapsed=0, error=None):
+        self.url = url
+        self.response = response
+        self.elapsed = elapsed
+        self.error = error
+        self._parsed = None
+
+    @property
+    def not_modified(self):
+        return self.response is not None and self.response.status_code == 304
+
+    @property
+    def ok(self):
+        return self.response is not None and self.response.status_code == 200
+
+    @property
+    def size(self):
+        return len(self.response.content) if self.ok else 0
+
+    def parse(self):
+        if self._parsed is None:
+            self._parsed = feedparser.parse(self.response.content,
+                                            response_headers=dict(self.response.headers))
+        return self._parsed
+
+
+class FeedFetcher:
+    """
+    Fetches feeds with the validators remembered in the JSON file at
+    `cache_path`, and keeps count of what that saved.
+    """
+
+    def __init__(self, cache_path, workers=FETCH_WORKERS):
+        self.cache_path = cache_path
+        self.workers = workers
+        self.cache = load_json(cache_path, {})
+        self.session = requests.Session()
+
+        self.fetched_bytes = 0
+        self.saved_bytes = 0
+        self.not_modified = 0
+        self.failed = 0
+        self.fetch_time = 0
+        self.wall_time = 0
+
+    def _fetch(self, url):
+        headers = {}
+        cached = self.cache.get(url, {})
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('modified'):
+            headers['If-Modified-Since'] = cached['modified']
+
+        start = monotonic()
+        try:
+            response = self.session.get(url, headers=headers, timeout=FETCH_TIMEOUT)
+        except requests.RequestException as e:
+            return FetchedFeed(url, elapsed=monotonic() - start, error=e)
+        return FetchedFeed(url, response, elapsed=monotonic() - start)
+
+    def fetch_all(self, urls):
+        """Fetch each of `urls` once. Returns {url: FetchedFeed}."""
+        urls = sorted(set(urls))
+        start = monotonic()
+        results = concurrent_map(self._fetch, urls, workers=self.workers)
+        self.wall_time += monotonic() - start
+
+        feeds = {}
+        for url, feed, _ in results:
+            feeds[url] = feed
+            self.fetch_time += feed.elapsed
+
+            if feed.error is not None:
+                LOG.warning('Could not fetch %s: %s', url, feed.error)
+                self.failed += 1
+            elif feed.not_modified:
+                LOG.debug('%s not modified', url)
+                self.not_modified += 1
+                self.saved_bytes += self.cache.get(url, {}).get('size', 0)
+            elif not feed.ok:
+                LOG.warning('Could not fetch %s: HTTP %s', url, feed.response.status_code)
+                self.failed += 1
+            else:
+                self.fetched_bytes += feed.size
+
+        return feeds
+
+    def done_with(self, feed):
+        """Remember `feed`'s validators, now that all its entries are dealt with."""
+        if not feed.ok:
+            return
+        self.cache[feed.url] = {
+            'etag': feed.response.headers.get('ETag'),
+            'modified': feed.response.headers.get('Last-Modified'),
+            'size': feed.size,
+        }
+
+    def save(self):
+        save_json(self.cache_path, self.cache)
+
+    def report(self):
+        return ('{} feed(s) not modified, saving ~{} KB; {} KB fetched; {} failed. '
+                'Fetching took {:.1f}s, against {:.1f}s one at a time').format(
+                    self.not_modified, self.saved_bytes // 1024, self.fetched_bytes // 1024,
+                    self.failed, self.wall_time, self.fetch_time)
+
+
+class SeenEntries:
+    """
+    Feed entries already posted to each sub, by GUID and by canonical link,
+    kept in the JSON file at `path` for `ttl` seconds after they were posted.
+    """
+
+    def __init__(self, path, ttl=SEEN_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.subs = load_json(path, {})
+        self.skipped = 0
+
+        expired = time() - ttl
+        for sub, seen in self.subs.items():
+            self.subs[sub] = {key: t for key, t in seen.items() if t > expired}
+
+    @staticmethod
+    def _keys(entry):
+        keys = []
+        if entry.get('id'):
+            keys.append('guid:' + entry.id)
+        if entry.get('link'):
+            keys.append('link:' + canonical_link(entry.link))
+        return keys
+
+    def seen(self, sub, entry):
+        seen = self.subs.get(sub.lower(), {})
+        if any(key in seen for key in self._keys(entry)):
+            self.skipped += 1
+            return True
+        return False
+
+    def add(self, sub, entry):
+        seen = self.subs.setdefault(sub.lower(), {})
+        now = time()
+        for key in self._keys(entry):
+            seen[key] = now
+
+    def save(self):
+        save_json(self.path, self.subs)
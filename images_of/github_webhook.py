@@ -0,0 +1,179 @@
+"""
+Embedded receiver for GitHub webhook deliveries.
+
+GitHub pushes events to the announcer as they happen, rather than waiting to be
+polled. Deliveries are checked against the shared webhook secret, converted to
+the same `github3` Event objects the Events API returns, and handed to a
+callback, so they go through the existing GitHub formatters unchanged.
+"""
+from collections import deque
+import hashlib
+import hmac
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.request import Request, urlopen
+
+from github3.events import Event
+
+LOG = logging.getLogger(__name__)
+
+# webhook event names, and the Events API type each corresponds to
+EVENT_TYPES = {
+    'push': 'PushEvent',
+    'issues': 'IssuesEvent',
+    'issue_comment': 'IssueCommentEvent',
+    'pull_request': 'PullRequestEvent',
+}
+
+# GitHub caps webhook payloads at 25 MB
+MAX_BODY = 25 * 1024 * 1024
+
+
+def sign(secret, body):
+    """Compute the `X-Hub-Signature-256` header value for a delivery body."""
+    digest = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return 'sha256={}'.format(digest)
+
+
+def verify_signature(secret, body, signature):
+    """Check a delivery's `X-Hub-Signature-256` header against the secret."""
+    if not secret or not signature:
+        return False
+    return hmac.compare_digest(sign(secret, body), signature)
+
+
+def delivery_to_event(event_name, delivery_id, payload):
+    """
+    Convert a webhook delivery into a `github3` Event, shaped the way the
+    Events API would have returned it. Returns None for event types we don't
+    announce.
+    """
+    event_type = EVENT_TYPES.get(event_name)
+    if event_type is None:
+        return None
+
+    if event_type == 'PushEvent':
+        # webhook commits are keyed by 'id' rather than the API's 'sha'
+        payload = dict(payload)
+        payload['commits'] = [dict(c, sha=c['id']) for c in payload.get('commits', [])]
+
+    repo = payload.get('repository') or {}
+    return Event({
+        'id': delivery_id,
+        'type': event_type,
+        'actor': payload.get('sender'),
+        'repo': {'name': repo['full_name']} if 'full_name' in repo else None,
+        'payload': payload,
+        'public': not repo.get('private', False),
+    })
+
+
+class WebhookRequestHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            self.respond(400)
+            return
+
+        # turn it away unread: the signature can only be checked once it's all read
+        if length < 0 or length > MAX_BODY:
+            LOG.warning('[Webhook] Rejecting a %s byte delivery from %s', length,
+                        self.client_address[0])
+            self.close_connection = True
+            self.respond(413)
+            return
+
+        body = self.rfile.read(length)
+
+        if not verify_signature(self.server.secret, body, self.headers.get('X-Hub-Signature-256')):
+            LOG.warning('[Webhook] Rejecting delivery with a bad signature from %s',
+                        self.client_address[0])
+            self.respond(403)
+            return
+
+        event_name = self.headers.get('X-GitHub-Event', '')
+        delivery_id = self.headers.get('X-GitHub-Delivery')
+
+        try:
+            payload = json.loads(body.decode('utf-8'))
+        except ValueError:
+            self.respond(400)
+            return
+
+        self.respond(202)
+        self.server.dispatch(event_name, delivery_id, payload)
+
+    def respond(self, status):
+        self.send_response(status)
+        self.end_headers()
+
+    def log_message(self, fmt, *args):
+        LOG.debug('[Webhook] %s - %s', self.client_address[0], fmt % args)
+
+
+class WebhookServer(ThreadingMixIn, HTTPServer):
+    """
+    HTTP server accepting GitHub webhook deliveries. `callback` is called with
+    each converted Event from the server's own thread.
+    """
+    daemon_threads = True
+
+    def __init__(self, addr, secret, callback):
+        if not secret:
+            raise ValueError('A webhook secret is required to verify deliveries')
+
+        super().__init__(addr, WebhookRequestHandler)
+        self.secret = secret
+        self.callback = callback
+
+        self._seen = deque(maxlen=100)
+        self._lock = threading.Lock()
+
+    def dispatch(self, event_name, delivery_id, payload):
+        # GitHub redelivers on timeouts and on request, don't announce twice
+        with self._lock:
+            if delivery_id is not None and delivery_id in self._seen:
+                LOG.info('[Webhook] Ignoring redelivery %s', delivery_id)
+                return
+            self._seen.append(delivery_id)
+
+        if event_name == 'ping':
+            LOG.info('[Webhook] Received ping: %s', payload.get('zen'))
+            return
+
+        event = delivery_to_event(event_name, delivery_id, payload)
+        if event is None:
+            LOG.debug('[Webhook] Ignoring %s delivery', event_name)
+            return
+
+        LOG.info('[Webhook] Received %s delivery %s', event.type, delivery_id)
+        self.callback(event)
+
+    def start(self):
+        """Serve deliveries from a background thread."""
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        LOG.info('[Webhook] Listening on %s:%s', *self.server_address[:2])
+        return thread
+
+
+def replay(url, event_name, body, secret, delivery_id=None):
+    """
+    Post a recorded delivery body to a webhook receiver, signed as GitHub
+    would sign it. Returns the HTTP status.
+    """
+    headers = {
+        'Content-Type': 'application/json',
+        'X-GitHub-Event': event_name,
+        'X-Hub-Signature-256': sign(secret, body),
+    }
+    if delivery_id is not None:
+        headers['X-GitHub-Delivery'] = delivery_id
+
+    with urlopen(Request(url, data=body, headers=headers)) as response:
+        return response.status
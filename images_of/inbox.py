@@ -0,0 +1,56 @@
+"""
+Helpers for working through reddit inboxes.
+"""
+import logging
+
+LOG = logging.getLogger(__name__)
+
+# fullnames marked as read per request
+READ_BATCH_SIZE = 100
+
+
+class ReadMarker:
+    """
+    Collects messages to mark as read during a pass over an inbox, and marks
+    them in as few requests as possible, rather than one request per message.
+
+    Use as a context manager to flush when the pass is done::
+
+        with ReadMarker(r) as marker:
+            for message in r.get_unread():
+                ...
+                marker.add(message)
+    """
+
+    def __init__(self, r, batch_size=READ_BATCH_SIZE, budget=None):
+        self.r = r
+        self.batch_size = batch_size
+        self.budget = budget
+        self.pending = []
+        self.requests = 0
+        self.marked = 0
+
+    def add(self, message):
+        """Queue a message (or comment reply) to be marked as read."""
+        if message.fullname not in self.pending:
+            self.pending.append(message.fullname)
+
+    def flush(self):
+        """Mark everything queued as read."""
+        while self.pending:
+            batch, self.pending = self.pending[:self.batch_size], self.pending[self.batch_size:]
+            if self.budget is not None:
+                self.budget.acquire()
+            # pylint: disable=W0212
+            self.r._mark_as_read(batch)
+            self.requests += 1
+            self.marked += len(batch)
+
+        if self.marked:
+            LOG.debug('Marked %s message(s) as read in %s request(s)', self.marked, self.requests)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
@@ -0,0 +1,71 @@
+"""
+Hands log records to a background thread to write out.
+
+Handlers write to the terminal, files or log shippers as they're called, so
+a slow one holds up whatever was logging -- the bot between crossposts, say.
+With `queue = true` in the logging config, each configured logger's handlers
+are moved behind a QueueHandler. Records go on one queue, and a listener
+thread writes each out with the handlers of the logger it came from, so
+where records end up is the same as without the queue.
+"""
+import atexit
+import copy
+from logging.handlers import QueueHandler, QueueListener
+import queue
+
+
+class RoutingQueueHandler(QueueHandler):
+    """Queues records along with the handlers that should write them."""
+
+    def __init__(self, records, handlers):
+        super().__init__(records)
+        self.targets = tuple(handlers)
+        # don't bother queueing what none of them would write
+        self.setLevel(min(h.level for h in self.targets))
+
+    def prepare(self, record):
+        # merge in the args now, as they may change before the listener gets
+        # to the record; the rest of the formatting is left to the listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        self.queue.put_nowait((self.targets, record))
+
+
+class RoutingQueueListener(QueueListener):
+    def __init__(self, records):
+        super().__init__(records)
+
+    def handle(self, item):
+        handlers, record = item
+        for handler in handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def stop(self):
+        if self._thread is not None:
+            super().stop()
+
+
+def queue_logging(loggers):
+    """
+    Move the handlers of each of `loggers` behind one queue, written out by a
+    background thread. Returns the started listener. It's stopped at exit,
+    once what's left on the queue is written.
+    """
+    records = queue.Queue()
+    for logger in loggers:
+        handlers = list(logger.handlers)
+        if not handlers:
+            continue
+        for handler in handlers:
+            logger.removeHandler(handler)
+        logger.addHandler(RoutingQueueHandler(records, handlers))
+
+    listener = RoutingQueueListener(records)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,192 @@
+"""
+Persistent queue of reddit messages and replies waiting to be sent.
+
+Tools enqueue what they mean to send under a key naming it, e.g. the
+subreddit being mailed, and then drain the queue. Each item moves from
+queued, to sending, to delivered (or failed), with every step committed to
+disk before the next, so a run that dies halfway can simply be rerun:
+delivered items aren't sent again, and enqueueing the same key twice is a
+no-op.
+
+An item left as sending was interrupted mid-request, and may or may not
+have gone out. Those are never retried on their own; `unconfirmed` lists
+them and `requeue_unconfirmed` puts them back once someone has checked.
+
+Items reddit answers with a server error are tried again a few times before
+being marked failed. Failed items stay failed, enqueued again or not, until
+`requeue_failed` puts them back.
+"""
+import logging
+import sqlite3
+from time import sleep, time
+
+from praw.errors import APIException, HTTPException, RateLimitExceeded
+
+from images_of.ratelimit import RateBudget
+
+LOG = logging.getLogger(__name__)
+
+QUEUE_FILE = 'mailqueue.sqlite3'
+
+# item kinds
+MESSAGE = 'message'
+REPLY = 'reply'
+
+# item statuses
+QUEUED = 'queued'
+SENDING = 'sending'
+DELIVERED = 'delivered'
+FAILED = 'failed'
+
+# tries at an item reddit keeps answering with server errors, and seconds to
+# wait after the first, doubling each time
+MAX_ATTEMPTS = 5
+RETRY_DELAY = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    target TEXT NOT NULL,
+    subject TEXT,
+    body TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    queued_utc REAL NOT NULL,
+    delivered_utc REAL
+);
+CREATE INDEX IF NOT EXISTS items_status ON items (status, queued_utc);
+"""
+
+
+class MailQueue:
+    """Messages and replies to send, kept in the sqlite database at `path`."""
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self.sent = 0
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _enqueue(self, key, kind, target, subject, body):
+        with self.db:
+            cur = self.db.execute(
+                'INSERT OR IGNORE INTO items (key, kind, target, subject, body, status, queued_utc) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, kind, target, subject, body, QUEUED, time()))
+        return cur.rowcount == 1
+
+    def enqueue_message(self, key, to, subject, body):
+        """
+        Queue a private message to `to` (a user, or /r/sub for modmail).
+        Returns False if `key` was already queued.
+        """
+        return self._enqueue(key, MESSAGE, to, subject, body)
+
+    def enqueue_reply(self, key, fullname, body):
+        """Queue a reply to the message or comment `fullname`."""
+        return self._enqueue(key, REPLY, fullname, None, body)
+
+    def _set_status(self, key, status, error=None):
+        with self.db:
+            self.db.execute(
+                'UPDATE items SET status = ?, error = ?, delivered_utc = ? WHERE key = ?',
+                (status, error, time() if status == DELIVERED else None, key))
+
+    def counts(self):
+        """{status: number of items}"""
+        return dict(self.db.execute('SELECT status, COUNT(*) FROM items GROUP BY status'))
+
+    def unconfirmed(self):
+        """Keys of items interrupted while being sent."""
+        return [key for key, in self.db.execute(
+            'SELECT key FROM items WHERE status = ? ORDER BY queued_utc', (SENDING,))]
+
+    def requeue_unconfirmed(self):
+        with self.db:
+            return self.db.execute('UPDATE items SET status = ? WHERE status = ?',
+                                   (QUEUED, SENDING)).rowcount
+
+    def failed(self):
+        """(key, error) of items that couldn't be sent."""
+        return list(self.db.execute(
+            'SELECT key, error FROM items WHERE status = ? ORDER BY queued_utc', (FAILED,)))
+
+    def requeue_failed(self):
+        with self.db:
+            return self.db.execute('UPDATE items SET status = ?, attempts = 0, error = NULL '
+                                   'WHERE status = ?', (QUEUED, FAILED)).rowcount
+
+    def _send(self, r, kind, target, subject, body):
+        if kind == MESSAGE:
+            r.send_message(target, subject, body)
+        else:
+            # pylint: disable=W0212
+            r._add_comment(target, body)
+
+    def drain(self, r, budget=None, prefix=None):
+        """
+        Send everything queued, oldest first, as fast as `budget` allows.
+        When reddit says we're sending too fast, wait as long as it asks and
+        try again; on a server error, back off and try again, up to
+        MAX_ATTEMPTS tries in all. If `prefix` is given, only keys starting
+        with it are sent. Returns the number of items delivered.
+        """
+        budget = budget or RateBudget()
+        query = 'SELECT key, kind, target, subject, body, attempts FROM items WHERE status = ?'
+        args = [QUEUED]
+        if prefix is not None:
+            query += ' AND substr(key, 1, ?) = ?'
+            args += [len(prefix), prefix]
+        query += ' ORDER BY queued_utc'
+
+        delivered = 0
+        for key, kind, target, subject, body, attempts in self.db.execute(query, args).fetchall():
+            while True:
+                budget.acquire()
+                attempts += 1
+                with self.db:
+                    self.db.execute('UPDATE items SET status = ?, attempts = attempts + 1 '
+                                    'WHERE key = ?', (SENDING, key))
+                try:
+                    self._send(r, kind, target, subject, body)
+                except RateLimitExceeded as e:
+                    # reddit turned it away; it certainly wasn't sent
+                    self._set_status(key, QUEUED)
+                    LOG.info('Rate limited sending %s; retrying in %ss', key, e.sleep_time)
+                    sleep(e.sleep_time)
+                    continue
+                except HTTPException as e:
+                    # pylint: disable=W0212
+                    status = getattr(e._raw, 'status_code', 0)
+                    if status >= 500 and attempts < MAX_ATTEMPTS:
+                        delay = RETRY_DELAY * 2 ** (attempts - 1)
+                        self._set_status(key, QUEUED, str(e))
+                        LOG.warning('Server error sending %s: %s; retrying in %ss', key, e, delay)
+                        sleep(delay)
+                        continue
+                    LOG.error('Could not send %s: %s', key, e)
+                    self._set_status(key, FAILED, str(e))
+                    break
+                except APIException as e:
+                    LOG.error('Could not send %s: %s', key, e)
+                    self._set_status(key, FAILED, str(e))
+                    break
+
+                self._set_status(key, DELIVERED)
+                delivered += 1
+                self.sent += 1
+                LOG.debug('Delivered %s', key)
+                break
+
+        return delivered
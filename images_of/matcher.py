@@ -0,0 +1,98 @@
+"""
+Compiles the bot's matching rules with the fastest regex engine available.
+
+The rules -- subreddit search and ignore terms, the domain and extension
+patterns and the subreddit blacklist -- are edited by moderators and run
+against every title on /r/all, so a rule that backtracks badly can stall
+the bot. When the `re2` module (google-re2 or pyre2) is installed, rules are
+compiled with it, matching in time linear in the title whatever the rule.
+Rules re2 can't handle, mostly backreferences and lookarounds, are found
+when they're compiled and fall back to `re`, with a warning naming them.
+
+re2's `\\b` only knows ASCII letters, so a whole-word term with an accented
+letter at either end, like Malé, Åland or maraj(ó|o), would never match
+under it. Any rule with a term containing a non-ASCII character is compiled
+with `re` instead, with a warning. re2 can still find an ASCII term running
+into an accented letter, e.g. Mal in Malé, where `re` wouldn't.
+
+The engine is picked with `regex-backend` in the [posts] settings: 'auto'
+(re2 if installed), 're' or 're2'.
+"""
+from functools import lru_cache
+import logging
+import re
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+from images_of import settings
+
+LOG = logging.getLogger(__name__)
+
+BACKENDS = ['re', 're2']
+
+# flags re2 takes inline, as it has no flags argument
+INLINE_FLAGS = {re.IGNORECASE: 'i', re.MULTILINE: 'm', re.DOTALL: 's'}
+
+
+def available_backends():
+    return [b for b in BACKENDS if b == 're' or re2 is not None]
+
+
+@lru_cache(maxsize=None)
+def default_backend():
+    wanted = settings.REGEX_BACKEND
+    if wanted == 'auto':
+        return 're2' if re2 is not None else 're'
+    if wanted == 're2' and re2 is None:
+        LOG.warning('regex-backend is re2, but re2 is not installed; using re')
+        return 're'
+    return wanted
+
+
+def compile_rule(pattern, flags=0, backend=None, name=None):
+    """
+    Compile `pattern` with `backend`, or the configured one. The result has
+    `search`, `match` and `fullmatch` like a compiled `re` pattern, whichever
+    engine compiled it. `name` identifies the rule in warnings.
+    """
+    backend = backend or default_backend()
+
+    if backend == 're2' and not flags & ~sum(INLINE_FLAGS):
+        inline = ''.join(c for f, c in sorted(INLINE_FLAGS.items()) if flags & f)
+        try:
+            return re2.compile('(?{}){}'.format(inline, pattern) if inline else pattern)
+        except Exception as e:  # each binding has its own error type
+            LOG.warning('re2 can\'t compile %s, using re for it: %s', name or repr(pattern), e)
+
+    return re.compile(pattern, flags)
+
+
+def is_ascii(term):
+    # a regex can put a non-ASCII letter at a word's edge in too many ways to
+    # look for, e.g. maraj(ó|o), so any non-ASCII at all counts
+    return all(ord(c) < 128 for c in term)
+
+
+def compile_terms(terms, flags=0, backend=None, name=None):
+    """
+    Compile a rule matching any of `terms` (a string or list of them) as
+    whole words, or None if there are no terms.
+    """
+    if terms is None:
+        return None
+    if isinstance(terms, str):
+        terms = [terms]
+
+    backend = backend or default_backend()
+    if backend == 're2':
+        unbounded = [term for term in terms if not is_ascii(term)]
+        if unbounded:
+            LOG.warning('re2 can\'t find %s as whole words, using re for it: %s',
+                        name or 'terms', ', '.join(unbounded))
+            backend = 're'
+
+    pattern = '(\\b{}\\b)'.format('\\b|\\b'.join(terms))
+    return compile_rule(pattern, flags, backend=backend, name=name)
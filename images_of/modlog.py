@@ -0,0 +1,208 @@
+"""
+Local archive of subreddit moderation logs.
+
+reddit only hands out modlogs a page at a time, newest first, so answering
+"what has this mod done in the last 60 days" from the API means paging
+through everything since. Instead we keep every entry we've seen in an
+sqlite database, top it up with only what's newer than the last sync, and
+answer questions about mod activity locally.
+"""
+import logging
+import sqlite3
+from time import time
+
+LOG = logging.getLogger(__name__)
+
+# entries reddit returns per modlog request
+PAGE_SIZE = 100
+
+# subs whose modlogs are read through one combined listing
+CHUNK_SIZE = 50
+
+# actions changing who moderates a sub
+MODERATOR_ACTIONS = ['acceptmoderatorinvite', 'removemoderator', 'uninvitemoderator']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id TEXT PRIMARY KEY,
+    sub TEXT NOT NULL,
+    mod TEXT NOT NULL,
+    action TEXT NOT NULL,
+    created_utc REAL NOT NULL,
+    target TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_sub_mod ON entries (sub, mod, created_utc);
+CREATE INDEX IF NOT EXISTS entries_sub_time ON entries (sub, created_utc);
+
+CREATE TABLE IF NOT EXISTS syncs (
+    sub TEXT PRIMARY KEY,
+    newest_id TEXT,
+    newest_utc REAL,
+    covered_from REAL NOT NULL,
+    synced_utc REAL NOT NULL
+);
+"""
+
+
+class ModlogArchive:
+    """
+    Modlog entries for any number of subs, kept in the sqlite database at
+    `path`. Sub names are stored lowercased.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self.requests = 0
+
+        # archives from before targets were kept
+        columns = [row[1] for row in self.db.execute('PRAGMA table_info(entries)')]
+        if 'target' not in columns:
+            with self.db:
+                self.db.execute('ALTER TABLE entries ADD COLUMN target TEXT')
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def sync_state(self, sub):
+        """(newest_id, newest_utc, covered_from), or None if never synced."""
+        row = self.db.execute(
+            'SELECT newest_id, newest_utc, covered_from FROM syncs WHERE sub = ?',
+            (sub.lower(),)).fetchone()
+        return row
+
+    def _plan(self, sub, since):
+        """Where a sync of `sub` back to `since` can stop."""
+        state = self.sync_state(sub)
+        if state is None or since < state[2]:
+            # never synced, or not this far back: go until we pass `since`
+            return {'stop_id': None, 'stop_utc': since, 'covered_from': since, 'state': state}
+        return {'stop_id': state[0], 'stop_utc': state[1] or since,
+                'covered_from': state[2], 'state': state}
+
+    def sync(self, r, sub, since):
+        """
+        Fetch `sub`'s modlog entries newer than what's already archived, back
+        to at most `since` (a UTC timestamp). If the archive doesn't yet go
+        back as far as `since`, page back that far. Returns the number of new
+        entries.
+        """
+        return self.sync_many(r, [sub], since)[sub.lower()]
+
+    def sync_many(self, r, subs, since, chunk_size=CHUNK_SIZE, budget=None):
+        """
+        As `sync`, for each of `subs`, reading the modlogs of up to
+        `chunk_size` subs at a time through one combined listing
+        (/r/sub1+sub2+.../about/log) and sorting the entries out locally.
+        Each page read spends a request from `budget`, if given.
+        Returns {sub: new entries}, keyed by lowercased sub.
+        """
+        plans = {sub.lower(): self._plan(sub, since) for sub in subs}
+
+        # subs needing to go back about as far share listings, so a sub being
+        # backfilled doesn't drag the rest of its chunk back with it.
+        ordered = sorted(plans, key=lambda sub: plans[sub]['stop_utc'], reverse=True)
+
+        new = {}
+        for i in range(0, len(ordered), chunk_size):
+            chunk = ordered[i:i + chunk_size]
+            new.update(self._sync_chunk(r, chunk, plans, budget))
+        return new
+
+    def _sync_chunk(self, r, chunk, plans, budget=None):
+        floor = min(plans[sub]['stop_utc'] for sub in chunk)
+        entries = {sub: [] for sub in chunk}
+        newest = {}
+        done = set()
+
+        listing = r.get_subreddit('+'.join(chunk)).get_mod_log(limit=None)
+        for n, entry in enumerate(listing):
+            if n % PAGE_SIZE == 0:
+                self.requests += 1
+                if budget is not None:
+                    budget.acquire()
+
+            if entry.created_utc < floor:
+                break
+
+            sub = entry.subreddit.display_name.lower()
+            plan = plans.get(sub)
+            if plan is None or sub in done:
+                continue
+
+            if entry.id == plan['stop_id'] or entry.created_utc < plan['stop_utc']:
+                done.add(sub)
+                if len(done) == len(chunk):
+                    break
+                continue
+
+            newest.setdefault(sub, entry)
+            entries[sub].append((entry.id, sub, entry.mod, entry.action, entry.created_utc,
+                                 entry.target_author))
+
+        # record the high-water marks with the entries, so an interrupted sync
+        # is simply redone next time
+        now = time()
+        with self.db:
+            for sub in chunk:
+                plan = plans[sub]
+                if sub in newest:
+                    mark = (newest[sub].id, newest[sub].created_utc)
+                elif plan['state'] is not None:
+                    mark = plan['state'][:2]
+                else:
+                    mark = (None, None)
+
+                self.db.executemany(
+                    'INSERT OR IGNORE INTO entries (id, sub, mod, action, created_utc, target) '
+                    'VALUES (?, ?, ?, ?, ?, ?)', entries[sub])
+                self.db.execute('INSERT OR REPLACE INTO syncs VALUES (?, ?, ?, ?, ?)',
+                                (sub,) + tuple(mark) + (plan['covered_from'], now))
+
+        LOG.debug('Archived %s new modlog entries for %s sub(s)',
+                  sum(len(e) for e in entries.values()), len(chunk))
+        return {sub: len(entries[sub]) for sub in chunk}
+
+    def mod_activity(self, sub, since, mods=None):
+        """
+        {mod: (action count, last action UTC)} for `sub` since `since`. If
+        `mods` is given, only they are counted.
+        """
+        rows = self.db.execute(
+            'SELECT mod, COUNT(*), MAX(created_utc) FROM entries '
+            'WHERE sub = ? AND created_utc >= ? GROUP BY mod',
+            (sub.lower(), since)).fetchall()
+
+        activity = {mod: (count, last) for mod, count, last in rows}
+        if mods is not None:
+            activity = {mod: activity[mod] for mod in mods if mod in activity}
+        return activity
+
+    def moderator_changes(self, since):
+        """
+        (sub, mod, action, target, created_utc) of every change to who
+        moderates a sub since `since`, oldest first.
+        """
+        return self.db.execute(
+            'SELECT sub, mod, action, target, created_utc FROM entries '
+            'WHERE action IN ({}) AND created_utc >= ? ORDER BY created_utc'.format(
+                ', '.join('?' * len(MODERATOR_ACTIONS))),
+            MODERATOR_ACTIONS + [since]).fetchall()
+
+    def action_counts(self, sub, since, mod=None):
+        """{action: count} for `sub` since `since`, optionally for one mod."""
+        query = 'SELECT action, COUNT(*) FROM entries WHERE sub = ? AND created_utc >= ?'
+        args = [sub.lower(), since]
+        if mod is not None:
+            query += ' AND mod = ?'
+            args.append(mod)
+        query += ' GROUP BY action'
+
+        return dict(self.db.execute(query, args).fetchall())
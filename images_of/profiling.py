@@ -0,0 +1,166 @@
+"""
+Profiling for any of the tools, switched on from the command line.
+
+Every command made with `images_of.command` takes
+
+    --profile FILE    profile the main thread with cProfile, writing the
+                      stats to FILE for pstats, snakeviz and the like
+    --sample FILE     sample every thread's stack --sample-rate times a
+                      second, writing the counts to FILE as collapsed
+                      stacks, for flamegraph.pl or speedscope
+
+The files are written when the command finishes, and whenever the process
+gets SIGUSR1, so a long-running bot can be looked at without stopping it:
+
+    kill -USR1 <pid>
+
+Sampling costs far less than cProfile and sees every thread, so it's the one
+to leave running on a live bot.
+"""
+from collections import Counter
+from contextlib import contextmanager
+import logging
+import marshal
+import os
+import signal
+import sys
+import tempfile
+import threading
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_SAMPLE_RATE = 100
+
+
+def collapse(thread_name, frame):
+    """A frame's stack as one line, outermost call first, ';' between calls."""
+    calls = []
+    while frame is not None:
+        code = frame.f_code
+        calls.append('{} ({}:{})'.format(code.co_name, os.path.basename(code.co_filename),
+                                         code.co_firstlineno))
+        frame = frame.f_back
+    calls.append(thread_name)
+    return ';'.join(reversed(calls))
+
+
+def write_atomic(path, content):
+    """
+    Write `content` (text or bytes) to `path` by way of a temporary file, so
+    whatever's reading it never sees it half written.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, 'wb' if isinstance(content, bytes) else 'w') as f:
+            f.write(content)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class StackSampler:
+    """Counts the stacks every thread is in, `rate` times a second."""
+
+    def __init__(self, path, rate=DEFAULT_SAMPLE_RATE):
+        self.path = path
+        self.interval = 1.0 / rate
+        self.counts = Counter()
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            frames = sys._current_frames()
+            with self._lock:
+                self.samples += 1
+                for ident, frame in frames.items():
+                    if ident != me:
+                        self.counts[collapse(names.get(ident, str(ident)), frame)] += 1
+
+    def dump(self):
+        with self._lock:
+            lines = ['{} {}\n'.format(stack, n) for stack, n in self.counts.most_common()]
+            samples = self.samples
+        write_atomic(self.path, ''.join(lines))
+        LOG.info('Wrote %s stack samples to %s', samples, self.path)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.dump()
+
+
+class Profile:
+    """cProfile over the thread it's started from."""
+
+    def __init__(self, path):
+        import cProfile
+        self.path = path
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def _write(self):
+        # what dump_stats writes, but without leaving a half written file
+        self.profile.create_stats()
+        write_atomic(self.path, marshal.dumps(self.profile.stats))
+        LOG.info('Wrote profile to %s', self.path)
+
+    def dump(self):
+        try:
+            self._write()
+        finally:
+            self.profile.enable()
+
+    def stop(self):
+        self._write()
+
+
+@contextmanager
+def profiling(profile_path=None, sample_path=None, sample_rate=DEFAULT_SAMPLE_RATE):
+    """
+    Profile and/or sample what runs inside, writing the results out on the
+    way out and on SIGUSR1.
+    """
+    profilers = []
+    if sample_path:
+        profilers.append(StackSampler(sample_path, sample_rate))
+    if profile_path:
+        profilers.append(Profile(profile_path))
+
+    if not profilers:
+        yield
+        return
+
+    def dump(signum, frame):
+        for profiler in profilers:
+            try:
+                profiler.dump()
+            except OSError as e:
+                LOG.error('Could not write profile: %s', e)
+
+    previous = None
+    if hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+        previous = signal.signal(signal.SIGUSR1, dump)
+        LOG.info('Profiling; kill -USR1 %s to write out the results so far', os.getpid())
+
+    for profiler in profilers:
+        profiler.start()
+    try:
+        yield
+    finally:
+        for profiler in reversed(profilers):
+            profiler.stop()
+        if previous is not None:
+            signal.signal(signal.SIGUSR1, previous)
@@ -0,0 +1,95 @@
+"""
+Request budgeting shared by everything spending the same API rate limit.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+from time import monotonic, sleep
+
+LOG = logging.getLogger(__name__)
+
+# reddit allows OAuth clients 60 requests per minute.
+REDDIT_REQUESTS_PER_MINUTE = 60
+
+# items reddit hands back per request when paging through a listing
+LISTING_PAGE_SIZE = 100
+
+
+class RateBudget:
+    """
+    Token bucket allowing `rate` requests every `per` seconds, with bursts of
+    up to `burst` requests. Safe to share between threads.
+    """
+
+    def __init__(self, rate=REDDIT_REQUESTS_PER_MINUTE, per=60, burst=None):
+        self.rate = rate
+        self.per = per
+        self.capacity = burst or rate
+
+        self.spent = 0
+        self._tokens = float(self.capacity)
+        self._stamp = monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._stamp
+        self._stamp = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate / self.per)
+
+    def delay(self, cost=1):
+        """Seconds until `cost` requests could be spent."""
+        with self._lock:
+            self._refill(monotonic())
+            missing = min(cost, self.capacity) - self._tokens
+            return max(missing * self.per / self.rate, 0)
+
+    def try_acquire(self, cost=1):
+        """Spend `cost` requests if the budget allows it right now."""
+        with self._lock:
+            self._refill(monotonic())
+            if self._tokens < min(cost, self.capacity):
+                return False
+            self._tokens -= cost
+            self.spent += cost
+            return True
+
+    def acquire(self, cost=1):
+        """Spend `cost` requests, waiting until the budget allows it."""
+        while not self.try_acquire(cost):
+            sleep(self.delay(cost))
+
+
+def paced(listing, budget, page_size=LISTING_PAGE_SIZE):
+    """
+    Iterate over `listing`, spending a request from `budget` before each
+    page of `page_size` items is fetched.
+    """
+    items = iter(listing)
+    n = 0
+    while True:
+        if budget is not None and n % page_size == 0:
+            budget.acquire()
+        try:
+            item = next(items)
+        except StopIteration:
+            return
+        yield item
+        n += 1
+
+
+def concurrent_map(fn, items, workers=4, budget=None, cost=1):
+    """
+    Call `fn` on each of `items` from a pool of `workers` threads, returning
+    (item, result, exception) tuples in the order of `items`. If `budget` is
+    given, each call spends `cost` from it first.
+    """
+    def call(item):
+        if budget is not None:
+            budget.acquire(cost)
+        try:
+            return item, fn(item), None
+        except Exception as e:  # pylint: disable=W0703
+            return item, None, e
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(call, items))
@@ -0,0 +1,187 @@
+"""
+Snapshot of who moderates each sub in the network.
+
+Fetching every sub's moderator list takes a request per sub, and the
+audit and invite tools each used to do it from scratch. The roster keeps
+the lists in a JSON file, refetches only the ones that have gone stale, and
+is kept up to date in between by our own invites, and by moderators
+leaving or joining as the modlog archive records it.
+"""
+from copy import deepcopy
+import logging
+from time import time
+
+from praw.errors import HTTPException
+
+from images_of.ratelimit import RateBudget, concurrent_map
+from images_of.state import load_json, save_json
+
+LOG = logging.getLogger(__name__)
+
+ROSTER_FILE = 'mod-roster.json'
+
+# how long a sub's fetched moderator list is trusted
+MAX_AGE = 6 * 60 * 60
+
+# how long an unanswered invite is assumed to still be pending
+INVITE_TTL = 7 * 24 * 60 * 60
+
+# moderator lists fetched at once
+FETCH_WORKERS = 4
+
+
+def fetch_invited(r, sub):
+    """Names of those with open invites to moderate `sub`. praw has no call for it."""
+    url = '{}/api/v1/{}/moderators_invited'.format(r.config.api_url, sub)
+    r._use_oauth = r.is_oauth_session()
+    try:
+        response = r.request_json(url, params={'limit': 100})
+    finally:
+        r._use_oauth = False
+    return [mod['name'] for mod in response.get('moderators', [])]
+
+
+def fetch_moderators(r, sub):
+    """
+    (moderators, invited) of `sub`. invited is None if the invites couldn't
+    be read, as when we can't manage the sub's moderators.
+    """
+    mods = [u.name for u in r.get_moderators(sub)]
+    try:
+        invited = fetch_invited(r, sub)
+    except HTTPException as e:
+        LOG.debug('Could not fetch invited moderators of /r/%s: %s', sub, e)
+        invited = None
+    return mods, invited
+
+
+class ModRoster:
+    """
+    Moderator lists for each sub, kept in the JSON file at `path`. Sub
+    names are matched case-insensitively.
+    """
+
+    def __init__(self, path, max_age=MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self.subs = load_json(path, {})
+        # as it was on disk, to diff against
+        self.snapshot = deepcopy(self.subs)
+        self.fetched = 0
+
+    def _entry(self, sub):
+        return self.subs.setdefault(sub.lower(), {
+            'name': sub, 'mods': [], 'invited': {}, 'fetched': 0})
+
+    def is_fresh(self, sub, now=None):
+        entry = self.subs.get(sub.lower())
+        if entry is None:
+            return False
+        return (now or time()) - entry['fetched'] < self.max_age
+
+    def refresh(self, r, subs, force=False, budget=None):
+        """
+        Fetch the moderator lists of those of `subs` that are stale, or all
+        of them if `force`, a few at a time, along with their open invites.
+        Returns the subs that couldn't be fetched.
+        """
+        now = time()
+        stale = [sub for sub in subs if force or not self.is_fresh(sub, now)]
+        if not stale:
+            return []
+
+        LOG.info('Fetching moderators of %s sub(s)', len(stale))
+        results = concurrent_map(lambda sub: fetch_moderators(r, sub), stale,
+                                 workers=FETCH_WORKERS, budget=budget or RateBudget(), cost=2)
+
+        failed = []
+        for sub, result, error in results:
+            if error is not None:
+                LOG.error('Could not fetch moderators of /r/%s: %s', sub, error)
+                failed.append(sub)
+                continue
+
+            mods, invited = result
+            entry = self._entry(sub)
+            entry['mods'] = mods
+            entry['fetched'] = now
+            if invited is not None:
+                # declined and withdrawn invites are no longer listed
+                entry['invited'] = {mod: entry['invited'].get(mod, now)
+                                    for mod in invited if mod not in mods}
+            else:
+                # accepted invites show up as mods
+                entry['invited'] = {mod: t for mod, t in entry['invited'].items()
+                                    if mod not in mods and now - t < INVITE_TTL}
+            self.fetched += 1
+
+        return failed
+
+    def mods(self, sub):
+        """The moderators of `sub` as of the last fetch, in reddit's order."""
+        entry = self.subs.get(sub.lower())
+        return list(entry['mods']) if entry else []
+
+    def pending(self, sub):
+        """Mods invited to `sub` who haven't accepted yet."""
+        entry = self.subs.get(sub.lower())
+        return set(entry['invited']) if entry else set()
+
+    def record_invite(self, sub, mod):
+        self._entry(sub)['invited'][mod] = time()
+
+    def record_removal(self, sub, mod):
+        entry = self._entry(sub)
+        if mod in entry['mods']:
+            entry['mods'].remove(mod)
+        entry['invited'].pop(mod, None)
+
+    def record_accept(self, sub, mod):
+        entry = self._entry(sub)
+        if mod not in entry['mods']:
+            entry['mods'].append(mod)
+        entry['invited'].pop(mod, None)
+
+    def apply_modlog(self, changes):
+        """
+        Catch up with moderator changes from the modlog archive, as returned
+        by `ModlogArchive.moderator_changes`, that happened after each sub's
+        list was fetched. Returns how many were applied.
+        """
+        applied = 0
+        for sub, mod, action, target, created_utc in changes:
+            entry = self.subs.get(sub.lower())
+            if entry is None or created_utc <= entry['fetched']:
+                continue
+
+            if action == 'acceptmoderatorinvite':
+                self.record_accept(sub, mod)
+            elif action == 'removemoderator' and target:
+                self.record_removal(sub, target)
+            elif action == 'uninvitemoderator' and target:
+                entry['invited'].pop(target, None)
+            else:
+                continue
+            applied += 1
+        return applied
+
+    def oldest_fetch(self):
+        """When the least recently fetched sub was fetched, or 0."""
+        return min((entry['fetched'] for entry in self.subs.values()), default=0)
+
+    def diff(self, other=None):
+        """
+        {sub: (added, removed)} of moderators changed since `other`, a dict
+        of roster entries, or since the roster was loaded.
+        """
+        other = self.snapshot if other is None else other
+        changes = {}
+        for key, entry in self.subs.items():
+            before = set(other.get(key, {}).get('mods', []))
+            after = set(entry['mods'])
+            if before != after:
+                changes[entry['name']] = (sorted(after - before), sorted(before - after))
+        return changes
+
+    def save(self):
+        save_json(self.path, self.subs)
@@ -0,0 +1,131 @@
+"""
+Runs periodic jobs in one long-lived process.
+
+Each job is a function taking the shared reddit session and request budget,
+run on its own interval in its own thread. A job still running when it next
+comes due is skipped that time rather than started again alongside itself.
+How long each run takes, and how often jobs fail or are skipped, is logged
+and kept in a metrics file.
+"""
+import logging
+import threading
+from time import monotonic, sleep, time
+
+from images_of.state import save_json
+
+LOG = logging.getLogger(__name__)
+
+# most seconds to sleep between checks for due jobs
+TICK = 30
+
+# seconds between the first runs of each job, so they don't all start at once
+STAGGER = 30
+
+
+class Job:
+    def __init__(self, name, func, interval):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.next_run = 0
+        self.lock = threading.Lock()
+
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_duration = None
+        self.max_duration = 0
+        self.total_duration = 0
+        self.last_run = None
+
+    def metrics(self):
+        return {
+            'interval': self.interval,
+            'runs': self.runs,
+            'failures': self.failures,
+            'skipped': self.skipped,
+            'last_run': self.last_run,
+            'last_duration': self.last_duration,
+            'max_duration': self.max_duration,
+            'mean_duration': self.total_duration / self.runs if self.runs else None,
+        }
+
+
+class Scheduler:
+    """
+    Runs jobs with reddit session `r`, sharing `budget`. If `metrics_path`
+    is given, job metrics are written there after every run.
+    """
+
+    def __init__(self, r, budget, metrics_path=None):
+        self.r = r
+        self.budget = budget
+        self.metrics_path = metrics_path
+        self.jobs = []
+        self._metrics_lock = threading.Lock()
+
+    def add(self, name, func, interval):
+        """Run `func(r, budget)` every `interval` seconds."""
+        job = Job(name, func, interval)
+        job.next_run = monotonic() + STAGGER * len(self.jobs)
+        self.jobs.append(job)
+        return job
+
+    def _run(self, job):
+        LOG.info('Starting %s', job.name)
+        start = monotonic()
+        try:
+            job.func(self.r, self.budget)
+        except Exception:
+            job.failures += 1
+            LOG.exception('%s failed', job.name)
+        finally:
+            duration = monotonic() - start
+            job.runs += 1
+            job.last_run = time()
+            job.last_duration = duration
+            job.max_duration = max(job.max_duration, duration)
+            job.total_duration += duration
+            job.lock.release()
+
+            LOG.info('%s finished in %.1fs (mean %.1fs over %s runs)', job.name, duration,
+                     job.total_duration / job.runs, job.runs)
+            self._save_metrics()
+
+    def _save_metrics(self):
+        if not self.metrics_path:
+            return
+        with self._metrics_lock:
+            save_json(self.metrics_path, {job.name: job.metrics() for job in self.jobs})
+
+    def start(self, job):
+        """Start a run of `job` in the background, unless it's still running."""
+        if not job.lock.acquire(blocking=False):
+            job.skipped += 1
+            LOG.warning('%s is still running from last time; skipping this run', job.name)
+            return None
+
+        thread = threading.Thread(target=self._run, args=(job,), name=job.name)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def run_pending(self):
+        now = monotonic()
+        for job in self.jobs:
+            if now >= job.next_run:
+                job.next_run = now + job.interval
+                self.start(job)
+
+    def run_forever(self):
+        while True:
+            self.run_pending()
+            wait = min(job.next_run for job in self.jobs) - monotonic()
+            sleep(min(max(wait, 1), TICK))
+
+    def run_once(self):
+        """Run every job once, one after the other."""
+        for job in self.jobs:
+            thread = self.start(job)
+            if thread is not None:
+                thread.join()
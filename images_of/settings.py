@@ -6,8 +6,10 @@ to all clients. Anything that is, or needs to be tested elsewhere should be
 set in local_settings.
 """
 import os.path
+
 import pytoml as toml
-import pkg_resources
+
+from images_of import read_package_data
 
 def _conf_get(conf, *args, default=None):
     try:
@@ -21,7 +23,7 @@ def _conf_get(conf, *args, default=None):
 
 class Settings:
     def __init__(self):
-        conf = pkg_resources.resource_string(__name__, 'data/settings.toml')
+        conf = read_package_data('settings.toml')
         self.loads(conf)
 
         self._try_load(os.path.expanduser('~/.config/ion/settings.toml'))
@@ -50,6 +52,10 @@ class Settings:
         self.REDIRECT_URI = _conf_get(conf, 'auth', 'redirect-uri', default=self.REDIRECT_URI)
         self.REFRESH_TOKEN = _conf_get(conf, 'auth', 'refresh-token', default=self.REFRESH_TOKEN)
 
+        self.REDDIT_URL = _conf_get(conf, 'reddit', 'url', default=self.REDDIT_URL)
+        self.REDDIT_REQUEST_DELAY = _conf_get(conf, 'reddit', 'request-delay',
+                default=self.REDDIT_REQUEST_DELAY)
+
         # network
         self.NETWORK_NAME = _conf_get(conf, 'network', 'name', default=self.NETWORK_NAME)
 
@@ -70,6 +76,7 @@ class Settings:
         self.COMMENT_FOOTER = _conf_get(conf, 'network', 'comment-footer', default=self.COMMENT_FOOTER)
         self.DOMAINS = _conf_get(conf, 'posts', 'domains', default=self.DOMAINS)
         self.EXTENSIONS = _conf_get(conf, 'posts', 'extensions', default=self.EXTENSIONS)
+        self.REGEX_BACKEND = _conf_get(conf, 'posts', 'regex-backend', default=self.REGEX_BACKEND)
 
         self.PARENT_SUB = _conf_get(conf, 'parent', 'name', default=self.PARENT_SUB)
 
@@ -79,6 +86,14 @@ class Settings:
         update_cousins = _conf_get(conf, 'update_cousins', default=False)
         self.COUSIN_SUBS = self._load_group(conf, 'cousin', self.COUSIN_SUBS, update_cousins)
 
+        # local state
+        self.STATE_DIR = _conf_get(conf, 'state', 'dir', default=self.STATE_DIR)
+        self.EVENT_LOG = _conf_get(conf, 'events', 'log', default=self.EVENT_LOG)
+
+        # ion_scheduler
+        schedule = _conf_get(conf, 'schedule', default={})
+        self.SCHEDULE = dict(self.SCHEDULE, **{k.replace('-', '_'): v for k, v in schedule.items()})
+
         # discord
         self.DISCORD_CLIENTID = _conf_get(conf, 'discord', 'client_id', default=self.DISCORD_CLIENTID)
         self.DISCORD_TOKEN = _conf_get(conf, 'discord', 'token', default=self.DISCORD_TOKEN)
@@ -95,6 +110,8 @@ class Settings:
                 default=self.DISCORD_MOD_CHAN_ID)
         self.DISCORD_KEEPALIVE_CHAN_ID = _conf_get(conf, 'discord', 'keepalive_channel',
                 default=self.DISCORD_KEEPALIVE_CHAN_ID)
+        self.DISCORD_EVENTS_CHAN_ID = _conf_get(conf, 'discord', 'events_channel',
+                default=self.DISCORD_EVENTS_CHAN_ID)
 
         # github
         self.GITHUB_OAUTH_TOKEN = _conf_get(conf, 'github', 'token',
@@ -103,6 +120,12 @@ class Settings:
                 default=self.GITHUB_REPO_USER)
         self.GITHUB_REPO_NAME = _conf_get(conf, 'github', 'repo_name',
                 default=self.GITHUB_REPO_NAME)
+        self.GITHUB_WEBHOOK_SECRET = _conf_get(conf, 'github', 'webhook_secret',
+                default=self.GITHUB_WEBHOOK_SECRET)
+        self.GITHUB_WEBHOOK_HOST = _conf_get(conf, 'github', 'webhook_host',
+                default=self.GITHUB_WEBHOOK_HOST)
+        self.GITHUB_WEBHOOK_PORT = _conf_get(conf, 'github', 'webhook_port',
+                default=self.GITHUB_WEBHOOK_PORT)
 
     def _load_group(self, conf, group, old_items, update=False):
         # update indicates that we should update the group rather
@@ -145,6 +168,9 @@ class Settings:
     REDIRECT_URI = ""
     REFRESH_TOKEN = ""
 
+    REDDIT_URL = ""
+    REDDIT_REQUEST_DELAY = 1.0
+
     NETWORK_NAME = ""
     MULTIREDDIT_USER = None
     MULTIREDDITS = []
@@ -161,6 +187,12 @@ class Settings:
 
     EXTENSIONS = []
     DOMAINS = []
+    REGEX_BACKEND = 'auto'
+
+    STATE_DIR = "~/.local/share/ion"
+    EVENT_LOG = ""
+
+    SCHEDULE = {}
 
     DISCORD_CLIENTID = ""
     DISCORD_TOKEN = ""
@@ -171,10 +203,14 @@ class Settings:
     DISCORD_GITHUB_CHAN_ID = None
     DISCORD_MOD_CHAN_ID = None
     DISCORD_KEEPALIVE_CHAN_ID = None
+    DISCORD_EVENTS_CHAN_ID = None
 
     GITHUB_OAUTH_TOKEN = ""
     GITHUB_REPO_USER = ""
     GITHUB_REPO_NAME = ""
+    GITHUB_WEBHOOK_SECRET = ""
+    GITHUB_WEBHOOK_HOST = "127.0.0.1"
+    GITHUB_WEBHOOK_PORT = 65011
 
 settings = Settings()
 
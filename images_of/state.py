@@ -0,0 +1,45 @@
+"""
+Locations for the files tools keep between runs: caches, cursors, journals
+and logs.
+"""
+import json
+import os
+import os.path
+import tempfile
+
+from images_of import settings
+
+
+def state_path(name):
+    """
+    Path to `name` within the configured state directory, which is created
+    if need be. Absolute names are returned as they are.
+    """
+    state_dir = os.path.expanduser(settings.STATE_DIR)
+    path = os.path.join(state_dir, os.path.expanduser(name))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def load_json(path, default=None):
+    """Load a JSON state file, or return `default` if there isn't one yet."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def save_json(path, data):
+    """
+    Write a JSON state file. The file is replaced in one step, so a crash
+    part way through leaves the previous version rather than half of this one.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
@@ -4,6 +4,7 @@ import logging
 from praw.errors import Forbidden
 
 from images_of import AcceptFlag
+from images_of.matcher import compile_terms
 
 LOG = logging.getLogger(__name__)
 
@@ -31,22 +32,13 @@ class Subreddit:
         :param wiki_blacklist: subreddit has a blacklist on it's wiki
         """
 
-        LOG.debug('Setting up /r/{}'.format(name))
-
-        def make_regex(x, flags=0):
-            if x is None:
-                return None
-            if isinstance(x, str):
-                x = [x]
-
-            terms = '(\\b{}\\b)'.format('\\b|\\b'.join(x))
-            return re.compile(terms, flags)
+        LOG.debug('Setting up /r/%s', name)
 
         self.name = name
         self.feeds = feeds
-        self.search_re = make_regex(search, re.IGNORECASE)
-        self.ignore_re = make_regex(ignore, re.IGNORECASE)
-        self.ignore_case_re = make_regex(ignore_case)
+        self.search_re = compile_terms(search, re.IGNORECASE, name='/r/{} search'.format(name))
+        self.ignore_re = compile_terms(ignore, re.IGNORECASE, name='/r/{} ignore'.format(name))
+        self.ignore_case_re = compile_terms(ignore_case, name='/r/{} ignore-case'.format(name))
         self.whitelist = [sub.lower() for sub in whitelist]
         self.blacklist = [sub.lower() for sub in blacklist]
         self.wiki_blacklist = wiki_blacklist
@@ -54,7 +46,7 @@ class Subreddit:
 
         if kwargs:
             bad_keys = list(kwargs.keys())
-            LOG.warning('Unrecognized subreddit settings: {}'.format(bad_keys))
+            LOG.warning('Unrecognized subreddit settings: %s', bad_keys)
 
     def load_wiki_blacklist(self, r):
         """
@@ -74,12 +66,12 @@ class Subreddit:
             return
 
         try:
-            LOG.info('Loading wiki blacklist for /r/{}'.format(self.name))
+            LOG.info('Loading wiki blacklist for /r/%s', self.name)
             content = r.get_wiki_page(self.name, 'subredditblacklist').content_md
             subs = set(sub.strip().lower()[3:] for sub in content.splitlines() if sub)
             wiki_blacklist = subs.union(self.blacklist)
         except Forbidden:
-            LOG.warning('Forbidden from reading blacklist on /r/{}'.format(self.name))
+            LOG.warning('Forbidden from reading blacklist on /r/%s', self.name)
             wiki_blacklist = set()
 
         self.blacklist = sorted(wiki_blacklist.union(self.blacklist))
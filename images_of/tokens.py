@@ -0,0 +1,77 @@
+"""
+OAuth access tokens shared by every tool running on the host.
+
+Getting an access token from a refresh token costs a round trip to reddit,
+and each token is good for an hour. Rather than every tool fetching its own
+at startup, tokens are kept in a file in the state directory, keyed by a
+hash of the refresh token they came from, and reused while they have a
+while left to run.
+
+The file is only read or written while holding an exclusive lock on a
+neighbouring lock file, so tools starting at the same moment refresh once
+between them rather than each refreshing and overwriting the other.
+"""
+from contextlib import contextmanager
+import fcntl
+from hashlib import sha256
+import logging
+from time import time
+
+from images_of.state import load_json, save_json
+
+LOG = logging.getLogger(__name__)
+
+TOKEN_FILE = 'oauth-tokens.json'
+
+# how long reddit's access tokens last
+TOKEN_LIFETIME = 60 * 60
+
+# tokens with less than this left are refreshed rather than used
+REFRESH_MARGIN = 5 * 60
+
+
+class TokenCache:
+    """Access tokens kept in the JSON file at `path`."""
+
+    def __init__(self, path):
+        self.path = path
+
+    @contextmanager
+    def _locked(self):
+        with open(self.path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _key(refresh_token):
+        return sha256(refresh_token.encode('utf-8')).hexdigest()
+
+    def get(self, refresh_token, refresh, margin=REFRESH_MARGIN):
+        """
+        The cached token for `refresh_token` if it has more than `margin`
+        seconds left, or else a new one from `refresh()`, which is cached.
+        Tokens are dicts with at least 'access_token', 'scope' and 'expires'.
+        """
+        key = self._key(refresh_token)
+        with self._locked():
+            tokens = load_json(self.path, {})
+            token = tokens.get(key)
+            if token and token['expires'] - time() > margin:
+                LOG.debug('Using cached access token, %ds left', token['expires'] - time())
+                return token
+
+            LOG.debug('Refreshing access token')
+            token = refresh()
+            tokens[key] = token
+
+            # drop tokens nobody has refreshed in a while
+            now = time()
+            tokens = {k: t for k, t in tokens.items() if t['expires'] > now}
+
+            # save_json's temporary file, and so the cache, is only
+            # readable by us
+            save_json(self.path, tokens)
+            return token
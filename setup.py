@@ -23,6 +23,7 @@ setup(
 
     entry_points = {
         "console_scripts": [
+            "ion = images_of.cli:main",
             "ion_expand = images_of.entrypoints.expand:main",
             "ion_setup_oauth = images_of.entrypoints.oauth:main",
             "ion_bot = images_of.entrypoints.bot:main",
@@ -34,6 +35,9 @@ setup(
             "ion_hot_sister = images_of.entrypoints.hot_sister:main",
             "ion_discord_bot = images_of.entrypoints.discord_announce_bot:main",
             "ion_feeds = images_of.entrypoints.feeds:main",
+            "ion_github_replay = images_of.entrypoints.github_replay:main",
+            "ion_scheduler = images_of.entrypoints.scheduler:main",
+            "ion_fake_reddit = images_of.entrypoints.fake_reddit:main",
         ],
     },
 
@@ -0,0 +1,53 @@
+import re
+import unittest
+
+from images_of import matcher, settings
+
+TITLES = [
+    'Sunset over Hulhumalé [OC] [4000x3000]',
+    'Fishing boats on Marajó island',
+    'The Cathedral of Curicó after the rain',
+    'Abiquiú, New Mexico in winter',
+    'Ruins of Petén Itzá from the air',
+    'Malmö at night',
+    'A street in Malé',
+    'Mal, not Malé',
+    'Nothing to see here',
+]
+
+
+def found(rule, title):
+    match = rule.search(title)
+    return match.group() if match else None
+
+
+@unittest.skipIf(matcher.re2 is None, 're2 is not installed')
+class TermsMatchTheSameTest(unittest.TestCase):
+    """Rules compiled for re2 should find what `re` finds, accents and all."""
+
+    def assertSameMatches(self, terms, titles):
+        by_re = matcher.compile_terms(terms, re.IGNORECASE, backend='re')
+        by_re2 = matcher.compile_terms(terms, re.IGNORECASE, backend='re2')
+        for title in titles:
+            self.assertEqual(found(by_re, title), found(by_re2, title), title)
+
+    def test_accented_terms(self):
+        for term in ['maraj(ó|o)', 'Curic(ó|o)', 'Hulhumal(é|e)', 'Abiqui(ú|u)',
+                     'Pet(é|e)n Itz(á|a)', 'Malmö', 'Malé']:
+            self.assertSameMatches([term], TITLES)
+
+    def test_only_non_ascii_terms_fall_back(self):
+        pattern_type = type(re.compile(''))
+        rule = matcher.compile_terms(['lisbon', 'são paulo'], re.IGNORECASE, backend='re2')
+        self.assertIsInstance(rule, pattern_type)
+        rule = matcher.compile_terms(['lisbon', 'porto'], re.IGNORECASE, backend='re2')
+        self.assertNotIsInstance(rule, pattern_type)
+
+    def test_shipped_search_terms(self):
+        for sub in settings.CHILD_SUBS + settings.COUSIN_SUBS:
+            if sub.get('search'):
+                self.assertSameMatches(sub['search'], TITLES)
+
+
+if __name__ == '__main__':
+    unittest.main()